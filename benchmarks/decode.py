@@ -0,0 +1,130 @@
+"""JSON decode benchmarks, per-message latency and allocations for each parser on small and large payloads
+
+Decodes the same payloads with the original decode-to-str-then-json.loads path, and with JSONDecoder on each
+installed parser. msgspec also runs pulling out only the keys a translator needs. Latency is timed per call
+and reported as percentiles. Allocations are measured with tracemalloc, as the peak memory a decode touches
+and the memory its result keeps.
+
+    python -m benchmarks.decode --sizes 256,16384 --messages 20000 --output decode.json
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import fmean
+from time import perf_counter_ns
+import json
+import sys
+import tracemalloc
+
+from mqtt_to_aprs.config import JSONParser
+from mqtt_to_aprs.utils.message.json import JSONDecoder
+from mqtt_to_aprs.utils.message.json import msgspec
+from mqtt_to_aprs.utils.message.json import orjson
+
+from .e2e import environment
+
+# the keys a weather translator usually reads
+KEYS = ("temperature_C", "humidity", "wind_dir_deg", "wind_avg_mi_h", "rain_in")
+
+
+def make_payload(seq: int, size: int) -> bytes:
+    """A weather report, padded out to about size bytes with the sort of history some gateways send along"""
+    report = {"time": "2024-05-01 12:00:00", "model": "Fineoffset-WH65B", "id": seq % 256, "battery_ok": 1,
+              "temperature_C": 20.0 + seq % 10, "humidity": 40 + seq % 50, "wind_dir_deg": seq % 360,
+              "wind_avg_mi_h": seq % 30, "rain_in": seq % 100, "history": []}
+    entry = len(json.dumps({"t": 0, "temperature_C": 19.5, "humidity": 55, "ok": True})) + 2
+    entries = max(0, size - len(json.dumps(report))) // entry
+    report["history"] = [{"t": index, "temperature_C": 19.5, "humidity": 55, "ok": True} for index in range(entries)]
+    return json.dumps(report).encode("utf-8")
+
+
+def decode_str(payload: bytes) -> dict[str, any]:
+    """How message_json decoded payloads before JSONDecoder"""
+    return json.loads(payload.decode("utf-8"))
+
+
+def decoders() -> dict[str, callable]:
+    found = {"str_then_stdlib": decode_str, "stdlib": JSONDecoder(JSONParser.stdlib)}
+    if orjson is not None:
+        found["orjson"] = JSONDecoder(JSONParser.orjson)
+    if msgspec is not None:
+        found["msgspec"] = JSONDecoder(JSONParser.msgspec)
+        found["msgspec_keys"] = JSONDecoder(JSONParser.msgspec, keys=KEYS)
+    return found
+
+
+def latency(decode, payloads: list[bytes]) -> dict[str, float]:
+    durations = []
+    for payload in payloads:
+        started = perf_counter_ns()
+        decode(payload)
+        durations.append(perf_counter_ns() - started)
+    durations.sort()
+    return {"mean_us": fmean(durations) / 1000,
+            **{f"p{percent}_us": durations[min(len(durations) - 1, len(durations) * percent // 100)] / 1000
+               for percent in (50, 99)}}
+
+
+def allocations(decode, payloads: list[bytes]) -> dict[str, float]:
+    """Average bytes at the peak of each decode, and kept by its result, above what was allocated before it"""
+    peaks = []
+    retained = []
+    tracemalloc.start()
+    try:
+        for payload in payloads:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            result = decode(payload)
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(after - before)
+            del result
+    finally:
+        tracemalloc.stop()
+    return {"peak_bytes": fmean(peaks), "retained_bytes": fmean(retained)}
+
+
+def run_case(size: int, messages: int, allocation_messages: int) -> list[dict[str, any]]:
+    payloads = [make_payload(seq, size) for seq in range(messages)]
+    results = []
+    for name, decode in decoders().items():
+        decoded = decode(payloads[0])
+        expected = decode_str(payloads[0])
+        if name == "msgspec_keys":
+            expected = {key: expected[key] for key in KEYS}
+        if decoded != expected:
+            raise AssertionError(f"{name} decoded {payloads[0]!r} differently")
+        # a pass to warm up caches before the timed one
+        latency(decode, payloads[:1000])
+        results.append({"parser": name, "payload_size": len(payloads[0]), "latency": latency(decode, payloads),
+                        "allocations": allocations(decode, payloads[:allocation_messages])})
+    return results
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="256,16384", help="Comma separated payload sizes in bytes")
+    parser.add_argument("--messages", type=int, default=20000, help="Payloads to time for each parser and size")
+    parser.add_argument("--allocation-messages", type=int, default=1000,
+                        help="Payloads to trace allocations for, tracing is slow")
+    parser.add_argument("--output", type=Path, default=None, help="File to write the JSON results to, defaults to stdout")
+    args = parser.parse_args()
+
+    results = []
+    for size in [int(value) for value in args.sizes.split(",")]:
+        for result in run_case(size, args.messages, args.allocation_messages):
+            print(f"{result['parser']:>16} {result['payload_size']:>7}B: p50 {result['latency']['p50_us']:>8.2f}us "
+                  f"p99 {result['latency']['p99_us']:>8.2f}us, peak {result['allocations']['peak_bytes']:>9.0f}B "
+                  f"kept {result['allocations']['retained_bytes']:>9.0f}B", file=sys.stderr)
+            results.append(result)
+
+    options = {"messages": args.messages, "allocation_messages": args.allocation_messages,
+               "parsers": list(decoders())}
+    report = json.dumps({"environment": environment(), "options": options, "results": results}, indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        args.output.write_text(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
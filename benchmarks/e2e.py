@@ -0,0 +1,316 @@
+"""End to end benchmarks, driving the real MQTT2APRS service against local APRS-IS and KISS stand-ins
+
+Each scenario sends messages into the service, from an in-process stand-in for the MQTT client or through
+a real broker with --broker, and times every frame from the message going in to its line or KISS frame
+arriving at the stand-in server. Scenarios are the product of --topics, --payload-sizes and --rates, and
+each runs in a fresh process so its peak RSS is its own.
+
+    python -m benchmarks.e2e --topics 1,100 --payload-sizes 128,4096 --rates 0,2000 --output results.json
+    python -m benchmarks.e2e --compare base.json results.json
+
+The KISS stand-in is set up as a very fast channel, so airtime pacing doesn't hide the software's speed. The
+KISS sender still merges frames from a topic that are waiting for the channel, so it can receive fewer frames
+than APRS-IS, which gets one for every message and decides when a scenario is done.
+"""
+from argparse import ArgumentParser
+from array import array
+from asyncio import Event
+from asyncio import StreamReader
+from asyncio import StreamWriter
+from asyncio import create_task
+from asyncio import run
+from asyncio import sleep
+from asyncio import start_server
+from asyncio import timeout
+from asyncio import wait
+from collections.abc import AsyncIterator
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from multiprocessing import get_context
+from pathlib import Path
+from time import perf_counter
+import json
+import logging
+import platform
+import re
+import resource
+import subprocess  # nosec
+import sys
+
+from mqtt_to_aprs.config import ConfigObject
+from mqtt_to_aprs.utils.capture import CapturedMessage
+from mqtt_to_aprs.utils.replay import LatencyRecorder
+from mqtt_to_aprs.utils.replay import ReplayClient
+from mqtt_to_aprs.utils.replay import ReplayMessage
+from mqtt_to_aprs.utils.service import MQTT2APRS
+
+# every message's sequence number goes out as its pressure, so a frame can be matched to its message
+MAX_MESSAGES = 100000
+SEQUENCE = re.compile(rb"b(\d{5})w")
+FEND = b"\xc0"
+
+
+def make_payload(seq: int, size: int) -> bytes:
+    """A json weather report padded out to about size bytes"""
+    report = {"seq": seq, "temperature_c": 20 + seq % 10, "humidity": 40 + seq % 50, "wind_dir": seq % 360,
+              "wind_speed": seq % 30, "pad": ""}
+    encoded = json.dumps(report).encode("utf-8")
+    report["pad"] = "x" * max(0, size - len(encoded))
+    return json.dumps(report).encode("utf-8")
+
+
+def make_config(topics: int, aprs_port: int, kiss_port: int, broker: tuple[str, int] | None, workers: int,
+                execution: str) -> ConfigObject:
+    host, port = broker or ("localhost", 1883)
+    return ConfigObject(
+        logging={},
+        aprs={"callsign": "N0CALL", "password": -1, "host": "127.0.0.1", "port": aprs_port},
+        kiss={"path": f"tcp://127.0.0.1:{kiss_port}", "baud_rate": 10 ** 9, "tx_delay": 0},
+        location={"latitude": 28.979480, "longitude": -98.51329},
+        mqtt={"host": host, "port": port, "workers": workers, "execution": execution, "topics": [{
+            "topic": f"bench/{index}",
+            "target": ["is", "kiss"],
+            "translator": {"type": "jmespath", "config": {"fields": {
+                "temperature_c": "temperature_c", "humidity": "humidity", "wind_dir": "wind_dir",
+                "wind_speed": "wind_speed", "pressure_mbar": "seq"}}},
+        } for index in range(topics)]},
+    )
+
+
+class BenchClient(ReplayClient):
+    """A ReplayClient that remembers when each message was handed to the listener, by sequence number"""
+
+    def __init__(self, messages: Iterator[CapturedMessage], speed: float, sent_at: array) -> None:
+        super().__init__(messages, speed=speed)
+        self.sent_at = sent_at
+
+    @property
+    def messages(self) -> AsyncIterator[ReplayMessage]:
+        return self._timed()
+
+    async def _timed(self) -> AsyncIterator[ReplayMessage]:
+        async for message in self._replay():
+            self.sent_at.append(message.received)
+            yield message
+
+
+class StandIn:
+    """A local TCP server standing in for APRS-IS or a KISS TNC, timing every frame it receives"""
+
+    def __init__(self, name: str, sent_at: array, latencies: LatencyRecorder, expected: int | None = None) -> None:
+        self.name = name
+        self.sent_at = sent_at
+        self.latencies = latencies
+        self.expected = expected
+        self.frames = 0
+        self.finished: float | None = None
+        self.done = Event()
+        self.server = None
+
+    async def start(self) -> int:
+        self.server = await start_server(self._client, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self.server.close()
+
+    def received(self, frame: bytes) -> None:
+        match = SEQUENCE.search(frame)
+        if match is None:
+            return
+        now = perf_counter()
+        latency = now - self.sent_at[int(match.group(1))]
+        self.latencies.record(self.name, latency)
+        self.latencies.record("end_to_end", latency)
+        self.frames += 1
+        self.finished = now
+        if self.expected is not None and self.frames >= self.expected:
+            self.done.set()
+
+    async def quiet(self, seconds: float = 0.5) -> None:
+        """Waits until no frame has arrived for seconds"""
+        frames = -1
+        while frames != self.frames:
+            frames = self.frames
+            await sleep(seconds)
+
+    async def _client(self, reader: StreamReader, writer: StreamWriter) -> None:
+        raise NotImplementedError
+
+
+class APRSISStandIn(StandIn):
+    async def _client(self, reader: StreamReader, writer: StreamWriter) -> None:
+        login = await reader.readline()
+        callsign = login.split(b" ")[1] if login.startswith(b"user ") else b"N0CALL"
+        writer.write(b"# logresp " + callsign + b" verified, server BENCH\r\n")
+        async for line in reader:
+            self.received(line.rstrip(b"\r\n"))
+        writer.close()
+
+
+class KissStandIn(StandIn):
+    async def _client(self, reader: StreamReader, writer: StreamWriter) -> None:
+        buffered = b""
+        while data := await reader.read(65536):
+            *frames, buffered = (buffered + data).split(FEND)
+            for frame in frames:
+                if frame:
+                    self.received(frame)
+        writer.close()
+
+
+async def publish(broker: tuple[str, int], messages: Iterator[CapturedMessage], rate: float, sent_at: array) -> None:
+    """Publishes messages to a real broker at rate a second, 0 for as fast as possible"""
+    from aiomqtt import Client
+
+    async with Client(hostname=broker[0], port=broker[1], identifier="mqtt2aprs-bench") as client:
+        started = perf_counter()
+        for index, message in enumerate(messages):
+            if rate > 0:
+                delay = started + index / rate - perf_counter()
+                if delay > 0:
+                    await sleep(delay)
+            sent_at.append(perf_counter())
+            await client.publish(message.topic, message.payload)
+
+
+async def _run_scenario(topics: int, payload_size: int, rate: float, messages: int, broker: tuple[str, int] | None,
+                        workers: int, execution: str, wait_seconds: float) -> dict[str, any]:
+    sent_at = array("d")
+    latencies = LatencyRecorder()
+    aprs_is = APRSISStandIn("aprsis", sent_at, latencies, messages)
+    kiss = KissStandIn("kiss", sent_at, latencies)
+    config = make_config(topics, await aprs_is.start(), await kiss.start(), broker, workers, execution)
+    generated = (CapturedMessage(f"bench/{seq % topics}", seq / rate if rate > 0 else 0.0, make_payload(seq, payload_size))
+                 for seq in range(messages))
+
+    client = None if broker is not None else BenchClient(generated, speed=1.0 if rate > 0 else 0.0, sent_at=sent_at)
+    service = MQTT2APRS(config, service_id="bench", mqtt_client=client)
+    await service.setup()
+    service_task = create_task(service.run())
+    if broker is not None:
+        # give the service time to subscribe before anything is published
+        await sleep(1.0)
+        create_task(publish(broker, generated, rate, sent_at))
+    try:
+        async with timeout(wait_seconds + (messages / rate if rate > 0 else 0)):
+            await aprs_is.done.wait()
+    except TimeoutError:
+        logging.warning("Timed out with %d of %d frames at APRS-IS", aprs_is.frames, messages)
+    await kiss.quiet()
+    if broker is not None:
+        service_task.cancel()
+    await wait([service_task], timeout=10)
+    await aprs_is.close()
+    await kiss.close()
+
+    finished = aprs_is.finished or perf_counter()
+    elapsed = finished - sent_at[0] if len(sent_at) > 0 else 0.0
+    return {
+        "topics": topics,
+        "payload_size": payload_size,
+        "rate": rate,
+        "messages": len(sent_at),
+        "frames": {"aprsis": aprs_is.frames, "kiss": kiss.frames},
+        "seconds": elapsed,
+        "messages_per_second": len(sent_at) / elapsed if elapsed > 0 else 0.0,
+        "latency": latencies.summary(),
+        # kilobytes on Linux, bytes on macOS
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == "darwin" else 1),
+    }
+
+
+def run_scenario(*args) -> dict[str, any]:
+    logging.basicConfig(level=logging.WARNING)
+    return run(_run_scenario(*args))
+
+
+def environment() -> dict[str, str | None]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,  # nosec
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine()}
+
+
+def scenario_key(result: dict[str, any]) -> tuple:
+    return result["topics"], result["payload_size"], result["rate"]
+
+
+def print_result(result: dict[str, any]) -> None:
+    end_to_end = result["latency"].get("end_to_end", {})
+    print(f"topics {result['topics']:>5} payload {result['payload_size']:>6}B rate {result['rate'] or 'max':>7}: "
+          f"{result['messages_per_second']:>9.0f} msgs/s, p50 {end_to_end.get('p50_ms', 0):.3f}ms "
+          f"p99 {end_to_end.get('p99_ms', 0):.3f}ms, peak rss {result['peak_rss_kb'] / 1024:.1f}MB", file=sys.stderr)
+
+
+def compare(base_path: Path, new_path: Path) -> None:
+    """Prints how throughput, p99 latency and peak RSS moved between two result files"""
+    base = json.loads(base_path.read_text())
+    new = json.loads(new_path.read_text())
+    print(f"{base['environment']['commit']} -> {new['environment']['commit']}")
+    baseline = {scenario_key(result): result for result in base["results"]}
+    for result in new["results"]:
+        before = baseline.get(scenario_key(result))
+        if before is None:
+            continue
+
+        def change(old: float, current: float) -> str:
+            return f"{(current - old) / old * 100:+.1f}%" if old else "n/a"
+
+        p99 = [entry["latency"].get("end_to_end", {}).get("p99_ms", 0) for entry in (before, result)]
+        print(f"topics {result['topics']:>5} payload {result['payload_size']:>6}B rate {result['rate'] or 'max':>7}: "
+              f"msgs/s {change(before['messages_per_second'], result['messages_per_second'])}, "
+              f"p99 {change(*p99)}, peak rss {change(before['peak_rss_kb'], result['peak_rss_kb'])}")
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", default="1,100", help="Comma separated topic counts to sweep")
+    parser.add_argument("--payload-sizes", default="128,4096", help="Comma separated payload sizes in bytes to sweep")
+    parser.add_argument("--rates", default="0", help="Comma separated messages a second to sweep, 0 for as fast as possible")
+    parser.add_argument("--messages", type=int, default=10000, help="Messages to send in each scenario")
+    parser.add_argument("--workers", type=int, default=1, help="Listener workers")
+    parser.add_argument("--execution", choices=["inline", "process"], default="inline", help="Listener execution mode")
+    parser.add_argument("--broker", default=None, help="host:port of a local MQTT broker to go through, instead of the "
+                        "in-process stand-in")
+    parser.add_argument("--wait", type=float, default=60.0, help="Seconds to wait for the last frames before giving up")
+    parser.add_argument("--output", type=Path, default=None, help="File to write the JSON results to, defaults to stdout")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("BASE", "NEW"), help="Compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if not 0 < args.messages <= MAX_MESSAGES:
+        parser.error(f"--messages must be between 1 and {MAX_MESSAGES}")
+    broker = None
+    if args.broker is not None:
+        host, _, port = args.broker.rpartition(":")
+        broker = (host, int(port))
+
+    results = []
+    scenarios = product([int(value) for value in args.topics.split(",")],
+                        [int(value) for value in args.payload_sizes.split(",")],
+                        [float(value) for value in args.rates.split(",")])
+    for topics, payload_size, rate in scenarios:
+        # a fresh process for each scenario, so peak RSS and the senders' caches start clean
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            result = executor.submit(run_scenario, topics, payload_size, rate, args.messages, broker, args.workers,
+                                     args.execution, args.wait).result()
+        print_result(result)
+        results.append(result)
+
+    options = {"messages": args.messages, "workers": args.workers, "execution": args.execution, "broker": args.broker}
+    report = json.dumps({"environment": environment(), "options": options, "results": results}, indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        args.output.write_text(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
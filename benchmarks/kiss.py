@@ -0,0 +1,200 @@
+"""KISS sender throughput benchmarks, over TCP to a stand-in TNC and over a pty standing in for a serial port
+
+Queues weather frames for a KissSender set up with a very fast RF channel, so airtime pacing doesn't hide the
+software's speed, and counts the frames arriving at the other end. Every frame has its own topic, so the
+scheduler never merges any. Also times KISS framing on its own, the bulk escaping kiss_frame does against
+escaping a byte at a time.
+
+    python -m benchmarks.kiss --transports tcp,pty --frames 20000 --output kiss.json
+"""
+from argparse import ArgumentParser
+from asyncio import Event
+from asyncio import Queue
+from asyncio import StreamReader
+from asyncio import StreamWriter
+from asyncio import get_running_loop
+from asyncio import run
+from asyncio import start_server
+from asyncio import timeout
+from pathlib import Path
+from time import perf_counter
+from time import time
+import json
+import logging
+import os
+import sys
+
+from mqtt_to_aprs.config import KissConfig
+from mqtt_to_aprs.utils.kiss import KissSender
+from mqtt_to_aprs.utils.packet import OutboundFrame
+from mqtt_to_aprs.utils.packet import encode_position
+from mqtt_to_aprs.utils.packet.ax25 import FEND
+from mqtt_to_aprs.utils.packet.ax25 import FESC
+from mqtt_to_aprs.utils.packet.ax25 import TFEND
+from mqtt_to_aprs.utils.packet.ax25 import TFESC
+from mqtt_to_aprs.utils.packet.ax25 import kiss_frame
+from mqtt_to_aprs.utils.packet.ax25 import kiss_prefix
+from mqtt_to_aprs.utils.packet.weather import encode_position_weather_packet
+from mqtt_to_aprs.utils.packet.weather import encode_weather_data
+
+from .e2e import environment
+
+CALLSIGN = "N0CALL-13"
+
+
+def make_info(seq: int, size: int) -> bytes:
+    """A weather information field with a comment padding it out to about size bytes"""
+    info = encode_position_weather_packet(encode_position(28.979480, -98.51329),
+                                          encode_weather_data(temperature=70 + seq % 10, humidity=40 + seq % 50))
+    return info + b"x" * max(0, size - len(info))
+
+
+class FrameCounter:
+    """Counts the KISS frames in a byte stream"""
+
+    def __init__(self, expected: int) -> None:
+        self.expected = expected
+        self.frames = 0
+        self.bytes = 0
+        self.done = Event()
+        self._buffered = b""
+
+    def feed(self, data: bytes) -> None:
+        self.bytes += len(data)
+        *frames, self._buffered = (self._buffered + data).split(FEND)
+        self.frames += sum(1 for frame in frames if frame)
+        if self.frames >= self.expected:
+            self.done.set()
+
+
+async def tcp_stand_in(counter: FrameCounter) -> tuple[str, callable]:
+    async def client(reader: StreamReader, writer: StreamWriter) -> None:
+        while data := await reader.read(65536):
+            counter.feed(data)
+        writer.close()
+
+    server = await start_server(client, "127.0.0.1", 0)
+    return f"tcp://127.0.0.1:{server.sockets[0].getsockname()[1]}", server.close
+
+
+async def pty_stand_in(counter: FrameCounter) -> tuple[str, callable]:
+    """Reads the master side of a pty, the sender opens the slave side as if it were a serial port"""
+    master, slave = os.openpty()
+    os.set_blocking(master, False)
+    loop = get_running_loop()
+
+    def readable() -> None:
+        try:
+            counter.feed(os.read(master, 65536))
+        except BlockingIOError:
+            pass
+
+    loop.add_reader(master, readable)
+
+    def close() -> None:
+        loop.remove_reader(master)
+        os.close(master)
+        os.close(slave)
+
+    return os.ttyname(slave), close
+
+
+async def run_transport(transport: str, frames: int, info_size: int, batch_size: int, wait_seconds: float) -> dict[str, any]:
+    counter = FrameCounter(frames)
+    path, close = await (tcp_stand_in if transport == "tcp" else pty_stand_in)(counter)
+    config = KissConfig(path=path, serial_baud=115200, baud_rate=10 ** 9, tx_delay=0, batch_size=batch_size)
+    sender = KissSender(config, CALLSIGN, sender_id=f"bench-{transport}")
+    await sender.connect()
+    queue = Queue()
+    created = time()
+    for seq in range(frames):
+        queue.put_nowait(OutboundFrame(topic=f"bench/{seq}", info=make_info(seq, info_size), created=created))
+    queue.put_nowait(None)
+
+    started = perf_counter()
+    await sender.run(queue)
+    try:
+        async with timeout(wait_seconds):
+            await counter.done.wait()
+    except TimeoutError:
+        logging.warning("Timed out with %d of %d frames over %s", counter.frames, frames, transport)
+    elapsed = perf_counter() - started
+    close()
+    return {
+        "transport": transport,
+        "info_size": info_size,
+        "frames": counter.frames,
+        "seconds": elapsed,
+        "frames_per_second": counter.frames / elapsed,
+        "megabytes_per_second": counter.bytes / elapsed / 1e6,
+    }
+
+
+def escape_per_byte(data: bytes) -> bytes:
+    """KISS escaping one byte at a time, what kiss_escape's two bulk replaces stand in for"""
+    escaped = bytearray()
+    for byte in data:
+        if byte == FEND[0]:
+            escaped += FESC + TFEND
+        elif byte == FESC[0]:
+            escaped += FESC + TFESC
+        else:
+            escaped.append(byte)
+    return bytes(escaped)
+
+
+def framing(frames: int, info_size: int, repeat: int) -> dict[str, float]:
+    """Microseconds to frame each info field, some of which need escaping"""
+    prefix = kiss_prefix(CALLSIGN, ("WIDE1-1", "WIDE2-1"))
+    infos = [make_info(seq, info_size) + (FEND + FESC if seq % 10 == 0 else b"") for seq in range(frames)]
+    for info in infos[:100]:
+        if kiss_frame(prefix, info) != prefix + escape_per_byte(info) + FEND:
+            raise AssertionError(f"Framing disagrees about {info!r}")
+
+    def best(encode) -> float:
+        timings = []
+        for _ in range(repeat):
+            started = perf_counter()
+            for info in infos:
+                encode(info)
+            timings.append(perf_counter() - started)
+        return min(timings) / len(infos) * 1e6
+
+    return {"bulk_us": best(lambda info: kiss_frame(prefix, info)),
+            "per_byte_us": best(lambda info: prefix + escape_per_byte(info) + FEND)}
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transports", default="tcp,pty", help="Comma separated transports to run, tcp and pty")
+    parser.add_argument("--frames", type=int, default=20000, help="Frames to send over each transport")
+    parser.add_argument("--info-sizes", default="64,256", help="Comma separated information field sizes in bytes")
+    parser.add_argument("--batch-size", type=int, default=100, help="Most frames the sender writes at once")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes of the framing benchmark to take the best of")
+    parser.add_argument("--wait", type=float, default=60.0, help="Seconds to wait for the last frames before giving up")
+    parser.add_argument("--output", type=Path, default=None, help="File to write the JSON results to, defaults to stdout")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    results = []
+    for info_size in [int(value) for value in args.info_sizes.split(",")]:
+        encode = framing(args.frames, info_size, args.repeat)
+        print(f"framing {info_size:>5}B: bulk {encode['bulk_us']:.2f}us, per byte {encode['per_byte_us']:.2f}us",
+              file=sys.stderr)
+        for transport in args.transports.split(","):
+            result = run(run_transport(transport, args.frames, info_size, args.batch_size, args.wait))
+            result["framing"] = encode
+            print(f"{transport:>5} {info_size:>5}B: {result['frames']} frames, {result['frames_per_second']:.0f} "
+                  f"frames/s, {result['megabytes_per_second']:.2f}MB/s", file=sys.stderr)
+            results.append(result)
+
+    options = {"frames": args.frames, "batch_size": args.batch_size, "repeat": args.repeat}
+    report = json.dumps({"environment": environment(), "options": options, "results": results}, indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        args.output.write_text(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Listener load benchmarks, the MQTTListener pipeline fed by a stand-in MQTT client as fast as it will go
+
+Each scenario runs the real MQTTListener with a ReplayClient standing in for aiomqtt, and drains its output
+queues. It sweeps the worker count and the execution mode and reports messages a second. It also checks that
+every topic's frames come out in the order their messages went in. --sink-delay makes draining each frame take
+that many seconds, like a slow sender downstream.
+
+    python -m benchmarks.listener --workers 1,2,4,8 --executions inline,process --messages 20000 --output listener.json
+"""
+from argparse import ArgumentParser
+from asyncio import CancelledError
+from asyncio import create_task
+from asyncio import gather
+from asyncio import run
+from asyncio import sleep
+from itertools import product
+from pathlib import Path
+from time import perf_counter
+import json
+import logging
+import sys
+
+from mqtt_to_aprs.utils.capture import CapturedMessage
+from mqtt_to_aprs.utils.metrics import ServiceMetrics
+from mqtt_to_aprs.utils.mqtt import MQTTListener
+from mqtt_to_aprs.utils.queues import OutputQueue
+from mqtt_to_aprs.utils.queues import mark_done
+from mqtt_to_aprs.utils.replay import ReplayClient
+
+from .e2e import MAX_MESSAGES
+from .e2e import SEQUENCE
+from .e2e import environment
+from .e2e import make_config
+from .e2e import make_payload
+
+
+class OrderedDrain:
+    """Takes frames off an output queue, checking each topic's sequence numbers only go up"""
+
+    def __init__(self, queue: OutputQueue, sink_delay: float) -> None:
+        self.queue = queue
+        self.sink_delay = sink_delay
+        self.frames = 0
+        self.out_of_order = 0
+        self._last: dict[str, int] = {}
+
+    async def run(self) -> None:
+        try:
+            while True:
+                frame = await self.queue.get()
+                seq = int(SEQUENCE.search(frame.info).group(1))
+                if seq < self._last.get(frame.topic, -1):
+                    self.out_of_order += 1
+                self._last[frame.topic] = seq
+                self.frames += 1
+                if self.sink_delay > 0:
+                    await sleep(self.sink_delay)
+                mark_done(self.queue, frame)
+        except CancelledError:
+            pass
+
+
+async def run_scenario(topics: int, workers: int, execution: str, messages: int, payload_size: int,
+                       queue_size: int, sink_delay: float, metrics: ServiceMetrics | None = None) -> dict[str, any]:
+    config = make_config(topics, 0, 0, None, workers, execution)
+    generated = (CapturedMessage(f"bench/{seq % topics}", 0.0, make_payload(seq, payload_size))
+                 for seq in range(messages))
+    client = ReplayClient(generated, speed=0.0)
+    internet_queue = OutputQueue(maxsize=queue_size, name="aprsis")
+    kiss_queue = OutputQueue(maxsize=queue_size, name="kiss")
+    listener = MQTTListener(config=config, mqtt_client=client, internet_queue=internet_queue, kiss_queue=kiss_queue,
+                            listener_id="bench", metrics=metrics)
+    drains = [OrderedDrain(queue, sink_delay) for queue in (internet_queue, kiss_queue)]
+    tasks = [create_task(drain.run()) for drain in drains]
+
+    await listener.connect()
+    started = perf_counter()
+    await listener.listen()
+    await gather(internet_queue.join(), kiss_queue.join())
+    elapsed = perf_counter() - started
+    for task in tasks:
+        task.cancel()
+    return {
+        "topics": topics,
+        "workers": workers,
+        "execution": execution,
+        "messages": client.sent,
+        "frames": sum(drain.frames for drain in drains),
+        "out_of_order": sum(drain.out_of_order for drain in drains),
+        "seconds": elapsed,
+        "messages_per_second": client.sent / elapsed,
+    }
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma separated listener worker counts to sweep")
+    parser.add_argument("--executions", default="inline,process", help="Comma separated execution modes to sweep")
+    parser.add_argument("--topics", type=int, default=100, help="Topics the messages are spread over")
+    parser.add_argument("--messages", type=int, default=20000, help="Messages to send in each scenario")
+    parser.add_argument("--payload-size", type=int, default=512, help="Payload size in bytes")
+    parser.add_argument("--queue-size", type=int, default=1000, help="Size limit of each output queue, 0 for none")
+    parser.add_argument("--sink-delay", type=float, default=0.0, help="Seconds each drained frame takes")
+    parser.add_argument("--output", type=Path, default=None, help="File to write the JSON results to, defaults to stdout")
+    args = parser.parse_args()
+    if not 0 < args.messages <= MAX_MESSAGES:
+        parser.error(f"--messages must be between 1 and {MAX_MESSAGES}")
+    logging.basicConfig(level=logging.WARNING)
+
+    results = []
+    for execution, workers in product(args.executions.split(","), [int(value) for value in args.workers.split(",")]):
+        result = run(run_scenario(args.topics, workers, execution, args.messages, args.payload_size, args.queue_size,
+                                  args.sink_delay))
+        print(f"{execution:>7} workers {workers:>3}: {result['messages_per_second']:>9.0f} msgs/s, "
+              f"{result['frames']} frames, {result['out_of_order']} out of order", file=sys.stderr)
+        results.append(result)
+
+    options = {"topics": args.topics, "messages": args.messages, "payload_size": args.payload_size,
+               "queue_size": args.queue_size, "sink_delay": args.sink_delay}
+    report = json.dumps({"environment": environment(), "options": options, "results": results}, indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        args.output.write_text(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
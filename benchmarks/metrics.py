@@ -0,0 +1,83 @@
+"""Metrics overhead benchmarks, the listener pipeline with metrics on against off
+
+Runs the listener load scenario from benchmarks.listener with and without ServiceMetrics, alternating between
+the two so drift on the machine hits both alike, and reports the best messages a second of each and the
+overhead. Also times the hot path calls on their own, a counter increment and a histogram observation, and
+rendering the scrape page for the topics the scenario used.
+
+    python -m benchmarks.metrics --runs 5 --messages 20000 --output metrics.json
+"""
+from argparse import ArgumentParser
+from asyncio import run
+from pathlib import Path
+from time import perf_counter
+import json
+import logging
+import sys
+
+from mqtt_to_aprs.utils.metrics import ServiceMetrics
+
+from .e2e import MAX_MESSAGES
+from .e2e import environment
+from .listener import run_scenario
+
+
+def per_call_ns(function, calls: int, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = perf_counter()
+        for _ in range(calls):
+            function()
+        best = min(best, perf_counter() - started)
+    return best / calls * 1e9
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Runs each of metrics on and off, taking the best")
+    parser.add_argument("--topics", type=int, default=100, help="Topics the messages are spread over")
+    parser.add_argument("--messages", type=int, default=20000, help="Messages to send in each run")
+    parser.add_argument("--payload-size", type=int, default=512, help="Payload size in bytes")
+    parser.add_argument("--workers", type=int, default=1, help="Listener workers")
+    parser.add_argument("--output", type=Path, default=None, help="File to write the JSON results to, defaults to stdout")
+    args = parser.parse_args()
+    if not 0 < args.messages <= MAX_MESSAGES:
+        parser.error(f"--messages must be between 1 and {MAX_MESSAGES}")
+    logging.basicConfig(level=logging.WARNING)
+
+    runs = {"off": [], "on": []}
+    metrics = None
+    for _ in range(args.runs):
+        for mode in runs:
+            metrics = ServiceMetrics() if mode == "on" else None
+            result = run(run_scenario(args.topics, args.workers, "inline", args.messages, args.payload_size, 1000, 0.0,
+                                      metrics=metrics))
+            runs[mode].append(result["messages_per_second"])
+    off, on = max(runs["off"]), max(runs["on"])
+
+    # the last run had metrics on, so its registry has a series for every topic
+    counter = metrics.messages
+    histogram = metrics.decode
+    hot_path = {
+        "counter_inc_ns": per_call_ns(lambda: counter.inc("bench/1"), 100000),
+        "histogram_observe_ns": per_call_ns(lambda: histogram.observe(0.0003, "bench/1"), 100000),
+        "render_ms": per_call_ns(metrics.registry.render, 20) / 1e6,
+        "render_bytes": len(metrics.registry.render()),
+    }
+    results = {"off_messages_per_second": off, "on_messages_per_second": on, "overhead_percent": (off - on) / off * 100,
+               "runs": runs, "hot_path": hot_path}
+    print(f"metrics off {off:.0f} msgs/s, on {on:.0f} msgs/s, {results['overhead_percent']:.1f}% overhead; counter "
+          f"{hot_path['counter_inc_ns']:.0f}ns, histogram {hot_path['histogram_observe_ns']:.0f}ns, render "
+          f"{hot_path['render_ms']:.2f}ms for {hot_path['render_bytes']} bytes", file=sys.stderr)
+
+    options = {"runs": args.runs, "topics": args.topics, "messages": args.messages, "payload_size": args.payload_size,
+               "workers": args.workers}
+    report = json.dumps({"environment": environment(), "options": options, "results": results}, indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        args.output.write_text(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
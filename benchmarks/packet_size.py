@@ -0,0 +1,65 @@
+"""Packet size report, uncompressed against compressed positions
+
+Prints the information field and AX.25 frame sizes of a few typical weather reports in both position formats,
+and their airtime on a 1200 baud channel.
+
+    python -m benchmarks.packet_size --output sizes.json
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+import json
+import sys
+
+from mqtt_to_aprs.utils.packet import encode_compressed_position
+from mqtt_to_aprs.utils.packet import encode_compressed_wind
+from mqtt_to_aprs.utils.packet import encode_position
+from mqtt_to_aprs.utils.packet.ax25 import ui_header
+from mqtt_to_aprs.utils.packet.weather import encode_position_weather_packet
+from mqtt_to_aprs.utils.packet.weather import encode_weather_data
+from mqtt_to_aprs.utils.scheduler import AirtimeScheduler
+
+from .e2e import environment
+
+LATITUDE, LONGITUDE = 28.979480, -98.51329
+REPORTS = {
+    "temperature_only": {"temperature": 71},
+    "wind": {"wind_dir": 270, "wind_speed": 12, "wind_gust": 20, "temperature": 71},
+    "full": {"wind_dir": 270, "wind_speed": 12, "wind_gust": 20, "temperature": 71, "rain_last_hr": 5,
+             "rain_last_24_hrs": 40, "rain_since_midnight": 12, "humidity": 45, "pressure": 10150},
+}
+
+
+def sizes(report: dict[str, int], header: bytes, channel: AirtimeScheduler) -> dict[str, dict[str, float]]:
+    uncompressed = encode_position_weather_packet(encode_position(LATITUDE, LONGITUDE), encode_weather_data(**report))
+    weather = {key: value for key, value in report.items() if key not in ("wind_dir", "wind_speed")}
+    compressed = encode_position_weather_packet(
+        encode_compressed_position(LATITUDE, LONGITUDE) + encode_compressed_wind(report.get("wind_dir"), report.get("wind_speed")),
+        encode_weather_data(**weather, compressed=True))
+    return {name: {"info_bytes": len(info), "frame_bytes": len(header) + len(info),
+                   "airtime_ms": channel.airtime(len(header) + len(info)) * 1000}
+            for name, info in (("uncompressed", uncompressed), ("compressed", compressed))}
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baud-rate", type=int, default=1200, help="RF channel baud rate for the airtime estimate")
+    parser.add_argument("--output", type=Path, default=None, help="File to write the JSON results to, defaults to stdout")
+    args = parser.parse_args()
+
+    header = ui_header("N0CALL-13", ("WIDE1-1", "WIDE2-1"))
+    channel = AirtimeScheduler(baud_rate=args.baud_rate)
+    results = {name: sizes(report, header, channel) for name, report in REPORTS.items()}
+    for name, result in results.items():
+        saved = result["uncompressed"]["info_bytes"] - result["compressed"]["info_bytes"]
+        print(f"{name:>16}: {result['uncompressed']['info_bytes']}B -> {result['compressed']['info_bytes']}B info, "
+              f"{saved} bytes and {result['uncompressed']['airtime_ms'] - result['compressed']['airtime_ms']:.1f}ms "
+              f"of airtime saved", file=sys.stderr)
+    report = json.dumps({"environment": environment(), "results": results}, indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        args.output.write_text(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
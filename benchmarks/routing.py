@@ -0,0 +1,128 @@
+"""Topic routing benchmarks, the TopicRouter trie against scanning every filter, with 10 to 10k configured topics
+
+Each configured topic is a real MQTTTopicConfig. One in ten is a `+` wildcard for a fleet of stations, the rest
+are literal station topics. Lookups are a shuffled mix of topics that hit literal filters, topics that only match
+a wildcard, and topics no filter matches. Reports nanoseconds per lookup for the trie with its cache of recent
+resolutions, the trie with the cache off, and a linear scan matching every filter in turn.
+
+    python -m benchmarks.routing --topics 10,1000,10000 --output routing.json
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+from random import Random
+from time import perf_counter
+import json
+import sys
+
+from aiomqtt import Topic
+from aiomqtt import Wildcard
+
+from mqtt_to_aprs.config import MQTTTopicConfig
+from mqtt_to_aprs.utils.topic import TopicRouter
+
+from .e2e import environment
+
+TRANSLATOR = {"type": "jmespath", "config": {"fields": {"temperature_c": "temperature_c"}}}
+
+
+def make_topics(count: int) -> list[MQTTTopicConfig]:
+    return [MQTTTopicConfig(topic=f"fleet/{index}/+/weather" if index % 10 == 0 else f"stations/{index}/weather",
+                            target="is", translator=TRANSLATOR)
+            for index in range(count)]
+
+
+def make_lookups(count: int, lookups: int, seed: int) -> list[str]:
+    """Topics as they'd come in from the broker, mostly routed, some through a wildcard, a few not at all"""
+    random = Random(seed)  # nosec B311 - benchmark data, not crypto
+    topics = []
+    for _ in range(lookups):
+        index = random.randrange(count)
+        roll = random.random()
+        if roll < 0.05:
+            topics.append(f"unknown/{index}/weather")
+        elif index % 10 == 0:
+            topics.append(f"fleet/{index}/station{random.randrange(100)}/weather")
+        else:
+            topics.append(f"stations/{index}/weather")
+    return topics
+
+
+def linear_lookup(filters: list[tuple[Wildcard, MQTTTopicConfig]], topic: str) -> MQTTTopicConfig | None:
+    """What routing costs without an index, every filter checked in turn"""
+    message_topic = Topic(topic)
+    for topic_filter, value in filters:
+        if message_topic.matches(topic_filter):
+            return value
+    return None
+
+
+def per_lookup_ns(lookup, topics: list[str], repeat: int) -> float:
+    """Best of repeat passes over topics, in nanoseconds a lookup"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = perf_counter()
+        for topic in topics:
+            lookup(topic)
+        best = min(best, perf_counter() - started)
+    return best / len(topics) * 1e9
+
+
+def run_case(count: int, lookups: int, linear_lookups: int, repeat: int, seed: int) -> dict[str, any]:
+    configs = make_topics(count)
+    topics = make_lookups(count, lookups, seed)
+
+    started = perf_counter()
+    cached = TopicRouter()
+    for config in configs:
+        cached.add(config.topic, config)
+    build_ms = (perf_counter() - started) * 1000
+    uncached = TopicRouter(cache_size=0)
+    for config in configs:
+        uncached.add(config.topic, config)
+    filters = [(Wildcard(config.topic), config) for config in configs]
+
+    for topic in topics[:linear_lookups]:
+        if linear_lookup(filters, topic) is not uncached.get(topic):
+            raise AssertionError(f"The trie and the linear scan disagree about {topic}")
+
+    return {
+        "topics": count,
+        "build_ms": build_ms,
+        "ns_per_lookup": {
+            "trie_cached": per_lookup_ns(cached.get, topics, repeat),
+            "trie_uncached": per_lookup_ns(uncached.get, topics, repeat),
+            "linear_scan": per_lookup_ns(lambda topic: linear_lookup(filters, topic), topics[:linear_lookups], repeat),
+        },
+    }
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", default="10,1000,10000", help="Comma separated configured topic counts to sweep")
+    parser.add_argument("--lookups", type=int, default=100000, help="Topics to route in each pass")
+    parser.add_argument("--linear-lookups", type=int, default=200,
+                        help="Topics to route with the linear scan, which is far slower with many topics")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes to take the best of")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the generated topics")
+    parser.add_argument("--output", type=Path, default=None, help="File to write the JSON results to, defaults to stdout")
+    args = parser.parse_args()
+
+    results = []
+    for count in [int(value) for value in args.topics.split(",")]:
+        result = run_case(count, args.lookups, args.linear_lookups, args.repeat, args.seed)
+        timings = result["ns_per_lookup"]
+        print(f"topics {count:>6}: trie {timings['trie_cached']:>8.0f}ns cached {timings['trie_uncached']:>8.0f}ns "
+              f"uncached, linear scan {timings['linear_scan']:>11.0f}ns, built in {result['build_ms']:.1f}ms",
+              file=sys.stderr)
+        results.append(result)
+
+    options = {"lookups": args.lookups, "linear_lookups": args.linear_lookups, "repeat": args.repeat, "seed": args.seed}
+    report = json.dumps({"environment": environment(), "options": options, "results": results}, indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        args.output.write_text(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Process scaling benchmarks, how listener throughput grows with worker processes on CPU bound payloads
+
+Runs the listener load scenario from benchmarks.listener once inline on the event loop, then with process
+execution for each worker count from 1 up to --max-workers, which defaults to the number of cores. Payloads
+are large, so decoding and translating dominate. Reports messages a second and the speedup and efficiency
+against one worker process, and against running inline.
+
+    python -m benchmarks.scaling --max-workers 8 --messages 50000 --payload-size 8192 --output scaling.json
+"""
+from argparse import ArgumentParser
+from asyncio import run
+from pathlib import Path
+import json
+import logging
+import os
+import sys
+
+from .e2e import MAX_MESSAGES
+from .e2e import environment
+from .listener import run_scenario
+
+
+def worker_counts(max_workers: int) -> list[int]:
+    """1, 2, 4 and so on up to max_workers, always ending on max_workers"""
+    counts = []
+    workers = 1
+    while workers < max_workers:
+        counts.append(workers)
+        workers *= 2
+    return counts + [max_workers]
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="Most worker processes to run")
+    parser.add_argument("--topics", type=int, default=1000, help="Topics the messages are spread over")
+    parser.add_argument("--messages", type=int, default=50000, help="Messages to send in each scenario")
+    parser.add_argument("--payload-size", type=int, default=8192, help="Payload size in bytes")
+    parser.add_argument("--queue-size", type=int, default=1000, help="Size limit of each output queue, 0 for none")
+    parser.add_argument("--output", type=Path, default=None, help="File to write the JSON results to, defaults to stdout")
+    args = parser.parse_args()
+    if not 0 < args.messages <= MAX_MESSAGES:
+        parser.error(f"--messages must be between 1 and {MAX_MESSAGES}")
+    logging.basicConfig(level=logging.WARNING)
+
+    def scenario(workers: int, execution: str) -> dict[str, any]:
+        return run(run_scenario(args.topics, workers, execution, args.messages, args.payload_size, args.queue_size, 0.0))
+
+    inline = scenario(1, "inline")
+    print(f" inline          : {inline['messages_per_second']:>9.0f} msgs/s", file=sys.stderr)
+    results = []
+    for workers in worker_counts(args.max_workers):
+        result = scenario(workers, "process")
+        # worker_counts always starts at one process
+        single = results[0] if results else result
+        result["speedup"] = result["messages_per_second"] / single["messages_per_second"]
+        result["efficiency"] = result["speedup"] / workers
+        result["speedup_over_inline"] = result["messages_per_second"] / inline["messages_per_second"]
+        print(f"process workers {workers:>3}: {result['messages_per_second']:>9.0f} msgs/s, {result['speedup']:.2f}x "
+              f"one process ({result['efficiency'] * 100:.0f}% efficient), {result['speedup_over_inline']:.2f}x inline, "
+              f"{result['out_of_order']} out of order", file=sys.stderr)
+        results.append(result)
+
+    options = {"topics": args.topics, "messages": args.messages, "payload_size": args.payload_size,
+               "queue_size": args.queue_size, "cpu_count": os.cpu_count()}
+    report = json.dumps({"environment": environment(), "options": options, "inline": inline, "results": results},
+                        indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        args.output.write_text(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Startup benchmarks for the mqtt2aprs cli, a regression check on import time and config loading
+
+Runs `mqtt2aprs check-config` in fresh interpreters under `python -X importtime`. Each run reports the
+total import time, the slowest modules, and the wall time with the config cache cold and warm. It fails
+when a heavy module that check-config doesn't need gets imported, or when an import time limit is
+exceeded.
+
+    python -m benchmarks.startup --runs 5 --max-import-ms 250 --output startup.json
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+import os
+import re
+import subprocess  # nosec
+import sys
+
+from .e2e import environment
+
+CONFIG = """
+[logging]
+
+[aprs]
+callsign = "N0CALL"
+password = -1
+
+[kiss]
+
+[location]
+latitude = 28.979480
+longitude = -98.51329
+
+[mqtt]
+host = "localhost"
+port = 1883
+
+[[mqtt.topics]]
+topic = "bench/+/weather"
+target = ["is", "kiss"]
+
+[mqtt.topics.translator]
+type = "jmespath"
+
+[mqtt.topics.translator.config.fields]
+temperature_c = "temperature_C"
+humidity = "humidity"
+"""
+# check-config only needs the config, none of the networking or packet code. jmespath is allowed, validating a
+# config compiles its field paths
+FORBIDDEN = ("aiomqtt", "aprs", "mqtt_to_aprs.utils.service", "mqtt_to_aprs.utils.mqtt")
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+COMMAND = "from mqtt_to_aprs.cli import cli; cli(['-c', {config!r}, 'check-config'])"
+
+
+def run_once(config: Path, cache_dir: Path) -> dict[str, any]:
+    """Runs check-config once in a new interpreter, returns its wall time and what it imported"""
+    env = {**os.environ, "MQTT2APRS_CACHE_DIR": str(cache_dir)}
+    started = perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", COMMAND.format(config=str(config))],  # nosec
+                            capture_output=True, text=True, env=env, check=True)
+    wall = perf_counter() - started
+    imports = {}
+    total = 0
+    for match in IMPORT_LINE.finditer(result.stderr):
+        _, cumulative, indent, module = match.groups()
+        imports[module] = int(cumulative)
+        if len(indent) == 1:
+            # top level imports, their cumulative times add up to the whole
+            total += int(cumulative)
+    return {"wall_ms": wall * 1000, "import_ms": total / 1000, "imports": imports}
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Runs of each of the cold and warm cache cases")
+    parser.add_argument("--max-import-ms", type=float, default=None,
+                        help="Fail if the median import time with a warm cache is over this")
+    parser.add_argument("--output", type=Path, default=None, help="File to write the JSON results to, defaults to stdout")
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as tmp:
+        config = Path(tmp) / "config.toml"
+        config.write_text(CONFIG)
+        cold = [run_once(config, Path(tmp) / f"cold-{index}") for index in range(args.runs)]
+        warm_cache = Path(tmp) / "warm"
+        run_once(config, warm_cache)
+        warm = [run_once(config, warm_cache) for _ in range(args.runs)]
+
+    slowest = sorted(cold[0]["imports"].items(), key=lambda item: item[1], reverse=True)[:15]
+    forbidden = sorted({module for run in cold + warm for module in run["imports"]
+                        if module.split(".")[0] in FORBIDDEN or module in FORBIDDEN})
+    results = {
+        "environment": environment(),
+        "cold": {"wall_ms": median(run["wall_ms"] for run in cold), "import_ms": median(run["import_ms"] for run in cold)},
+        "warm": {"wall_ms": median(run["wall_ms"] for run in warm), "import_ms": median(run["import_ms"] for run in warm)},
+        "slowest_imports_ms": {module: microseconds / 1000 for module, microseconds in slowest},
+        "forbidden_imports": forbidden,
+    }
+    print(f"check-config cold cache {results['cold']['wall_ms']:.1f}ms ({results['cold']['import_ms']:.1f}ms importing), "
+          f"warm cache {results['warm']['wall_ms']:.1f}ms ({results['warm']['import_ms']:.1f}ms importing)", file=sys.stderr)
+    report = json.dumps(results, indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        args.output.write_text(report + "\n")
+
+    failed = False
+    if forbidden:
+        print(f"check-config imported {', '.join(forbidden)}", file=sys.stderr)
+        failed = True
+    if args.max_import_ms is not None and results["warm"]["import_ms"] > args.max_import_ms:
+        print(f"Import time {results['warm']['import_ms']:.1f}ms is over {args.max_import_ms}ms", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
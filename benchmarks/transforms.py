@@ -0,0 +1,126 @@
+"""Transform benchmarks, the overhead compiled field transforms add to each message
+
+Times each transform on its own, compiled into closures as the translator runs it, against walking its syntax
+tree on every call and against eval of a precompiled code object. Then times a WeatherFieldPlan over realistic
+payloads with and without the transforms, which is the cost a message actually pays.
+
+    python -m benchmarks.transforms --messages 20000 --output transforms.json
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+from time import perf_counter
+import ast
+import json
+import sys
+
+from mqtt_to_aprs.config import JMESPathWeatherFields
+from mqtt_to_aprs.utils.transform import FUNCTIONS
+from mqtt_to_aprs.utils.transform import VALUE
+from mqtt_to_aprs.utils.transform import compile_transform
+from mqtt_to_aprs.utils.translator.jmespath import WeatherFieldPlan
+
+from .e2e import environment
+
+FIELDS = {"temperature_f": "temp_f", "wind_speed": "wind_kph", "wind_gust": "gust_kph", "rain_last_hr": "rain_mm_hr",
+          "humidity": "humidity"}
+# km/h to mph, the larger of two readings, mm to hundredths of an inch
+TRANSFORMS = {"wind_speed": "value * 0.621371", "wind_gust": "max(value, wind_speed) * 0.621371",
+              "rain_last_hr": "round(value / 0.254)", "temperature_f": "value * 1.8 + 32"}
+OPERATORS = {ast.Add: float.__add__, ast.Sub: float.__sub__, ast.Mult: float.__mul__, ast.Div: float.__truediv__}
+
+
+def make_message(seq: int) -> dict[str, any]:
+    return {"temp_f": 20.0 + seq % 10, "wind_kph": seq % 50, "gust_kph": seq % 70, "rain_mm_hr": seq % 20,
+            "humidity": 40 + seq % 50, "station": "backyard"}
+
+
+def interpret(node: ast.AST, field: str, values: dict[str, any]) -> float:
+    """Evaluates a transform's syntax tree directly, what compiling it once saves doing on every message"""
+    match node:
+        case ast.Constant(value=value):
+            return value
+        case ast.Name(id=name):
+            return float(values[field if name == VALUE else name])
+        case ast.BinOp(left=left, op=op, right=right):
+            return OPERATORS[type(op)](float(interpret(left, field, values)), float(interpret(right, field, values)))
+        case ast.Call(func=ast.Name(id=name), args=args):
+            return FUNCTIONS[name](*(interpret(arg, field, values) for arg in args))
+        case _:
+            raise ValueError(f"{ast.unparse(node)} is not supported")
+
+
+def per_call_ns(run, values: list[dict[str, any]], repeat: int) -> float:
+    """Best of repeat passes over values, in nanoseconds a call"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = perf_counter()
+        for value in values:
+            run(value)
+        best = min(best, perf_counter() - started)
+    return best / len(values) * 1e9
+
+
+def transform_cases(messages: int, repeat: int) -> list[dict[str, any]]:
+    plan = WeatherFieldPlan.from_fields(JMESPathWeatherFields(**FIELDS))
+    extracted = [plan.expression.search(make_message(seq)) for seq in range(messages)]
+    field_names = tuple(JMESPathWeatherFields.model_fields)
+    results = []
+    for field, expression in TRANSFORMS.items():
+        compiled = compile_transform(expression, field, field_names)
+        tree = ast.parse(expression, mode="eval").body
+        code = compile(expression, "<transform>", "eval")
+        namespace = {"__builtins__": {}, **FUNCTIONS}
+
+        def evaluate(values: dict[str, any]) -> float:
+            return eval(code, namespace, {**values, VALUE: values[field]})  # nosec B307 - the baseline being measured
+
+        for values in extracted[:100]:
+            expected = compiled(values)
+            if interpret(tree, field, values) != expected or evaluate(values) != expected:
+                raise AssertionError(f"{expression} disagrees about {values}")
+        results.append({"field": field, "expression": expression, "ns_per_call": {
+            "compiled": per_call_ns(compiled, extracted, repeat),
+            "interpreted": per_call_ns(lambda values: interpret(tree, field, values), extracted, repeat),
+            "eval": per_call_ns(evaluate, extracted, repeat),
+        }})
+    return results
+
+
+def plan_case(messages: int, repeat: int) -> dict[str, float]:
+    fields = JMESPathWeatherFields(**FIELDS)
+    plain = WeatherFieldPlan.from_fields(fields)
+    transformed = WeatherFieldPlan.from_fields(fields, TRANSFORMS)
+    payloads = [make_message(seq) for seq in range(messages)]
+    without = per_call_ns(plain.apply, payloads, repeat) / 1000
+    with_transforms = per_call_ns(transformed.apply, payloads, repeat) / 1000
+    return {"transforms": len(TRANSFORMS), "without_us": without, "with_us": with_transforms,
+            "overhead_us": with_transforms - without}
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000, help="Messages to run in each pass")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes to take the best of")
+    parser.add_argument("--output", type=Path, default=None, help="File to write the JSON results to, defaults to stdout")
+    args = parser.parse_args()
+
+    transforms = transform_cases(args.messages, args.repeat)
+    for result in transforms:
+        timings = result["ns_per_call"]
+        print(f"{result['expression']:>36}: compiled {timings['compiled']:>6.0f}ns, interpreted "
+              f"{timings['interpreted']:>6.0f}ns, eval {timings['eval']:>6.0f}ns", file=sys.stderr)
+    plan = plan_case(args.messages, args.repeat)
+    print(f"plan without transforms {plan['without_us']:.2f}us, with {plan['transforms']} {plan['with_us']:.2f}us, "
+          f"{plan['overhead_us']:.2f}us a message", file=sys.stderr)
+
+    options = {"messages": args.messages, "repeat": args.repeat}
+    report = json.dumps({"environment": environment(), "options": options, "transforms": transforms, "plan": plan},
+                        indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        args.output.write_text(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""JMESPath translation micro-benchmarks, per-field searches against a precompiled WeatherFieldPlan
+
+Pulls weather fields out of realistic decoded payloads three ways: the original per-field loop that searches the
+message once for each configured field, jmespath_weather_fields, which builds a plan on every call, and a plan
+built once and reused the way the listener does. Reports microseconds per message for each, and checks that all
+three agree.
+
+    python -m benchmarks.translation --messages 20000 --output translation.json
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+from time import perf_counter
+import json
+import logging
+import sys
+
+from mqtt_to_aprs.config import JMESPathWeatherFields
+from mqtt_to_aprs.utils.translator.jmespath import WeatherFieldPlan
+from mqtt_to_aprs.utils.translator.jmespath import c_to_f
+from mqtt_to_aprs.utils.translator.jmespath import get_compiled_jmespath
+from mqtt_to_aprs.utils.translator.jmespath import hg_to_mbar
+from mqtt_to_aprs.utils.translator.jmespath import jmespath_weather_fields
+
+from .e2e import environment
+
+# an rtl_433 style report, flat with a few fields the translator ignores, and a nested gateway style report
+PAYLOADS = {
+    "flat": {
+        "fields": {"temperature_c": "temperature_C", "humidity": "humidity", "wind_dir": "wind_dir_deg",
+                   "wind_speed": "wind_avg_mi_h", "wind_gust": "wind_max_mi_h", "rain_since_midnight": "rain_in",
+                   "pressure_mbar": "pressure_hPa"},
+        "message": lambda seq: {"time": "2024-05-01 12:00:00", "model": "Fineoffset-WH65B", "id": seq % 256,
+                                "battery_ok": 1, "temperature_C": 20.0 + seq % 10, "humidity": 40 + seq % 50,
+                                "wind_dir_deg": seq % 360, "wind_avg_mi_h": seq % 30, "wind_max_mi_h": seq % 40,
+                                "rain_in": seq % 100, "pressure_hPa": 10100 + seq % 100, "uv": 3, "light_lux": 5000,
+                                "mic": "CRC"},
+    },
+    "nested": {
+        "fields": {"temperature_f": "outdoor.temperature.value", "humidity": "outdoor.humidity.value",
+                   "wind_dir": "wind.direction.value", "wind_speed": "wind.speed.value",
+                   "wind_gust": "wind.gust.value", "rain_last_hr": "rainfall.hourly.value",
+                   "rain_last_24_hrs": "rainfall.daily.value", "pressure_hg": "pressure.relative.value",
+                   "latitude": "station.location[0]", "longitude": "station.location[1]"},
+        "message": lambda seq: {
+            "station": {"name": "backyard", "location": [28.97948, -98.51329]},
+            "outdoor": {"temperature": {"value": 68 + seq % 10, "unit": "F"}, "humidity": {"value": 40 + seq % 50}},
+            "wind": {"direction": {"value": seq % 360}, "speed": {"value": seq % 30}, "gust": {"value": seq % 40}},
+            "rainfall": {"hourly": {"value": seq % 10}, "daily": {"value": seq % 100}},
+            "pressure": {"relative": {"value": 29.92}, "absolute": {"value": 29.81}},
+            "indoor": {"temperature": {"value": 72}, "humidity": {"value": 45}},
+        },
+    },
+}
+PASSTHROUGH = ("wind_dir", "wind_speed", "wind_gust", "rain_last_hr", "rain_last_24_hrs", "rain_since_midnight",
+               "humidity", "latitude", "longitude")
+
+
+def per_field(message_data: dict[str, any], fields: JMESPathWeatherFields) -> dict[str, any]:
+    """The translation as it was before plans, one search and one match statement per configured field"""
+    weather_data = {"wind_dir": None, "wind_speed": None, "wind_gust": None, "temperature": None,
+                    "rain_last_hr": None, "rain_last_24_hrs": None, "rain_since_midnight": None, "humidity": None,
+                    "pressure": None, "latitude": None, "longitude": None}
+    for key, value in fields.model_dump().items():
+        if value is None:
+            continue
+        result = get_compiled_jmespath(value).search(message_data)
+        if result is None:
+            logging.warning("No matching %s at path %s", key, value)
+            continue
+        match key:
+            case "temperature_f":
+                weather_data["temperature"] = float(result)
+            case "temperature_c":
+                if weather_data["temperature"] is None:
+                    weather_data["temperature"] = c_to_f(result)
+            case "pressure_mbar":
+                weather_data["pressure"] = float(result)
+            case "pressure_hg":
+                if weather_data["pressure"] is None:
+                    weather_data["pressure"] = hg_to_mbar(float(result))
+        if key in list(PASSTHROUGH):
+            weather_data[key] = result
+    return weather_data
+
+
+def per_message_us(translate, messages: list[dict[str, any]], repeat: int) -> float:
+    """Best of repeat passes over messages, in microseconds a message"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = perf_counter()
+        for message in messages:
+            translate(message)
+        best = min(best, perf_counter() - started)
+    return best / len(messages) * 1e6
+
+
+def run_case(name: str, count: int, repeat: int) -> dict[str, any]:
+    fields = JMESPathWeatherFields(**PAYLOADS[name]["fields"])
+    messages = [PAYLOADS[name]["message"](seq) for seq in range(count)]
+    plan = WeatherFieldPlan.from_fields(fields)
+    for message in messages[:100]:
+        expected = per_field(message, fields)
+        if jmespath_weather_fields(message, fields) != expected or plan.apply(message) != expected:
+            raise AssertionError(f"The {name} translations disagree about {message}")
+
+    timings = {
+        "per_field": per_message_us(lambda message: per_field(message, fields), messages, repeat),
+        "plan_per_call": per_message_us(lambda message: jmespath_weather_fields(message, fields), messages, repeat),
+        "plan": per_message_us(plan.apply, messages, repeat),
+    }
+    return {"payload": name, "fields": len(PAYLOADS[name]["fields"]), "us_per_message": timings,
+            "speedup": timings["per_field"] / timings["plan"]}
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payloads", default=",".join(PAYLOADS), help="Comma separated payload shapes to run")
+    parser.add_argument("--messages", type=int, default=20000, help="Messages to translate in each pass")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes to take the best of")
+    parser.add_argument("--output", type=Path, default=None, help="File to write the JSON results to, defaults to stdout")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.payloads.split(","):
+        result = run_case(name, args.messages, args.repeat)
+        timings = result["us_per_message"]
+        print(f"{name:>8} ({result['fields']} fields): per field {timings['per_field']:.2f}us, plan built each call "
+              f"{timings['plan_per_call']:.2f}us, plan {timings['plan']:.2f}us, {result['speedup']:.1f}x",
+              file=sys.stderr)
+        results.append(result)
+
+    options = {"messages": args.messages, "repeat": args.repeat}
+    report = json.dumps({"environment": environment(), "options": options, "results": results}, indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        args.output.write_text(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
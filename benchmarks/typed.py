@@ -0,0 +1,121 @@
+"""Typed topic benchmarks, a schema compiled from the field paths against JSON decoding plus JMESPath
+
+Runs the same nested weather payloads through a typed topic and a json topic with identical field paths, and
+through the original message_json and jmespath_weather_fields path. Reports microseconds a message to extract the
+weather fields, to produce the whole frame, and to reject a malformed payload. The typed topic rejects one
+while decoding, the json topic only finds out in the translator.
+
+    python -m benchmarks.typed --sizes 256,4096 --messages 20000 --output typed.json
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+from time import perf_counter
+import json
+import sys
+
+from mqtt_to_aprs.config import JMESPathWeatherFields
+from mqtt_to_aprs.config import MQTTTopicConfig
+from mqtt_to_aprs.utils.pipeline import CompiledTopic
+from mqtt_to_aprs.utils.translator.jmespath import jmespath_weather_fields
+
+from .e2e import environment
+from .e2e import make_config
+
+FIELDS = {"temperature_c": "outdoor.temperature", "humidity": "outdoor.humidity", "wind_dir": "wind.direction",
+          "wind_speed": "wind.speed", "wind_gust": "wind.gust", "rain_last_hr": "rain.hourly",
+          "pressure_mbar": "pressure.relative"}
+
+
+def make_payload(seq: int, size: int, malformed: bool = False) -> bytes:
+    """A nested weather report padded out to about size bytes with readings no translator reads"""
+    report = {"station": "backyard", "outdoor": {"temperature": "hot" if malformed else 20.5 + seq % 10,
+                                                 "humidity": 40 + seq % 50},
+              "wind": {"direction": seq % 360, "speed": seq % 30, "gust": seq % 40},
+              "rain": {"hourly": seq % 10, "daily": seq % 100}, "pressure": {"relative": 10100 + seq % 100},
+              "indoor": {"temperature": 22.0, "humidity": 45}, "pad": ""}
+    report["pad"] = "x" * max(0, size - len(json.dumps(report)))
+    return json.dumps(report).encode("utf-8")
+
+
+def per_message_us(run, payloads: list[bytes], repeat: int, errors: bool = False) -> float:
+    """Best of repeat passes over payloads, in microseconds a message"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = perf_counter()
+        for payload in payloads:
+            try:
+                run(payload)
+            except (ValueError, TypeError):
+                if not errors:
+                    raise
+        best = min(best, perf_counter() - started)
+    return best / len(payloads) * 1e6
+
+
+def run_case(size: int, messages: int, repeat: int) -> dict[str, any]:
+    config = make_config(1, 0, 0, None, 1, "inline")
+    topics = {input_type: CompiledTopic.from_config(MQTTTopicConfig(
+        topic="bench/typed", input_type=input_type, target="is",
+        translator={"type": "jmespath", "config": {"fields": FIELDS}}), config) for input_type in ("json", "typed")}
+    json_topic, typed_topic = topics["json"], topics["typed"]
+    fields = JMESPathWeatherFields(**FIELDS)
+    plan = json_topic.translator.plan
+    payloads = [make_payload(seq, size) for seq in range(messages)]
+    malformed = [make_payload(seq, size, malformed=True) for seq in range(messages)]
+
+    def original(payload: bytes) -> dict[str, any]:
+        return jmespath_weather_fields(json.loads(payload.decode("utf-8")), fields)
+
+    for payload in payloads[:100]:
+        expected = original(payload)
+        if plan.apply(json_topic.decoder(payload)) != expected or plan.convert(typed_topic.decoder(payload)) != expected:
+            raise AssertionError(f"The typed and json topics disagree about {payload!r}")
+        if json_topic.run("bench/typed", payload) != typed_topic.run("bench/typed", payload):
+            raise AssertionError(f"The typed and json topics make different frames from {payload!r}")
+
+    return {
+        "payload_size": len(payloads[0]),
+        "extract_us": {
+            "message_json_jmespath": per_message_us(original, payloads, repeat),
+            "json_plan": per_message_us(lambda payload: plan.apply(json_topic.decoder(payload)), payloads, repeat),
+            "typed": per_message_us(lambda payload: plan.convert(typed_topic.decoder(payload)), payloads, repeat),
+        },
+        "frame_us": {
+            "json": per_message_us(lambda payload: json_topic.run("bench/typed", payload), payloads, repeat),
+            "typed": per_message_us(lambda payload: typed_topic.run("bench/typed", payload), payloads, repeat),
+        },
+        "reject_us": {
+            "json": per_message_us(lambda payload: json_topic.run("bench/typed", payload), malformed, repeat, errors=True),
+            "typed": per_message_us(lambda payload: typed_topic.run("bench/typed", payload), malformed, repeat, errors=True),
+        },
+    }
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="256,4096", help="Comma separated payload sizes in bytes")
+    parser.add_argument("--messages", type=int, default=20000, help="Payloads to run in each pass")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes to take the best of")
+    parser.add_argument("--output", type=Path, default=None, help="File to write the JSON results to, defaults to stdout")
+    args = parser.parse_args()
+
+    results = []
+    for size in [int(value) for value in args.sizes.split(",")]:
+        result = run_case(size, args.messages, args.repeat)
+        extract, frame, reject = result["extract_us"], result["frame_us"], result["reject_us"]
+        print(f"{result['payload_size']:>6}B: extract message_json+jmespath {extract['message_json_jmespath']:.2f}us, "
+              f"json plan {extract['json_plan']:.2f}us, typed {extract['typed']:.2f}us; frame json {frame['json']:.2f}us, "
+              f"typed {frame['typed']:.2f}us; reject json {reject['json']:.2f}us, typed {reject['typed']:.2f}us",
+              file=sys.stderr)
+        results.append(result)
+
+    options = {"messages": args.messages, "repeat": args.repeat}
+    report = json.dumps({"environment": environment(), "options": options, "results": results}, indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        args.output.write_text(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,43 @@
 import asyncclick as click
-from ..config import DEFAULT_CONFIG_PATH
-from .config import check_config
-from .run import run
+from importlib import import_module
+from ..paths import DEFAULT_CACHE_DIR
+from ..paths import DEFAULT_CONFIG_PATH
 
+# command name -> (module, attribute), each command's module, and everything heavy it pulls in like pydantic,
+# aiomqtt and aprs, is only imported when that command runs
+COMMANDS = {
+    "check-config": (".config", "check_config"),
+    "record": (".record", "record"),
+    "replay": (".replay", "replay"),
+    "run": (".run", "run"),
+    "translate": (".translate", "translate"),
+}
 
-@click.group
+
+class LazyGroup(click.Group):
+    """A click group that imports its commands' modules the first time they're looked up"""
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(COMMANDS))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in COMMANDS and cmd_name not in self.commands:
+            module, attribute = COMMANDS[cmd_name]
+            self.add_command(getattr(import_module(module, __name__), attribute), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+
+@click.group(cls=LazyGroup)
 @click.option("-c", "--config-path", type=click.Path(exists=True), default=DEFAULT_CONFIG_PATH)
 @click.option("--load-env/--no-load-env", type=bool, default=True)
+@click.option("--config-cache/--no-config-cache", default=True,
+              help="Reuse the validated config while the file and environment are unchanged")
 @click.pass_context
-def cli(ctx, config_path, load_env):
+def cli(ctx, config_path, load_env, config_cache):
     # ensure that ctx.obj exists and is a dict (in case `cli()` is called
     # by means other than the `if` block below)
     ctx.ensure_object(dict)
 
     ctx.obj['config_path'] = config_path
     ctx.obj['load_env'] = load_env
-
-for command in [check_config, run]:
-    cli.add_command(command)
+    ctx.obj['cache_dir'] = DEFAULT_CACHE_DIR if config_cache else None
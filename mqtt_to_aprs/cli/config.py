@@ -24,7 +24,8 @@ async def _check_config(ctx, echo: bool = True):
         if load_env:
             click.echo("Will load environment variables")
     try:
-        ctx.obj['config'] = await aget_config(config_path=config_path, from_env=load_env)
+        ctx.obj['config'] = await aget_config(config_path=config_path, from_env=load_env,
+                                               cache_dir=ctx.obj.get('cache_dir'))
     except ValidationError as exc:
         click.echo("Config failed to validate")
         click.echo(exc)
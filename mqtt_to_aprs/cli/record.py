@@ -0,0 +1,35 @@
+import asyncclick as click
+from aiomqtt import Client
+from asyncio import timeout
+from time import monotonic_ns
+from time import time_ns
+from uuid import uuid4
+from ..utils.capture import CaptureWriter
+from .config import _check_config
+
+
+@click.command
+@click.argument("output", type=click.Path(dir_okay=False, writable=True))
+@click.option("--duration", type=float, default=None, help="Stop recording after this many seconds")
+@click.option("--count", type=int, default=None, help="Stop recording after this many messages")
+@click.pass_context
+async def record(ctx, output, duration, count):
+    """Record the raw messages on the configured topics to a capture file, for replay"""
+    await _check_config(ctx, echo=False)
+    config = ctx.obj['config']
+    client = Client(**config.mqtt.client_args, identifier=f"mqtt2aprs-record-{uuid4()}")
+    with CaptureWriter(output) as writer:
+        try:
+            async with timeout(duration):
+                async with client:
+                    for topic in config.mqtt.topics:
+                        await client.subscribe(topic.topic)
+                    start = monotonic_ns()
+                    writer.start(time_ns())
+                    async for message in client.messages:
+                        writer.write(str(message.topic), monotonic_ns() - start, message.payload)
+                        if count is not None and writer.messages >= count:
+                            break
+        except TimeoutError:
+            pass
+        click.echo(f"Recorded {writer.messages} messages to {output}")
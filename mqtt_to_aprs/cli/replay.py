@@ -0,0 +1,26 @@
+import asyncclick as click
+import json
+from ..utils.capture import read_capture
+from ..utils.replay import Replay
+from ..utils.replay import ReplayClient
+from .config import _check_config
+
+
+@click.command
+@click.argument("capture", type=click.Path(exists=True, dir_okay=False))
+@click.option("--speed", type=float, default=1.0, help="Replay this many times faster than recorded, 0 for as fast as possible")
+@click.option("--json", "as_json", is_flag=True, default=False, help="Print the report as JSON")
+@click.pass_context
+async def replay(ctx, capture, speed, as_json):
+    """Replay a capture file through the translators, reporting throughput and latency for each stage"""
+    await _check_config(ctx, echo=False)
+    client = ReplayClient(read_capture(capture), speed=speed)
+    report = await Replay(ctx.obj['config'], client).run()
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+    click.echo(f"Replayed {report['messages']} messages into {report['frames']} frames in {report['seconds']:.2f}s")
+    click.echo(f"{report['messages_per_second']:.0f} messages/s, {report['frames_per_second']:.0f} frames/s")
+    for stage, stats in report["stages"].items():
+        click.echo(f"{stage:>12}: p50 {stats['p50_ms']:.3f}ms p90 {stats['p90_ms']:.3f}ms "
+                   f"p99 {stats['p99_ms']:.3f}ms max {stats['max_ms']:.3f}ms ({stats['count']})")
@@ -1,10 +1,48 @@
 import asyncclick as click
-
+from asyncio import get_running_loop
+from pathlib import Path
+import signal
+from ..utils.profiling import Profiler
+from ..utils.reload import ConfigReloader
+from ..utils.service import MQTT2APRS
 from .config import _check_config
 
 
 @click.command
+@click.option("--profile", "profile_seconds", type=float, default=None,
+              help="Profile the service for this many seconds once it starts")
+@click.option("--profile-signal/--no-profile-signal", default=True,
+              help="Start or stop a profile on SIGUSR1, for --profile seconds if it is set")
+@click.option("--profile-dir", type=click.Path(file_okay=False, writable=True), default=".",
+              help="Directory to write profiles to")
+@click.option("--slow-callback", type=float, default=0.1,
+              help="While profiling, record anything that blocks the event loop for longer than this many seconds")
+@click.option("--watch-config", type=float, default=None,
+              help="Check the config file for changes every this many seconds, and reload it when it changes")
 @click.pass_context
-async def run(ctx):
+async def run(ctx, profile_seconds, profile_signal, profile_dir, slow_callback, watch_config):
+    """Run the mqtt2aprs service
+
+    SIGHUP reloads the config's topics without reconnecting to MQTT or dropping queued frames.
+
+    Profiles are written as a cProfile pstats file, a collapsed stack file tagged by pipeline stage for
+    flamegraphs, and a log of the callbacks that blocked the event loop.
+    """
     await _check_config(ctx, echo=False)
-    print(ctx.obj['config'])
+    loop = get_running_loop()
+    profiler = Profiler(loop, Path(profile_dir), duration=profile_seconds, slow_callback=slow_callback)
+    if profile_signal:
+        loop.add_signal_handler(signal.SIGUSR1, profiler.toggle)
+    if profile_seconds is not None:
+        profiler.start()
+    service = MQTT2APRS(ctx.obj['config'])
+    reloader = ConfigReloader(service, ctx.obj['config_path'], include_env=ctx.obj['load_env'],
+                              cache_dir=ctx.obj.get('cache_dir'), interval=watch_config)
+    reloader.start(loop)
+    try:
+        await service.run()
+    finally:
+        reloader.stop()
+        if profile_signal:
+            loop.remove_signal_handler(signal.SIGUSR1)
+        profiler.stop()
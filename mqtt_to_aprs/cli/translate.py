@@ -0,0 +1,53 @@
+import asyncclick as click
+import os
+import sys
+from ..utils.backfill import Backfill
+from ..utils.backfill import read_archive
+from .config import _check_config
+
+
+@click.command
+@click.argument("archive", type=click.Path(exists=True, dir_okay=False))
+@click.option("-o", "--output", type=click.Path(dir_okay=False, writable=True), default=None,
+              help="File to write the frames to, defaults to stdout")
+@click.option("--topic", default=None, help="Topic every message in the archive was sent on, if each line is just a payload")
+@click.option("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes, 0 to translate in this process")
+@click.option("--chunk-size", type=int, default=500, help="Messages handed to the workers at a time")
+@click.option("--show-topic/--no-show-topic", default=False, help="Put the topic in front of each frame")
+@click.pass_context
+async def translate(ctx, archive, output, topic, workers, chunk_size, show_topic):
+    """Translate an archive of messages into APRS information fields, in order, one a line
+
+    The archive is either a capture from record, or JSON lines of {"topic": ..., "payload": ..., "timestamp": ...}
+    objects. timestamp is when the message was sent, in seconds since the epoch or as an ISO 8601 string. Beacons,
+    rolling wind gusts and rain totals, and each packet's timestamp are worked out from it. Messages without one
+    use the current time instead.
+    """
+    await _check_config(ctx, echo=False)
+    backfill = Backfill(ctx.obj['config'], workers=workers, chunk_size=chunk_size)
+    output_file = sys.stdout.buffer if output is None else open(output, "wb")
+    messages = frames = errors = untimed = 0
+    try:
+        async for (message_topic, _, timestamp), (frame, error) in backfill.translate(read_archive(archive, topic)):
+            messages += 1
+            if timestamp is None:
+                untimed += 1
+            if error is not None:
+                errors += 1
+                click.echo(f"Message {messages} on {message_topic}: {error}", err=True)
+                continue
+            if frame is None:
+                continue
+            frames += 1
+            if show_topic:
+                output_file.write(message_topic.encode("utf-8") + b"\t")
+            output_file.write(frame + b"\n")
+    finally:
+        if output is not None:
+            output_file.close()
+        else:
+            output_file.flush()
+    click.echo(f"Translated {messages} messages into {frames} frames, {errors} errors", err=True)
+    if untimed > 0:
+        click.echo(f"{untimed} messages had no timestamp, their beacons, rolling values and packet timestamps used "
+                   f"the current time", err=True)
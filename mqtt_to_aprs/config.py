@@ -4,17 +4,25 @@ from pydantic import DirectoryPath
 
 from enum import Enum
 from pathlib import Path
-from tomllib import load as toml_load
 from tomllib import loads as toml_loads
 
-import aiofiles
+from hashlib import sha256
+from importlib.metadata import PackageNotFoundError
+from importlib.metadata import version
+import logging
 import os
+import pickle  # nosec
 from functools import lru_cache
 from functools import cached_property
 from asyncstdlib.functools import lru_cache as alru_cache
+from pydantic import VERSION as PYDANTIC_VERSION
 from pydantic import ValidationError
-
-DEFAULT_CONFIG_PATH = os.environ.get("MQTT2APRS_CONFIG", "/etc/mqtt2aprs/config.toml")
+from pydantic import field_validator
+from pydantic import model_validator
+import re
+from stat import S_IWGRP
+from stat import S_IWOTH
+from .paths import DEFAULT_CONFIG_PATH
 
 class LogLevel(str, Enum):
     debug = "DEBUG"
@@ -29,12 +37,55 @@ class LoggingConfig(BaseModel):
     log_level: LogLevel = Field("INFO", description="Log level for the app")
 
 
+class OverflowPolicy(str, Enum):
+    block = "block"
+    drop_oldest = "drop_oldest"
+    drop_newest = "drop_newest"
+    latest = "latest"
+
+
+class SpoolConfig(BaseModel):
+    path: Path = Field(description="Directory to keep the spool in, each queue gets its own directory inside it")
+    segment_size: int = Field(4 * 1024 * 1024, ge=64 * 1024, description="Bytes in each spool file, files are deleted once "
+                              "every frame in them has been sent")
+    sync_interval: float = Field(1.0, ge=0, description="Most seconds between flushing the spool to disk")
+    replay_batch: int = Field(100, gt=0, description="Most frames read back from the spool into memory at once")
+    max_age: float | None = Field(3600.0, gt=0, description="Seconds after which a spooled frame is too old to send and is "
+                                  "skipped, leave as None to send everything")
+
+
+class QueueConfig(BaseModel):
+    max_size: int = Field(0, ge=0, description="Max frames waiting to be sent, 0 for no limit")
+    overflow: OverflowPolicy = Field(OverflowPolicy.block, description="What to do with a new frame when the queue is full. "
+                                     "block waits for room, which backs up MQTT; drop_oldest and drop_newest discard a frame; "
+                                     "latest only keeps the newest frame for each topic")
+    spool: SpoolConfig | None = Field(None, description="Keep waiting frames on disk, so they survive restarts and long "
+                                      "outages, max_size and overflow don't apply to a spooled queue")
+
+
+class ThrottleConfig(BaseModel):
+    rate: float | None = Field(None, gt=0, description="Frames a second the callsign may send, extra frames wait, leave as "
+                               "None for no limit")
+    burst: int = Field(10, gt=0, description="Frames the callsign may send at once before rate applies")
+    topic_rate: float | None = Field(None, gt=0, description="Frames a second each topic may send, extra frames are dropped")
+    topic_burst: int = Field(1, gt=0, description="Frames each topic may send at once before topic_rate applies")
+    dedup_ttl: float = Field(0, ge=0, description="Seconds an identical report from a topic is suppressed for, 0 to disable")
+    max_entries: int = Field(10000, gt=0, description="Most topics and reports to track, the least recently used are forgotten first")
+
+
 class APRSConfig(BaseModel):
     callsign: str
     ssid: int | None = Field(None)
     password: int
     host: str = Field("rotate.aprs.net", description="APRS.is host to connect to")
     port: int = Field(10152, description="Port for the APRS.is host")
+    queue: QueueConfig = Field(default_factory=QueueConfig, description="Limits for the queue of frames waiting to go to APRS.is")
+    throttle: ThrottleConfig = Field(default_factory=ThrottleConfig, description="Rate limits and duplicate suppression for APRS.is")
+    batch_size: int = Field(100, gt=0, description="Most frames to send to APRS.is in one write")
+    reconnect_min_delay: float = Field(1.0, gt=0, description="Seconds to wait before the first reconnect attempt")
+    reconnect_max_delay: float = Field(300.0, gt=0, description="Most seconds to wait between reconnect attempts")
+    write_buffer_high: int = Field(64 * 1024, gt=0, description="Bytes buffered for APRS.is before the sender waits")
+    write_buffer_low: int = Field(16 * 1024, ge=0, description="Bytes buffered for APRS.is before the sender resumes")
 
     @cached_property
     def callsign_with_ssid(self):
@@ -49,6 +100,21 @@ class APRSConfig(BaseModel):
 
 class KissConfig(BaseModel,):
     path: str | None = Field(None, description="Path to serial KISS path or tcp:// to connect over the network")
+    queue: QueueConfig = Field(default_factory=QueueConfig, description="Limits for the queue of frames waiting to go to the TNC")
+    callsign: str | None = Field(None, description="Callsign with SSID to send from over RF, defaults to the APRS callsign")
+    digipeaters: list[str] = Field(["WIDE1-1", "WIDE2-1"], description="Digipeater path for frames sent over RF")
+    port: int = Field(0, ge=0, le=15, description="KISS port on the TNC to send to")
+    serial_baud: int = Field(9600, description="Baud rate of the serial line to the TNC")
+    baud_rate: int = Field(1200, gt=0, description="Baud rate of the RF channel, used to estimate each frame's airtime")
+    tx_delay: float = Field(0.25, ge=0, description="Seconds of key-up delay the TNC adds to every frame")
+    duty_cycle: float = Field(1.0, gt=0, le=1, description="Most of the duty_cycle_window to spend transmitting, 0.1 is 10%")
+    duty_cycle_window: float = Field(60.0, gt=0, description="Seconds over which the duty cycle is measured")
+    min_gap: float = Field(0.0, ge=0, description="Seconds to leave the channel idle between frames")
+    batch_size: int = Field(100, gt=0, description="Most frames to send to the TNC in one write")
+    reconnect_min_delay: float = Field(1.0, gt=0, description="Seconds to wait before the first reconnect attempt")
+    reconnect_max_delay: float = Field(60.0, gt=0, description="Most seconds to wait between reconnect attempts")
+    write_buffer_high: int = Field(4 * 1024, gt=0, description="Bytes buffered for the TNC before the sender waits")
+    write_buffer_low: int = Field(1024, ge=0, description="Bytes buffered for the TNC before the sender resumes")
 
     def __hash__(self) -> int:
         return hash(self.path)
@@ -61,6 +127,8 @@ class LocationConfig(BaseModel):
 
 class MQTTTopicTypes(str, Enum):
     json = "json"
+    # json with a known shape, the translator's field paths are compiled into a typed decoder
+    typed = "typed"
 
 
 class APRSPacketTypes(str, Enum):
@@ -75,8 +143,7 @@ class APRSOutputTargets(str, Enum):
 class JMESPathWeatherFields(BaseModel):
     # http://www.aprs.org/doc/APRS101.PDF
     # Chapter 12, weather packet format
-    # We'll prebuild some converters for now for common stuff
-    # Will eventually need a better transform layer here to do some basic math
+    # We'll prebuild some converters for now for common stuff, anything else can be done with transforms
     temperature_f: str | None = Field(None, description="JMESPath to a Temperature in Fahrenheit")
     temperature_c: str | None = Field(None, description="JMSEPath to a Temperature in Celcius, will be converted to Fahrenheit")
     wind_dir: str | None = Field(None, description="JMSEPath to a Wind Direction in Degrees")
@@ -90,6 +157,24 @@ class JMESPathWeatherFields(BaseModel):
     pressure_hg: str | None = Field(None, description="JMSEPath to a barometric pressure (in inches of mercury).")
     latitude: str | None = Field(None, description="JMSEPath to this weather report's latitude as a decimal")
     longitude: str | None = Field(None, description="JMSEPath to this weather report's longitude as a decimal")
+    rain_counter: str | None = Field(None, description="JMESPath to a cumulative rain counter (in hundredths of an inch), "
+                                     "used to work out rain_last_hr and rain_last_24_hrs when they aren't mapped, "
+                                     "from a station's second reading on")
+
+    @model_validator(mode="after")
+    def paths_compile(self) -> "JMESPathWeatherFields":
+        # imported here, a config loaded from the cache isn't validated again so it never needs it
+        import jmespath
+        from jmespath.exceptions import JMESPathError
+
+        for key, path in self.model_dump().items():
+            if path is None:
+                continue
+            try:
+                jmespath.compile(path)
+            except JMESPathError as exc:
+                raise ValueError(f"{key} path {path} is not a valid JMESPath expression: {exc}") from exc
+        return self
 
 
 class TranslatorType(str, Enum):
@@ -97,23 +182,116 @@ class TranslatorType(str, Enum):
 
 class JMESPathConfig(BaseModel):
     fields: JMESPathWeatherFields
+    derive_wind_gust: bool = Field(False, description="Work out wind_gust as the peak wind in the last 5 minutes of messages, "
+                                   "when a message doesn't have its own")
+    transforms: dict[str, str] = Field({}, description="Arithmetic applied to a field before it is converted, ie "
+                                       "wind_speed = \"value * 0.621371\". value is the field's own value, other fields "
+                                       "with a path can be used by name and abs, float, int, max, min and round are available")
+
+    @model_validator(mode="after")
+    def transforms_compile(self) -> "JMESPathConfig":
+        # imported here so config doesn't depend on utils, utils depends on config
+        from .utils.transform import compile_transform
+
+        field_names = tuple(JMESPathWeatherFields.model_fields)
+        unknown = set(self.transforms) - set(field_names)
+        if len(unknown) > 0:
+            raise ValueError(f"{', '.join(sorted(unknown))} not valid, transforms can be set for {', '.join(field_names)}")
+        # a transform can only read fields that have a path, anything else would always be missing
+        with_paths = tuple(key for key, path in self.fields.model_dump().items() if path is not None)
+        for field, expression in self.transforms.items():
+            compile_transform(expression, field, with_paths)
+        return self
 
     def __hash__(self):
-        return hash(";".join([f"{key}-{value}" for key, value in self.fields.dict().items()]))
+        return hash(";".join([f"{key}-{value}" for key, value in self.fields.model_dump().items()] + [str(self.derive_wind_gust)]
+                             + [f"{key}={value}" for key, value in sorted(self.transforms.items())]))
 
 class TranslatorConfig(BaseModel):
     type: TranslatorType
     config: JMESPathConfig
+    validate_packets: bool = Field(False, description="Round trip every packet through the aprs library to check it parses, slower")
 
     def __hash__(self):
-        return hash(f"{self.type}-{hash(self.config)}")
+        return hash(f"{self.type}-{hash(self.config)}-{self.validate_packets}")
+
+# the weather values a beacon can watch for changes, after translation into APRS units
+BEACON_FIELDS = ("wind_dir", "wind_speed", "wind_gust", "temperature", "rain_last_hr", "rain_last_24_hrs",
+                 "rain_since_midnight", "humidity", "pressure")
+
+
+class BeaconConfig(BaseModel):
+    max_interval: float = Field(600.0, gt=0, description="Most seconds between reports from a station, even when nothing changes")
+    min_interval: float = Field(0.0, ge=0, description="Fewest seconds between reports from a station, even when something changes")
+    deltas: dict[str, float] = Field({}, description="Send right away when a value changes by this much since the last report, "
+                                     "ie temperature = 3 or wind_gust = 10")
+    max_stations: int = Field(10000, gt=0, description="Most stations to keep state for")
+
+    @field_validator("deltas")
+    @classmethod
+    def deltas_are_weather_fields(cls, value: dict[str, float]) -> dict[str, float]:
+        unknown = set(value) - set(BEACON_FIELDS)
+        if len(unknown) > 0:
+            raise ValueError(f"{', '.join(sorted(unknown))} not valid, deltas can be set for {', '.join(BEACON_FIELDS)}")
+        return value
+
+
+class PositionFormat(str, Enum):
+    uncompressed = "uncompressed"
+    compressed = "compressed"
+
+
+# a JMESPath made only of dotted identifiers, which a typed topic can compile into a schema
+SIMPLE_PATH = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*")
+
 
 class MQTTTopicConfig(BaseModel):
     topic: str
     input_type: MQTTTopicTypes = Field("json")
     output_type: APRSPacketTypes = Field("weather")
-    target: APRSOutputTargets
+    target: list[APRSOutputTargets] = Field(min_length=1, description="Where to send the topic's packets, is, kiss or a list "
+                                            "of both, each packet is translated once however many targets it has")
+    priority: int = Field(0, description="Frames from higher priority topics go out on RF first, frames above 0 are "
+                          "alerts and are never merged with a newer frame for the topic")
     translator: TranslatorConfig
+    beacon: BeaconConfig | None = Field(None, description="Only send when values change or an interval passes, leave as None to send every message")
+    position_format: PositionFormat = Field(PositionFormat.uncompressed, description="compressed sends a shorter base 91 "
+                                            "position with the wind in its course and speed, less airtime on RF")
+
+    @field_validator("target", mode="before")
+    @classmethod
+    def target_is_list(cls, value: any) -> any:
+        if isinstance(value, str):
+            return [value]
+        return value
+
+    @field_validator("target")
+    @classmethod
+    def targets_are_unique(cls, value: list[APRSOutputTargets]) -> list[APRSOutputTargets]:
+        return list(dict.fromkeys(value))
+
+    @field_validator("topic")
+    @classmethod
+    def topic_is_valid_filter(cls, value: str) -> str:
+        # imported here so config doesn't depend on utils, utils depends on config
+        from .utils.topic import validate_topic_filter
+
+        validate_topic_filter(value)
+        return value
+
+    @model_validator(mode="after")
+    def typed_fields_are_simple_paths(self) -> "MQTTTopicConfig":
+        if self.input_type != MQTTTopicTypes.typed:
+            return self
+        paths = {key: value for key, value in self.translator.config.fields.model_dump().items() if value is not None}
+        for key, path in paths.items():
+            if not SIMPLE_PATH.fullmatch(path):
+                raise ValueError(f"{key} path {path} must be a plain dotted path like a.b.c for a typed topic")
+        for key, path in paths.items():
+            for other_key, other_path in paths.items():
+                if other_path.startswith(f"{path}."):
+                    raise ValueError(f"{key} path {path} can't be both a value and the parent of {other_key} path {other_path}")
+        return self
 
     @classmethod
     def load_from_env(cls) -> dict[str, any]:
@@ -131,12 +309,31 @@ class MQTTTopicConfig(BaseModel):
     def __hash__(self) -> int:
         return hash(f"{self.topic}-{self.output_type}")
 
+class JSONParser(str, Enum):
+    auto = "auto"
+    orjson = "orjson"
+    msgspec = "msgspec"
+    stdlib = "stdlib"
+
+
+class ExecutionMode(str, Enum):
+    inline = "inline"
+    process = "process"
+
+
 class MQTTConfig(BaseModel):
     host: str
     port: int
     username: str | None = Field(None, description="Username for the MQTT server, if auth is required")
     password: str | None = Field(None, description="Password for the MQTT server, if auth is required")
     topics: list[MQTTTopicConfig]
+    workers: int = Field(1, gt=0, description="Tasks decoding and translating messages, each topic always goes to the same one")
+    worker_queue_size: int = Field(100, gt=0, description="Messages waiting for each worker before intake waits")
+    execution: ExecutionMode = Field(ExecutionMode.inline, description="inline decodes and translates in the event loop, "
+                                     "process gives each worker its own process so decoding and translating use more cores")
+    batch_size: int = Field(100, gt=0, description="Most messages to send to a worker process at once")
+    json_parser: JSONParser = Field(JSONParser.auto, description="JSON parser for json topics, auto picks orjson or msgspec when "
+                                    "installed and falls back to the standard library")
 
     @cached_property
     def client_args(self):
@@ -150,35 +347,61 @@ class MQTTConfig(BaseModel):
         return this_args
 
 
+class MetricsConfig(BaseModel):
+    enabled: bool = Field(False, description="Serve prometheus metrics over HTTP")
+    host: str = Field("127.0.0.1", description="Address to serve metrics on")
+    port: int = Field(9108, description="Port to serve metrics on, at /metrics")
+
+
 class ConfigObject(BaseModel):
     logging: LoggingConfig = Field(..., description="Configuration for logging")
     aprs: APRSConfig
     kiss: KissConfig
     location: LocationConfig
     mqtt: MQTTConfig
+    metrics: MetricsConfig = Field(default_factory=MetricsConfig, description="Configuration for metrics")
 
     @classmethod
-    def from_toml(cls, toml_path: Path, include_env: bool = False) -> "ConfigObject":
+    def from_toml(cls, toml_path: Path, include_env: bool = False, cache_dir: Path | None = None) -> "ConfigObject":
         """Reads a toml file and converts it into a config object"""
         with open(toml_path, 'rb') as fh:
-            loaded = toml_load(fh)
-        return cls.__from_dictionary(loaded, include_env=include_env)
+            data = fh.read()
+        return cls.from_toml_bytes(data, toml_path, include_env=include_env, cache_dir=cache_dir)
 
     @classmethod
-    async def afrom_toml(cls, toml_path: Path, include_env: bool = False) -> "ConfigObject":
+    async def afrom_toml(cls, toml_path: Path, include_env: bool = False, cache_dir: Path | None = None) -> "ConfigObject":
         """Reads a toml file and converts it into a config object, async"""
-        async with aiofiles.open(toml_path, 'r') as fh:
+        # only imported here, it is slow to import and nothing else needs it
+        import aiofiles
+
+        async with aiofiles.open(toml_path, 'rb') as fh:
             data = await fh.read()
-        loaded = toml_loads(data)
-        return cls.__from_dictionary(loaded, include_env=include_env)
+        return cls.from_toml_bytes(data, toml_path, include_env=include_env, cache_dir=cache_dir)
+
+    @classmethod
+    def from_toml_bytes(cls, data: bytes, toml_path: Path | str = "", include_env: bool = False,
+                        cache_dir: Path | None = None) -> "ConfigObject":
+        """Converts the contents of a toml file into a config object
+
+        With a cache_dir, a config that was already validated from the same toml and environment is loaded
+        from the cache instead of being validated again.
+        """
+        cache = None if cache_dir is None else ConfigCache(cache_dir, toml_path)
+        if cache is not None:
+            key = cache.key(data, include_env)
+            cached = cache.load(key)
+            if cached is not None:
+                return cached
+        config = cls.__from_dictionary(toml_loads(data.decode("utf-8")), include_env=include_env)
+        if cache is not None:
+            cache.save(key, config)
+        return config
 
     @classmethod
     def __from_dictionary(cls, loaded: dict[str, any], include_env: bool = False) -> "ConfigObject":
         def load_from_env(cls) -> dict[str, any]:
             loaded = {}
-            env_base = f"{cls.schema()['title'].replace('Config', '')}"
-            for key in cls.schema()['properties'].keys():
-                env_key = f"{env_base}_{key}".upper()
+            for key, env_key in env_keys(cls).items():
                 value = os.environ.get(env_key, None)
                 if value:
                     loaded[key] = value
@@ -186,13 +409,7 @@ class ConfigObject(BaseModel):
 
         errors = []
         kwargs = {}
-        for key, schema_class in {
-            "logging": LoggingConfig,
-            "aprs": APRSConfig,
-            "kiss": KissConfig,
-            "location": LocationConfig,
-            "mqtt": MQTTConfig
-        }.items():
+        for key, schema_class in CONFIG_SECTIONS.items():
             env = load_from_env(schema_class) if include_env else {}
             env.update(loaded.get(key, {}))
             try:
@@ -212,11 +429,110 @@ class ConfigObject(BaseModel):
         return cls(**kwargs)
 
 
+CONFIG_SECTIONS: dict[str, type[BaseModel]] = {
+    "logging": LoggingConfig,
+    "aprs": APRSConfig,
+    "kiss": KissConfig,
+    "location": LocationConfig,
+    "mqtt": MQTTConfig,
+    "metrics": MetricsConfig,
+}
+
+
+def env_keys(schema_class: type[BaseModel]) -> dict[str, str]:
+    """The environment variable each of a config section's fields can be set from, ie APRS_CALLSIGN"""
+    env_base = schema_class.__name__.replace('Config', '')
+    return {key: f"{env_base}_{key}".upper() for key in schema_class.model_fields}
+
+
+class ConfigCache:
+    """Validated configs on disk, so an unchanged config isn't validated again on every start
+
+    Each config file gets one cache file, holding the validated config and the key it was built from. The
+    key covers the toml, every environment variable the config reads, pydantic's version and the modules
+    that validate it, so a change to any of them misses the cache and revalidates. Paths that must exist
+    are checked again on every load. A cache that another user owns, or that anyone else could write to,
+    is never unpickled.
+    """
+    # this module, and the ones whose code runs in its validators
+    SOURCES = (Path(__file__), Path(__file__).parent / "utils" / "topic.py",
+               Path(__file__).parent / "utils" / "transform.py")
+    # sections with fields validated against the filesystem, ie a DirectoryPath that has to exist
+    FILESYSTEM_SECTIONS = ("logging",)
+
+    def __init__(self, cache_dir: Path | str, toml_path: Path | str) -> None:
+        path_hash = sha256(str(Path(toml_path).resolve()).encode("utf-8")).hexdigest()[:16]
+        self.path = Path(cache_dir) / f"config-{path_hash}.pickle"
+
+    @staticmethod
+    def key(data: bytes, include_env: bool) -> str:
+        digest = sha256(data)
+        try:
+            digest.update(version("mqtt-to-aprs").encode("utf-8"))
+        except PackageNotFoundError:
+            pass
+        digest.update(f"\0pydantic={PYDANTIC_VERSION}".encode("utf-8"))
+        for source in ConfigCache.SOURCES:
+            digest.update(f"\0{source.name}={os.stat(source).st_mtime_ns}".encode("utf-8"))
+        if include_env:
+            for schema_class in CONFIG_SECTIONS.values():
+                for env_key in env_keys(schema_class).values():
+                    digest.update(f"\0{env_key}={os.environ.get(env_key, '')}".encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _trusted(stat: os.stat_result) -> bool:
+        return stat.st_uid == os.getuid() and stat.st_mode & (S_IWGRP | S_IWOTH) == 0
+
+    def load(self, key: str) -> ConfigObject | None:
+        try:
+            with open(self.path, "rb") as fh:
+                # unpickling runs code, only trust a cache nobody but the user running mqtt2aprs could have written
+                if not self._trusted(os.stat(self.path.parent)) or not self._trusted(os.fstat(fh.fileno())):
+                    logging.warning("Ignoring config cache %s, it or its directory is owned or writable by another "
+                                    "user", self.path)
+                    return None
+                cached_key, config = pickle.load(fh)  # nosec
+        except FileNotFoundError:
+            return None
+        except Exception as exc:
+            logging.debug("Ignoring unreadable config cache %s: %s", self.path, exc)
+            return None
+        if cached_key != key or not self._filesystem_valid(config):
+            return None
+        return config
+
+    @classmethod
+    def _filesystem_valid(cls, config: ConfigObject) -> bool:
+        """Whether the paths the config was validated against still pass, the filesystem isn't in the key"""
+        for name in cls.FILESYSTEM_SECTIONS:
+            section = getattr(config, name)
+            try:
+                type(section).model_validate(dict(section))
+            except ValidationError as exc:
+                logging.debug("Ignoring config cache, %s no longer validates: %s", name, exc)
+                return False
+        return True
+
+    def save(self, key: str, config: ConfigObject) -> None:
+        try:
+            self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            partial = self.path.with_suffix(f".{os.getpid()}.tmp")
+            # only the owner can write it whatever the umask, or load would refuse it
+            with open(os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as fh:
+                pickle.dump((key, config), fh)
+            os.replace(partial, self.path)
+        except OSError as exc:
+            logging.debug("Could not write config cache %s: %s", self.path, exc)
+
+
 @lru_cache
-def get_config(config_path: str = DEFAULT_CONFIG_PATH, from_env: bool = False) -> ConfigObject:
-    return ConfigObject.from_toml(config_path, from_env)
+def get_config(config_path: str = DEFAULT_CONFIG_PATH, from_env: bool = False,
+               cache_dir: Path | None = None) -> ConfigObject:
+    return ConfigObject.from_toml(config_path, from_env, cache_dir=cache_dir)
 
 
 @alru_cache
-async def aget_config(config_path: str = DEFAULT_CONFIG_PATH, from_env: bool = False) -> ConfigObject:
-    return await ConfigObject.afrom_toml(config_path, from_env)
+async def aget_config(config_path: str = DEFAULT_CONFIG_PATH, from_env: bool = False,
+                      cache_dir: Path | None = None) -> ConfigObject:
+    return await ConfigObject.afrom_toml(config_path, from_env, cache_dir=cache_dir)
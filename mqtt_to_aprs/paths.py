@@ -0,0 +1,6 @@
+# default locations, kept apart from config so the cli can read them without importing pydantic
+import os
+
+DEFAULT_CONFIG_PATH = os.environ.get("MQTT2APRS_CONFIG", "/etc/mqtt2aprs/config.toml")
+DEFAULT_CACHE_DIR = os.environ.get("MQTT2APRS_CACHE_DIR", os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "mqtt2aprs"))
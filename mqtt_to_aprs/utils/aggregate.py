@@ -0,0 +1,167 @@
+from collections import OrderedDict
+from collections import deque
+from collections.abc import Callable
+from time import monotonic
+
+WIND_GUST_WINDOW = 5 * 60
+RAIN_HOUR_WINDOW = 60 * 60
+RAIN_DAY_WINDOW = 24 * 60 * 60
+
+
+class RollingMax:
+    """The max of the values added in the last window seconds
+
+    Keeps a monotonic deque: values that can never be the max again are dropped as soon as a larger value
+    arrives, so each value is pushed and popped at most once. Values inside the same resolution seconds are
+    merged, which bounds memory at window / resolution entries however fast values arrive. Time only moves
+    forward, a value added with an older now than the last is added at the last now.
+    """
+    __slots__ = ("window", "resolution", "_entries", "_latest")
+
+    def __init__(self, window: float, resolution: float = 1.0) -> None:
+        self.window = window
+        self.resolution = resolution
+        # (bucket, value), values strictly decreasing from the left
+        self._entries: deque[tuple[int, float]] = deque()
+        self._latest = float("-inf")
+
+    def add(self, now: float, value: float) -> float:
+        now = self._latest = max(now, self._latest)
+        bucket = int(now // self.resolution)
+        entries = self._entries
+        while entries and entries[-1][1] <= value:
+            entries.pop()
+        if not entries or entries[-1][0] != bucket:
+            entries.append((bucket, value))
+        oldest = int((now - self.window) // self.resolution)
+        while entries[0][0] <= oldest:
+            entries.popleft()
+        return entries[0][1]
+
+
+class RollingSum:
+    """The sum of the values added in the last window seconds, to within one bucket
+
+    A ring buffer of buckets, each window / buckets seconds wide. Stale buckets are zeroed as time moves past
+    them, and the running total is kept up to date as buckets change, so adding a value is O(1) amortized.
+    Time only moves forward, a value added with an older now than the last goes in the newest bucket.
+    """
+    __slots__ = ("window", "width", "_ring", "_bucket", "total")
+
+    def __init__(self, window: float, buckets: int = 60) -> None:
+        self.window = window
+        self.width = window / buckets
+        self._ring = [0.0] * buckets
+        self._bucket: int | None = None
+        self.total = 0.0
+
+    def _advance(self, now: float) -> int:
+        bucket = int(now // self.width)
+        if self._bucket is None:
+            self._bucket = bucket
+        elif bucket < self._bucket:
+            bucket = self._bucket
+        elif bucket > self._bucket:
+            size = len(self._ring)
+            for stale in range(self._bucket + 1, min(bucket, self._bucket + size) + 1):
+                self.total -= self._ring[stale % size]
+                self._ring[stale % size] = 0.0
+            self._bucket = bucket
+        return bucket % len(self._ring)
+
+    def add(self, now: float, value: float) -> float:
+        index = self._advance(now)
+        self._ring[index] += value
+        self.total += value
+        return self.total
+
+
+class StationAggregates:
+    """Rolling weather values for one station, derived from instantaneous wind and a cumulative rain counter"""
+    __slots__ = ("gust", "rain_hour", "rain_day", "rain_counter", "rain_read_at")
+
+    def __init__(self) -> None:
+        self.gust = RollingMax(WIND_GUST_WINDOW)
+        self.rain_hour = RollingSum(RAIN_HOUR_WINDOW, buckets=60)
+        self.rain_day = RollingSum(RAIN_DAY_WINDOW, buckets=288)
+        self.rain_counter: float | None = None
+        self.rain_read_at: float | None = None
+
+    def add_rain_counter(self, now: float, counter: float) -> tuple[float, float] | None:
+        """Adds the change in the rain counter, returns the rolling (last hour, last 24 hours) totals
+
+        Returns None for the first reading, there is nothing to measure the change from yet. A reading older
+        than the last one is ignored, and the totals returned as they are.
+        """
+        if self.rain_counter is None:
+            self.rain_counter = counter
+            self.rain_read_at = now
+            return None
+        if now < self.rain_read_at:
+            return self.rain_hour.total, self.rain_day.total
+        self.rain_read_at = now
+        if counter < self.rain_counter:
+            # the counter was reset, ie the sensor rebooted, everything it has counted since is new
+            delta = counter
+        else:
+            delta = counter - self.rain_counter
+        self.rain_counter = counter
+        return self.rain_hour.add(now, delta), self.rain_day.add(now, delta)
+
+
+class WeatherAggregator:
+    """Fills in wind_gust, rain_last_hr and rain_last_24_hrs for each station from the stream of its reports
+
+    Only fills values the message didn't already provide, a wind_gust in the message is still added to the
+    rolling max. Rain totals are left empty until a station has sent two rain counter readings. Keeps at most
+    max_stations stations, the least recently heard from are forgotten first.
+
+    Reports are expected in time order. One older than the newest a station has sent, which a backfill of
+    merged archives can produce, counts towards the gust as if it arrived at the newest time, and its rain
+    counter is ignored, it would otherwise look like the counter going backwards.
+    """
+
+    def __init__(self, derive_wind_gust: bool = False, max_stations: int = 10000,
+                 clock: Callable[[], float] = monotonic) -> None:
+        self.derive_wind_gust = derive_wind_gust
+        self.max_stations = max_stations
+        self._clock = clock
+        self._stations: OrderedDict[str, StationAggregates] = OrderedDict()
+
+    def station(self, station: str) -> StationAggregates:
+        aggregates = self._stations.get(station)
+        if aggregates is None:
+            aggregates = self._stations[station] = StationAggregates()
+            if len(self._stations) > self.max_stations:
+                self._stations.popitem(last=False)
+        else:
+            self._stations.move_to_end(station)
+        return aggregates
+
+    def apply(self, station: str, weather_data: dict[str, any], now: float | None = None) -> dict[str, any]:
+        """Updates station with weather_data measured at now, filling in the rolling values in place
+
+        now defaults to the clock
+        """
+        rain_counter = weather_data.pop("rain_counter", None)
+        gust = weather_data["wind_gust"]
+        wind = gust if gust is not None else weather_data["wind_speed"]
+        derive_gust = self.derive_wind_gust and wind is not None
+        if rain_counter is None and not derive_gust:
+            return weather_data
+        if now is None:
+            now = self._clock()
+        aggregates = self.station(station)
+        if derive_gust:
+            peak = aggregates.gust.add(now, float(wind))
+            if gust is None:
+                weather_data["wind_gust"] = peak
+        if rain_counter is not None:
+            totals = aggregates.add_rain_counter(now, float(rain_counter))
+            if totals is not None:
+                rain_hour, rain_day = totals
+                if weather_data["rain_last_hr"] is None:
+                    weather_data["rain_last_hr"] = rain_hour
+                if weather_data["rain_last_24_hrs"] is None:
+                    weather_data["rain_last_24_hrs"] = rain_day
+        return weather_data
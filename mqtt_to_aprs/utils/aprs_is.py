@@ -1,56 +1,205 @@
 from ..config import APRSConfig
 from asyncstdlib.functools import lru_cache as alru_cache
-from asyncio import BaseTransport
-from aprs import APRSISProtocol
 from asyncio import Queue
 from asyncio import CancelledError
+from asyncio import sleep
+from importlib.metadata import PackageNotFoundError
+from importlib.metadata import version
+from time import monotonic
+from time import perf_counter
 from uuid import uuid4
 import logging
+from .metrics import ServiceMetrics
+from .packet import OutboundFrame
+from .packet import address
+from .packet import packet_body
+from .queues import mark_done
+from .ratelimit import DedupCache
+from .ratelimit import KeyedRateLimiter
+from .ratelimit import TokenBucket
+from .transport import WriterProtocol
+from .transport import backoff_delays
+from .transport import open_writer_connection
+
+try:
+    SOFTWARE_VERSION = version("mqtt-to-aprs")
+except PackageNotFoundError:
+    SOFTWARE_VERSION = "0.0.0"
 
 
 class APRSISSender:
+    """Sends frames to APRS-IS over one persistent connection
+
+    The two rate limits behave differently. The callsign limit, throttle.rate, is one token bucket for
+    everything the sender sends and it delays: a batch over the limit waits in throttle until the bucket
+    allows it, so nothing is lost. The topic limit, throttle.topic_rate, is a bucket per topic and it drops:
+    allow suppresses a frame from a topic over its limit, as it does a duplicate within dedup_ttl, and counts
+    it in frames_suppressed.
+    """
+
     def __init__(self, config: APRSConfig, sender_id: str = None)->None:
         self._config = config
-        self._transport: BaseTransport | None = None
-        self.protocol : APRSISProtocol | None = None
+        self.protocol: WriterProtocol | None = None
         self.sender_id = uuid4() if sender_id is None else sender_id
+        self._header = address(config.callsign_with_ssid, "is").encode("ascii")
+        throttle = config.throttle
+        self._callsign_limiter = None if throttle.rate is None else TokenBucket(throttle.rate, throttle.burst)
+        self._topic_limiter = None if throttle.topic_rate is None else KeyedRateLimiter(
+            throttle.topic_rate, throttle.topic_burst, max_keys=throttle.max_entries)
+        self._dedup = None if throttle.dedup_ttl == 0 else DedupCache(throttle.dedup_ttl, max_size=throttle.max_entries)
+        self.metrics: ServiceMetrics | None = None
+        self.frames_sent = 0
+        self.frames_suppressed = 0
+        self.throttled_seconds = 0.0
+        self.reconnects = 0
+        self.last_reconnect_seconds: float | None = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.protocol is not None and not self.protocol.is_closed
 
     async def connect(self):
         logging.debug("Connect called for APRSISSender %s", self.sender_id)
-        # self._tranport, self.protocol = await create_aprsis_connection(
-        #     host=self._config.host,
-        #     port=self._config.port,
-        #     user=self._config.callsign_with_ssid,
-        #     passcode=str(self._config.password),
-        # )
+        self.protocol = await open_writer_connection(
+            name=f"APRSISSender {self.sender_id}",
+            host=self._config.host,
+            port=self._config.port,
+            high_water=self._config.write_buffer_high,
+            low_water=self._config.write_buffer_low,
+            on_line=self._server_line,
+        )
+        self.protocol.transport.write(
+            f"user {self._config.callsign_with_ssid} pass {self._config.password} "
+            f"vers mqtt2aprs {SOFTWARE_VERSION}\r\n".encode("ascii"))
         logging.debug("Connect done for APRSISSender %s", self.sender_id)
 
     async def disconnect(self):
         logging.debug("Disconnect called for APRSISSender %s", self.sender_id)
-        self._transport, self.protocol = None, None
+        if self.protocol is not None:
+            self.protocol.close()
+        self.protocol = None
         logging.debug("Disconnect done for APRSISSender %s", self.sender_id)
-        pass
+
+    async def reconnect(self):
+        """Reconnects to APRS-IS, backing off between failed attempts until it succeeds"""
+        started = monotonic()
+        await self.disconnect()
+        for delay in backoff_delays(self._config.reconnect_min_delay, self._config.reconnect_max_delay):
+            try:
+                await self.connect()
+                break
+            except OSError as exc:
+                logging.warning("APRSISSender %s failed to connect to %s:%d, retrying in %.1fs: %s",
+                                self.sender_id, self._config.host, self._config.port, delay, exc)
+                await sleep(delay)
+        self.reconnects += 1
+        self.last_reconnect_seconds = monotonic() - started
+
+    def _server_line(self, line: bytes) -> None:
+        if line.startswith(b"# logresp") and b" unverified" in line:
+            logging.warning("APRSISSender %s login is unverified, check the passcode: %s", self.sender_id, line)
+        else:
+            logging.debug("APRSISSender %s server: %s", self.sender_id, line)
+
+    async def write(self, lines: list[bytes]) -> None:
+        """Writes lines to APRS-IS, waiting for buffer space and reconnecting as needed until they are written
+
+        Lines only count as written once they have left the transport's buffer. If the connection drops before
+        then, the whole batch is written again on the new connection, so a frame may reach APRS-IS twice but
+        isn't lost. Lines already handed to the kernel when the connection drops can still be lost, APRS-IS
+        has no acknowledgements to tell.
+        """
+        while True:
+            if not self.is_connected:
+                await self.reconnect()
+            if await self.protocol.writable():
+                self.protocol.transport.writelines(lines)
+                if await self.protocol.flushed():
+                    return
 
     async def run(self, queue: Queue) -> None:
         logging.debug("Run starting APRSISSender %s", self.sender_id)
         try:
-            while True:
-                item = await queue.get()
-                if item is None:
-                    # None can be used as a signal to stop monitoring
-                    logging.debug("Run APRSISSender %s received None, stopping", self.sender_id)
-                    break
-                print(f"APRSISSender {self.sender_id} Received item: {item}")
+            stop = False
+            while not stop:
+                # block for the first frame, then take everything else that is already waiting
+                # so a burst goes out in one write
+                batch = [await queue.get()]
+                while len(batch) < self._config.batch_size and not queue.empty():
+                    batch.append(queue.get_nowait())
+                lines = []
+                sent = []
+                for item in batch:
+                    if item is None:
+                        # None can be used as a signal to stop monitoring
+                        logging.debug("Run APRSISSender %s received None, stopping", self.sender_id)
+                        stop = True
+                        continue
+                    if self.allow(item):
+                        lines.append(self._header + item.info + b"\r\n")
+                        sent.append(item)
+                if len(lines) > 0:
+                    await self.throttle(len(lines))
+                    start = perf_counter()
+                    await self.write(lines)
+                    self.frames_sent += len(lines)
+                    if self.metrics is not None:
+                        self.metrics.observe_send("aprsis", sent, perf_counter() - start)
+                for item in batch:
+                    mark_done(queue, item)
         except CancelledError:
             # Handle cancellation if needed
             logging.debug("Run APRSISSender %s cancelled", self.sender_id)
         finally:
+            await self.disconnect()
             logging.debug("Run APRSISSender %s stopped", self.sender_id)
 
+    def allow(self, item: OutboundFrame) -> bool:
+        """Checks a frame against the duplicate cache and its topic's rate limit"""
+        if self._dedup is not None:
+            key = (item.topic, packet_body(item.info))
+            if self._dedup.seen(key):
+                self.frames_suppressed += 1
+                return False
+        if self._topic_limiter is not None and not self._topic_limiter.allow(item.topic):
+            self.frames_suppressed += 1
+            return False
+        if self._dedup is not None:
+            self._dedup.add(key)
+        return True
+
+    async def throttle(self, frames: int) -> None:
+        """Waits until the callsign's rate limit allows frames to be sent"""
+        if self._callsign_limiter is None:
+            return
+        delay = self._callsign_limiter.reserve(frames)
+        if delay > 0:
+            logging.debug("APRSISSender %s rate limited, waiting %.2fs", self.sender_id, delay)
+            self.throttled_seconds += delay
+            await sleep(delay)
+
+    def stats(self) -> dict[str, int | float | None]:
+        stats = {
+            "frames_sent": self.frames_sent,
+            "frames_suppressed": self.frames_suppressed,
+            "throttled_seconds": self.throttled_seconds,
+            "reconnects": self.reconnects,
+            "last_reconnect_seconds": self.last_reconnect_seconds,
+        }
+        if self._topic_limiter is not None:
+            stats["topic_rate_limited"] = self._topic_limiter.limited
+        if self._dedup is not None:
+            stats.update({f"dedup_{key}": value for key, value in self._dedup.stats().items()})
+        return stats
+
 
 @alru_cache
 async def get_aprsis_sender(config: APRSConfig, sender_id: str | None = None) -> APRSISSender:
     """Returns a connected aprsis client"""
     this_sender = APRSISSender(config=config, sender_id=sender_id)
-    await this_sender.connect()
+    try:
+        await this_sender.connect()
+    except OSError as exc:
+        # the sender reconnects with backoff once it starts running
+        logging.warning("APRSISSender %s could not connect, will retry: %s", this_sender.sender_id, exc)
     return this_sender
@@ -0,0 +1,141 @@
+# translates archived messages offline, through the same pipeline the service runs
+from ..config import ConfigObject
+from asyncio import Task
+from asyncio import create_task
+from asyncio import gather
+from collections import deque
+from collections.abc import AsyncIterator
+from collections.abc import Iterable
+from collections.abc import Iterator
+from datetime import datetime
+from datetime import timezone
+from itertools import islice
+from pathlib import Path
+import json
+from .capture import MAGIC
+from .capture import capture_started
+from .capture import read_capture
+from .pipeline import ShardedProcessPool
+from .pipeline import _init_process
+from .pipeline import process_batch
+
+# (topic, payload, when it was sent in seconds since the epoch if the archive says) for each archived message
+Item = tuple[str, bytes | str, float | None]
+# (frame, error) for each archived message, in the same order
+Result = tuple[bytes | None, str | None]
+
+
+def parse_timestamp(value: any) -> float | None:
+    """Reads a timestamp as seconds since the epoch, or an ISO 8601 string, which is UTC if it has no offset"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    raise ValueError(f"{value!r} is not a timestamp")
+
+
+def read_jsonl(lines: Iterable[bytes], topic: str | None = None) -> Iterator[Item]:
+    """Reads archived messages, one JSON document a line
+
+    With topic, each line is a message payload on that topic. Without it, each line has to be an object with
+    the message's topic and its payload, either as JSON or as a string, and optionally a timestamp of when the
+    message was sent.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if topic is not None:
+            yield topic, line, None
+            continue
+        try:
+            envelope = json.loads(line)
+            payload = envelope["payload"]
+            message_topic = envelope["topic"]
+            timestamp = parse_timestamp(envelope.get("timestamp"))
+        except (ValueError, KeyError, TypeError, AttributeError) as exc:
+            raise ValueError(f"Line {line[:80]!r} is not an object with a topic, payload and optional timestamp: {exc}")
+        yield message_topic, payload if isinstance(payload, str) else json.dumps(payload), timestamp
+
+
+def read_archive(path: Path | str, topic: str | None = None) -> Iterator[Item]:
+    """Reads a capture from mqtt2aprs record, or a JSON lines file, a message at a time
+
+    Messages from captures that didn't record when they started have no timestamp.
+    """
+    with open(path, "rb") as archive:
+        if archive.read(len(MAGIC)) == MAGIC:
+            captured = True
+        else:
+            captured = False
+            archive.seek(0)
+            yield from read_jsonl(archive, topic)
+    if captured:
+        timed = capture_started(path) is not None
+        for message in read_capture(path):
+            yield topic or message.topic, message.payload, message.timestamp if timed else None
+
+
+class Backfill:
+    """Translates a stream of archived messages in chunks, in parallel, yielding results in input order
+
+    Each chunk is split across the worker processes by topic, the same way the live service shards them, so
+    every station's messages go through one process in order. Beacons, rolling aggregates and packet timestamps
+    run on each message's own timestamp, so they see the same history they would have live, as long as the
+    archive is in time order. Messages without a timestamp fall back to the current time, as live messages do.
+    At most in_flight chunks are being worked on at once, which keeps memory flat however long the archive is.
+    With no workers everything runs in this process.
+    """
+
+    def __init__(self, config: ConfigObject, workers: int = 1, chunk_size: int = 500,
+                 in_flight: int | None = None) -> None:
+        self.config = config
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.in_flight = in_flight if in_flight is not None else max(workers, 1) * 2
+        self._pool: ShardedProcessPool | None = None
+
+    async def _chunk(self, chunk: list[Item]) -> list[Result]:
+        if self._pool is None:
+            return process_batch(chunk)
+        shards: list[list[int]] = [[] for _ in range(self.workers)]
+        for index, (topic, _, _) in enumerate(chunk):
+            shards[hash(topic) % self.workers].append(index)
+        shard_results = await gather(*(self._pool.process(shard, [chunk[index] for index in indexes])
+                                       for shard, indexes in enumerate(shards) if indexes))
+        results: list[Result | None] = [None] * len(chunk)
+        for indexes, batch_results in zip([indexes for indexes in shards if indexes], shard_results):
+            for index, result in zip(indexes, batch_results):
+                results[index] = result
+        return results
+
+    async def translate(self, items: Iterable[Item]) -> AsyncIterator[tuple[Item, Result]]:
+        if self.workers > 0:
+            self._pool = ShardedProcessPool(self.config, self.workers)
+        else:
+            _init_process(self.config)
+        pending: deque[tuple[list[Item], Task]] = deque()
+        items = iter(items)
+        try:
+            while True:
+                chunk = list(islice(items, self.chunk_size))
+                if chunk:
+                    pending.append((chunk, create_task(self._chunk(chunk))))
+                if not pending:
+                    break
+                if chunk and len(pending) < self.in_flight:
+                    continue
+                chunk, task = pending.popleft()
+                for item, result in zip(chunk, await task):
+                    yield item, result
+        finally:
+            for _, task in pending:
+                task.cancel()
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
@@ -0,0 +1,68 @@
+from ..config import BeaconConfig
+from collections import OrderedDict
+from collections.abc import Callable
+from time import monotonic
+
+
+class AdaptiveBeacon:
+    """Decides whether a station's latest weather values are worth sending
+
+    A station's values go out when:
+    - it has never sent
+    - max_interval seconds have passed since it last sent, with whatever the freshest values are
+    - a value has moved by at least its delta since the last report that went out, as long as
+      min_interval seconds have passed
+
+    Everything else is held back. State is kept for at most max_stations stations, least recently heard from
+    are forgotten first, which just means their next message is sent.
+    """
+
+    def __init__(self, max_interval: float, min_interval: float = 0.0, deltas: dict[str, float] | None = None,
+                 max_stations: int = 10000, clock: Callable[[], float] = monotonic) -> None:
+        self.max_interval = max_interval
+        self.min_interval = min_interval
+        self.deltas = tuple((deltas or {}).items())
+        self.max_stations = max_stations
+        self._clock = clock
+        # station -> (when it last sent, the values it sent for the fields in deltas)
+        self._stations: OrderedDict[str, tuple[float, tuple]] = OrderedDict()
+        self.sent = 0
+        self.suppressed = 0
+
+    @classmethod
+    def from_config(cls, config: BeaconConfig) -> "AdaptiveBeacon":
+        return cls(max_interval=config.max_interval, min_interval=config.min_interval, deltas=config.deltas,
+                   max_stations=config.max_stations)
+
+    def should_send(self, station: str, values: dict[str, any], now: float | None = None) -> bool:
+        """now is when the values were measured, it defaults to the clock"""
+        if now is None:
+            now = self._clock()
+        last = self._stations.get(station)
+        if last is not None:
+            self._stations.move_to_end(station)
+            last_sent, last_values = last
+            elapsed = now - last_sent
+            if elapsed < self.max_interval and (elapsed < self.min_interval or not self._changed(values, last_values)):
+                self.suppressed += 1
+                return False
+        self._stations[station] = (now, tuple(values.get(field) for field, _ in self.deltas))
+        if len(self._stations) > self.max_stations:
+            self._stations.popitem(last=False)
+        self.sent += 1
+        return True
+
+    def _changed(self, values: dict[str, any], last_values: tuple) -> bool:
+        for (field, delta), last_value in zip(self.deltas, last_values):
+            value = values.get(field)
+            if value is None or last_value is None:
+                if value is not last_value:
+                    # a sensor coming or going is a change worth reporting
+                    return True
+                continue
+            if abs(value - last_value) >= delta:
+                return True
+        return False
+
+    def stats(self) -> dict[str, int]:
+        return {"stations": len(self._stations), "sent": self.sent, "suppressed": self.suppressed}
@@ -0,0 +1,125 @@
+# a compact binary log of raw mqtt messages, for recording real traffic and replaying it later
+from collections.abc import Iterator
+from pathlib import Path
+from typing import NamedTuple
+import mmap
+import struct
+
+MAGIC = b"M2ACAP1\n"
+TOPIC_RECORD = 0
+MESSAGE_RECORD = 1
+START_RECORD = 2
+# record type, topic id, topic length, then the topic
+TOPIC_HEADER = struct.Struct("<BHH")
+# record type, topic id, nanoseconds since the capture started, payload length, then the payload
+MESSAGE_HEADER = struct.Struct("<BHQI")
+# record type, nanoseconds since the epoch when the capture started
+START_HEADER = struct.Struct("<BQ")
+MAX_TOPICS = 0xFFFF
+
+
+class CapturedMessage(NamedTuple):
+    topic: str
+    timestamp: float
+    payload: bytes
+
+
+class CaptureWriter:
+    """Appends messages to a capture file
+
+    Each topic is written out once, the first time it is seen, and messages refer to it by a two byte id,
+    which keeps a busy capture to little more than its payloads.
+    """
+
+    def __init__(self, path: Path | str) -> None:
+        self.path = Path(path)
+        self._file = open(self.path, "wb", buffering=1024 * 1024)
+        self._file.write(MAGIC)
+        self._topics: dict[str, int] = {}
+        self.messages = 0
+
+    def start(self, epoch_ns: int) -> None:
+        """Records the wall clock time the capture started at, which message timestamps count from
+
+        Call it before writing any messages.
+        """
+        self._file.write(START_HEADER.pack(START_RECORD, epoch_ns))
+
+    def write(self, topic: str, timestamp_ns: int, payload: bytes | bytearray) -> None:
+        """Writes a message received timestamp_ns nanoseconds after the capture started"""
+        topic_id = self._topics.get(topic)
+        if topic_id is None:
+            if len(self._topics) >= MAX_TOPICS:
+                raise ValueError(f"A capture can only hold {MAX_TOPICS} topics")
+            topic_id = self._topics[topic] = len(self._topics)
+            encoded = topic.encode("utf-8")
+            self._file.write(TOPIC_HEADER.pack(TOPIC_RECORD, topic_id, len(encoded)) + encoded)
+        self._file.write(MESSAGE_HEADER.pack(MESSAGE_RECORD, topic_id, timestamp_ns, len(payload)))
+        self._file.write(payload)
+        self.messages += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "CaptureWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def capture_started(path: Path | str) -> float | None:
+    """When a capture started in seconds since the epoch, None if it didn't record it"""
+    with open(path, "rb") as capture_file:
+        header = capture_file.read(len(MAGIC) + START_HEADER.size)
+    if header[:len(MAGIC)] != MAGIC or len(header) < len(MAGIC) + START_HEADER.size:
+        return None
+    record_type, started_ns = START_HEADER.unpack_from(header, len(MAGIC))
+    return started_ns / 1e9 if record_type == START_RECORD else None
+
+
+def read_capture(path: Path | str) -> Iterator[CapturedMessage]:
+    """Reads messages from a capture file in the order they were recorded, timestamps in seconds
+
+    Timestamps are seconds since the epoch when the capture recorded the time it started, and seconds since it
+    started when it didn't. The file is memory mapped and read a message at a time, so a capture never has to
+    fit in memory.
+    """
+    with open(path, "rb") as capture_file:
+        if capture_file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a mqtt2aprs capture")
+        size = capture_file.seek(0, 2)
+        if size == len(MAGIC):
+            return
+        with mmap.mmap(capture_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            topics: dict[int, str] = {}
+            started = 0.0
+            offset = len(MAGIC)
+            while offset < size:
+                match data[offset]:
+                    case 0:
+                        if offset + TOPIC_HEADER.size > size:
+                            break
+                        _, topic_id, length = TOPIC_HEADER.unpack_from(data, offset)
+                        offset += TOPIC_HEADER.size
+                        topics[topic_id] = data[offset:offset + length].decode("utf-8")
+                        offset += length
+                    case 1:
+                        if offset + MESSAGE_HEADER.size > size:
+                            break
+                        _, topic_id, timestamp_ns, length = MESSAGE_HEADER.unpack_from(data, offset)
+                        offset += MESSAGE_HEADER.size
+                        if offset + length > size:
+                            # the recording was cut off part way through a message
+                            break
+                        yield CapturedMessage(topic=topics[topic_id], timestamp=started + timestamp_ns / 1e9,
+                                              payload=data[offset:offset + length])
+                        offset += length
+                    case 2:
+                        if offset + START_HEADER.size > size:
+                            break
+                        _, started_ns = START_HEADER.unpack_from(data, offset)
+                        started = started_ns / 1e9
+                        offset += START_HEADER.size
+                    case record_type:
+                        raise ValueError(f"{path} has an unknown record type {record_type} at {offset}")
@@ -2,44 +2,192 @@ from ..config import KissConfig
 from asyncstdlib.functools import lru_cache as alru_cache
 from asyncio import Queue
 from asyncio import CancelledError
+from asyncio import get_running_loop
+from asyncio import sleep
+from asyncio import wait_for
+from time import monotonic
+from time import perf_counter
+from urllib.parse import urlsplit
 from uuid import uuid4
 import logging
+import os
+from .metrics import ServiceMetrics
+from .packet import OutboundFrame
+from .packet.ax25 import kiss_frame
+from .packet.ax25 import kiss_prefix
+from .packet.ax25 import ui_header
+from .queues import mark_done
+from .scheduler import AirtimeScheduler
+from .transport import WriterProtocol
+from .transport import backoff_delays
+from .transport import open_writer_connection
+
 
 class KissSender:
-    def __init__(self, config: KissConfig, sender_id: str = None)->None:
+    def __init__(self, config: KissConfig, callsign: str, sender_id: str = None)->None:
         self._config = config
         self.sender_id = uuid4() if sender_id is None else sender_id
+        self.protocol: WriterProtocol | None = None
+        self._prefix = kiss_prefix(callsign, tuple(config.digipeaters), config.port)
+        # what goes on air is the unescaped AX.25 header, not the KISS framing around it
+        self._header_size = len(ui_header(callsign, tuple(config.digipeaters)))
+        self.scheduler = AirtimeScheduler(
+            baud_rate=config.baud_rate,
+            duty_cycle=config.duty_cycle,
+            window=config.duty_cycle_window,
+            min_gap=config.min_gap,
+            tx_delay=config.tx_delay,
+        )
+        self.metrics: ServiceMetrics | None = None
+        self.frames_sent = 0
+        self.reconnects = 0
+        self.last_reconnect_seconds: float | None = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.protocol is not None and not self.protocol.is_closed
 
     async def connect(self):
         logging.debug("Connect called for KissSender %s", self.sender_id)
+        name = f"KissSender {self.sender_id}"
+        if self._config.path.startswith("tcp://"):
+            url = urlsplit(self._config.path)
+            self.protocol = await open_writer_connection(
+                name=name,
+                host=url.hostname,
+                port=url.port or 8001,
+                high_water=self._config.write_buffer_high,
+                low_water=self._config.write_buffer_low,
+            )
+        else:
+            self.protocol = await open_serial_writer(name, self._config.path, self._config.serial_baud)
+            self.protocol.transport.set_write_buffer_limits(high=self._config.write_buffer_high,
+                                                            low=self._config.write_buffer_low)
         logging.debug("Connect done for KissSender %s", self.sender_id)
 
     async def disconnect(self):
         logging.debug("Disconnect called for KissSender %s", self.sender_id)
+        if self.protocol is not None:
+            self.protocol.close()
+        self.protocol = None
         logging.debug("Disconnect done for KissSender %s", self.sender_id)
-        pass
+
+    async def reconnect(self):
+        """Reconnects to the TNC, backing off between failed attempts until it succeeds"""
+        started = monotonic()
+        await self.disconnect()
+        for delay in backoff_delays(self._config.reconnect_min_delay, self._config.reconnect_max_delay):
+            try:
+                await self.connect()
+                break
+            except OSError as exc:
+                logging.warning("KissSender %s failed to connect to %s, retrying in %.1fs: %s",
+                                self.sender_id, self._config.path, delay, exc)
+                await sleep(delay)
+        self.reconnects += 1
+        self.last_reconnect_seconds = monotonic() - started
+
+    async def write(self, frames: list[bytes]) -> None:
+        """Writes KISS frames to the TNC, waiting for buffer space and reconnecting as needed until they are written
+
+        Frames only count as written once they have left the transport's buffer, so they aren't marked done,
+        or deleted from a spool, while a disconnect could still lose them. If the TNC goes away before then,
+        the whole batch is written again once it is back, so a frame may go out twice but isn't lost.
+        """
+        while True:
+            if not self.is_connected:
+                await self.reconnect()
+            if await self.protocol.writable():
+                self.protocol.transport.writelines(frames)
+                if await self.protocol.flushed():
+                    return
+
+    def schedule(self, item: OutboundFrame, queue: Queue) -> None:
+        """Hands a frame to the airtime scheduler, marking any frame it was merged with as done"""
+        replaced = self.scheduler.push(item.topic, item, self._header_size + len(item.info), item.priority)
+        if replaced is not None:
+            logging.debug("KissSender %s merged a waiting frame for %s", self.sender_id, item.topic)
+            mark_done(queue, replaced)
 
     async def run(self, queue: Queue) -> None:
         logging.debug("Run starting KissSender %s", self.sender_id)
         try:
-            while True:
-                item = await queue.get()
-                if item is None:
-                    # None can be used as a signal to stop monitoring
-                    logging.debug("Run KissSender %s received None, stopping", self.sender_id)
-                    break
-                print(f"KissSender {self.sender_id} Received item: {item}")
+            stop = False
+            while not stop or len(self.scheduler) > 0:
+                delay = self.scheduler.delay()
+                if delay is not None and delay <= 0:
+                    ready = self.scheduler.pop_ready()
+                    start = perf_counter()
+                    await self.write([kiss_frame(self._prefix, item.info) for item in ready])
+                    self.frames_sent += len(ready)
+                    if self.metrics is not None:
+                        self.metrics.observe_send("kiss", ready, perf_counter() - start)
+                    for item in ready:
+                        mark_done(queue, item)
+                elif stop:
+                    # drain what was scheduled before the stop signal
+                    await sleep(delay)
+                else:
+                    # wait for more frames, or until the channel is free for the next one
+                    try:
+                        batch = [await wait_for(queue.get(), delay)]
+                    except TimeoutError:
+                        continue
+                    while len(batch) < self._config.batch_size and not queue.empty():
+                        batch.append(queue.get_nowait())
+                    for item in batch:
+                        if item is None:
+                            # None can be used as a signal to stop monitoring
+                            logging.debug("Run KissSender %s received None, stopping", self.sender_id)
+                            stop = True
+                            mark_done(queue, item)
+                            continue
+                        self.schedule(item, queue)
         except CancelledError:
             # Handle cancellation if needed
             logging.debug("Run KissSender %s cancelled", self.sender_id)
         finally:
+            await self.disconnect()
             logging.debug("Run KissSender %s stopped", self.sender_id)
 
+    def stats(self) -> dict[str, int | float | None]:
+        return {
+            "frames_sent": self.frames_sent,
+            "reconnects": self.reconnects,
+            "last_reconnect_seconds": self.last_reconnect_seconds,
+            **{f"scheduler_{key}": value for key, value in self.scheduler.stats().items()},
+        }
+
+
+async def open_serial_writer(name: str, path: str, baud: int) -> WriterProtocol:
+    """Opens a serial port as a non-blocking, raw fd and writes to it through the event loop"""
+    import termios
+    import tty
+
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    try:
+        tty.setraw(fd)
+        attributes = termios.tcgetattr(fd)
+        speed = getattr(termios, f"B{baud}", None)
+        if speed is None:
+            raise ValueError(f"{baud} is not a baud rate this platform supports")
+        attributes[4] = attributes[5] = speed
+        termios.tcsetattr(fd, termios.TCSANOW, attributes)
+        pipe = os.fdopen(fd, "wb", buffering=0)
+    except Exception:
+        os.close(fd)
+        raise
+    _, protocol = await get_running_loop().connect_write_pipe(lambda: WriterProtocol(name), pipe)
+    return protocol
 
 
 @alru_cache
-async def get_kiss_sender(config: KissConfig, sender_id: str | None = None) -> KissSender:
+async def get_kiss_sender(config: KissConfig, callsign: str, sender_id: str | None = None) -> KissSender:
     """Returns a connected KISS client"""
-    this_sender = KissSender(config=config, sender_id=sender_id)
-    await this_sender.connect()
+    this_sender = KissSender(config=config, callsign=callsign, sender_id=sender_id)
+    try:
+        await this_sender.connect()
+    except OSError as exc:
+        # the sender reconnects with backoff once it starts running
+        logging.warning("KissSender %s could not connect, will retry: %s", this_sender.sender_id, exc)
     return this_sender
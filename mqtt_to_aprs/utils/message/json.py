@@ -1,17 +1,85 @@
+from ...config import JSONParser
 from aiomqtt.message import Message
+from collections.abc import Callable
+from collections.abc import Iterable
+from typing import Any
 import json
+import logging
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover
+    msgspec = None
+
+
+def _stdlib_loads(payload: bytes | bytearray | memoryview | str) -> any:
+    # json.loads reads bytes directly, detecting the encoding, it just can't take a memoryview
+    if isinstance(payload, memoryview):
+        payload = payload.tobytes()
+    return json.loads(payload)
+
+
+def get_json_loads(parser: JSONParser = JSONParser.auto) -> Callable[[bytes | bytearray | memoryview | str], any]:
+    """Returns the loads function for parser, auto picks the fastest one installed"""
+    if parser in (JSONParser.auto, JSONParser.orjson) and orjson is not None:
+        return orjson.loads
+    if parser in (JSONParser.auto, JSONParser.msgspec) and msgspec is not None:
+        return msgspec.json.decode
+    if parser not in (JSONParser.auto, JSONParser.stdlib):
+        logging.warning("JSON parser %s is not installed, falling back to the standard library", parser.value)
+    return _stdlib_loads
+
+
+class JSONDecoder:
+    """Parses mqtt payloads as JSON straight from bytes, without decoding them to a str first
+
+    When keys is given, and msgspec is installed, only those top level keys are pulled out of the payload. The
+    rest are still validated as JSON but never turned into python objects.
+    """
+
+    def __init__(self, parser: JSONParser = JSONParser.auto, keys: Iterable[str] | None = None) -> None:
+        self._loads = get_json_loads(parser)
+        self.keys = None if keys is None else tuple(sorted(keys))
+        self._struct_decoder = None
+        if self.keys is not None and msgspec is not None and parser in (JSONParser.auto, JSONParser.msgspec):
+            # JSON can never decode to UNSET, so it is left on exactly the keys the payload doesn't have
+            fields = [(f"field_{index}", Any, msgspec.UNSET) for index in range(len(self.keys))]
+            rename = {f"field_{index}": key for index, key in enumerate(self.keys)}
+            payload_type = msgspec.defstruct("Payload", fields, rename=rename)
+            self._struct_decoder = msgspec.json.Decoder(payload_type)
+
+    def __call__(self, payload: bytes | bytearray | memoryview | str) -> dict[str, any]:
+        if not isinstance(payload, (bytes, bytearray, memoryview, str)):
+            raise ValueError("Invalid Payload for a JSON message type. Payload must be str or bytes")
+        try:
+            if self._struct_decoder is not None:
+                return self._decode_keys(payload)
+            return self._loads(payload)
+        except Exception as exc:
+            raise ValueError(f"Error while parsing payload as json {exc}")
+
+    def _decode_keys(self, payload: bytes | bytearray | memoryview | str) -> dict[str, any]:
+        try:
+            decoded = self._struct_decoder.decode(payload)
+        except msgspec.ValidationError:
+            # valid JSON that isn't an object, parse it all so the translator sees exactly what was sent
+            return self._loads(payload)
+        data = {}
+        for index, key in enumerate(self.keys):
+            value = getattr(decoded, f"field_{index}")
+            if value is not msgspec.UNSET:
+                data[key] = value
+        return data
+
+
+decode_json = JSONDecoder()
 
 
 async def message_json(message: Message) -> dict[str, any]:
     """Convert a mqtt object to a python dict by reading JSON"""
-    if isinstance(message.payload, bytes):
-        payload = message.payload.decode('utf-8')
-    elif isinstance(message.payload, str):
-        payload = message.payload
-    else:
-        raise ValueError("Invalid Payload for a JSON message type. Payload must be str or bytes")
-    try:
-        data = json.loads(payload)
-    except Exception as exc:
-        raise ValueError(f"Error while parsing payload as json {exc}")
-    return data
+    return decode_json(message.payload)
@@ -0,0 +1,76 @@
+from ...config import JMESPathWeatherFields
+from pydantic import BaseModel
+from pydantic import Field
+from pydantic import ValidationError
+from pydantic import create_model
+
+# segment -> the weather fields read from it, or the tree of segments below it
+PathTree = dict[str, "list[str] | PathTree"]
+# (attribute, weather fields) for a value, or (attribute, nested spec) for an object
+ExtractSpec = tuple[tuple[str, "tuple[str, ...] | ExtractSpec", bool], ...]
+
+
+class TypedJSONDecoder:
+    """Decodes a topic's payload with a schema compiled from its translator's field paths
+
+    Every weather field is a number, so each dotted path becomes a chain of nested models ending in an
+    optional float. pydantic validates the payload and pulls out just those values in one pass over the
+    bytes, ignoring every other key. A payload with a value of the wrong type is rejected before it gets near
+    a translator.
+
+    Returns a dict of weather field name to value, the same shape a WeatherFieldPlan's JMESPath search does.
+    """
+
+    def __init__(self, fields: JMESPathWeatherFields) -> None:
+        tree: PathTree = {}
+        self.field_names: tuple[str, ...] = ()
+        for key, path in fields.model_dump().items():
+            if path is None:
+                continue
+            self.field_names += (key,)
+            node = tree
+            *parents, leaf = path.split(".")
+            for segment in parents:
+                node = node.setdefault(segment, {})
+            node.setdefault(leaf, []).append(key)
+        self.model, self._spec = _compile("Payload", tree)
+
+    def __call__(self, payload: bytes | bytearray | str) -> dict[str, any]:
+        if not isinstance(payload, (bytes, bytearray, str)):
+            raise ValueError("Invalid Payload for a typed message type. Payload must be str or bytes")
+        try:
+            decoded = self.model.model_validate_json(payload)
+        except ValidationError as exc:
+            raise ValueError(f"Payload does not match the topic's schema: {exc}")
+        data = dict.fromkeys(self.field_names)
+        _extract(decoded, self._spec, data)
+        return data
+
+
+def _compile(name: str, tree: PathTree) -> tuple[type[BaseModel], ExtractSpec]:
+    # attribute names are generated, payload keys don't have to be valid python identifiers
+    model_fields = {}
+    spec = []
+    for index, (segment, node) in enumerate(tree.items()):
+        attribute = f"field_{index}"
+        if isinstance(node, dict):
+            child, child_spec = _compile(f"{name}_{index}", node)
+            model_fields[attribute] = (child | None, Field(None, alias=segment))
+            spec.append((attribute, child_spec, True))
+        else:
+            model_fields[attribute] = (float | None, Field(None, alias=segment))
+            spec.append((attribute, tuple(node), False))
+    return create_model(name, **model_fields), tuple(spec)
+
+
+def _extract(decoded: BaseModel, spec: ExtractSpec, data: dict[str, any]) -> None:
+    for attribute, node, is_object in spec:
+        value = getattr(decoded, attribute)
+        if value is None:
+            # data already has None for every field
+            continue
+        if is_object:
+            _extract(value, node, data)
+        else:
+            for key in node:
+                data[key] = value
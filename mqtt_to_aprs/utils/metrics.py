@@ -0,0 +1,210 @@
+# counters and histograms for the service, served in the prometheus text format
+from asyncio import Server
+from asyncio import StreamReader
+from asyncio import StreamWriter
+from asyncio import start_server
+from bisect import bisect_left
+from collections.abc import Callable
+from time import time
+import logging
+
+# seconds, for work done on a single message
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# seconds, for frames waiting to go out, which can be held back by rate limits, airtime or an outage
+WAIT_BUCKETS = (0.001, 0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """A count for each combination of label values
+
+    There are no locks, metrics are only updated from the event loop's thread, so an update is a dict lookup
+    and an add.
+    """
+    __slots__ = ("name", "help", "label_names", "values")
+    type = "counter"
+
+    def __init__(self, name: str, help: str, label_names: Labels = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.values: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_labels(self.label_names, labels)} {value}" for labels, value in self.values.items()]
+
+
+class Histogram:
+    """Counts of observations in fixed buckets, plus their sum, for each combination of label values
+
+    Each series is a flat list of bucket counts followed by the sum, so observing a value is a bisect and two
+    adds. Buckets are only made cumulative when they're rendered.
+    """
+    __slots__ = ("name", "help", "label_names", "buckets", "series")
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, label_names: Labels = (), buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series: dict[Labels, list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            # one count per bucket, one for +Inf, then the sum
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        for labels, series in self.series.items():
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                total += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _labels(self.label_names, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {total}")
+        return lines
+
+
+class Collected:
+    """A metric read from somewhere else when it is scraped, like a queue's size, so it costs nothing until then
+
+    function returns the value for each combination of label values.
+    """
+    __slots__ = ("name", "help", "label_names", "type", "function")
+
+    def __init__(self, name: str, help: str, function: Callable[[], dict[Labels, float]], label_names: Labels = (),
+                 type: str = "gauge") -> None:
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.type = type
+        self.function = function
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_labels(self.label_names, labels)} {value}" for labels, value in self.function().items()
+                if value is not None]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.metrics: list[Counter | Histogram | Collected] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> bytes:
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = metric.samples()
+            except Exception as exc:
+                logging.warning("Failed to collect metric %s: %s", metric.name, exc)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(samples)
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class ServiceMetrics:
+    """The metrics the listener and senders record, topics are labelled by their configured topic filter"""
+
+    def __init__(self, registry: MetricsRegistry | None = None) -> None:
+        self.registry = MetricsRegistry() if registry is None else registry
+        register = self.registry.register
+        self.messages = register(Counter("mqtt2aprs_messages_total", "Messages received", ("topic",)))
+        self.unrouted = register(Counter("mqtt2aprs_unrouted_messages_total", "Messages on a topic with no route"))
+        self.errors = register(Counter("mqtt2aprs_message_errors_total", "Messages that failed to decode or translate", ("topic",)))
+        self.frames = register(Counter("mqtt2aprs_frames_total", "Frames translated and queued", ("topic",)))
+        self.suppressed = register(Counter("mqtt2aprs_frames_suppressed_total", "Messages the translator chose not to send, "
+                                           "ie a beacon", ("topic",)))
+        self.decode = register(Histogram("mqtt2aprs_decode_seconds", "Time to decode a message", ("topic",)))
+        self.translate = register(Histogram("mqtt2aprs_translate_seconds", "Time to translate a message", ("topic",)))
+        self.queue_wait = register(Histogram("mqtt2aprs_queue_wait_seconds", "Time from a frame being queued to being "
+                                             "written", ("queue",), buckets=WAIT_BUCKETS))
+        self.send = register(Histogram("mqtt2aprs_send_seconds", "Time to write a batch of frames", ("queue",)))
+
+    def observe_send(self, queue: str, frames: list, seconds: float) -> None:
+        """Records a batch of frames written by a sender, and how long they waited to be"""
+        now = time()
+        for frame in frames:
+            self.queue_wait.observe(now - frame.created, queue)
+        self.send.observe(seconds, queue)
+
+    def watch_queue(self, name: str, queue) -> None:
+        self.registry.register(Collected(f"mqtt2aprs_{name}_queue_depth", f"Frames waiting in the {name} queue",
+                                         lambda: {(): queue.qsize()}))
+
+    def watch_work_queues(self, function: Callable[[], int]) -> None:
+        self.registry.register(Collected("mqtt2aprs_work_queue_depth", "Messages waiting for a worker",
+                                         lambda: {(): function()}))
+
+    def watch_sender(self, name: str, sender) -> None:
+        """Exports a sender's own counters, frames_sent, reconnects and the rest, read at scrape time"""
+        stats = sender.stats()
+        for key in stats:
+            self.registry.register(Collected(f"mqtt2aprs_{name}_{key}", f"{key.replace('_', ' ')} for {name}",
+                                             lambda key=key: {(): sender.stats()[key]}))
+
+
+class MetricsServer:
+    """Serves a registry over plain HTTP on /metrics, for prometheus to scrape"""
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9108) -> None:
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Server | None = None
+
+    async def start(self) -> None:
+        self._server = await start_server(self._handle, self.host, self.port)
+        logging.info("Serving metrics on http://%s:%d/metrics", self.host, self.port)
+
+    async def _handle(self, reader: StreamReader, writer: StreamWriter) -> None:
+        try:
+            request = await reader.readline()
+            # headers aren't needed, just read past them
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.split()
+            if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+                status, body = "200 OK", self.registry.render()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\nContent-Length: {len(body)}\r\n"
+                         f"Connection: close\r\n\r\n".encode("ascii") + body)
+            await writer.drain()
+        except (ConnectionError, OSError) as exc:
+            logging.debug("Metrics request failed: %s", exc)
+        finally:
+            writer.close()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
@@ -1,19 +1,34 @@
 from ..config import MQTTConfig, ConfigObject
+from ..config import MQTTTopicConfig
 from asyncio import Queue
 from asyncio import CancelledError
 from uuid import uuid4
 import logging
 from aiomqtt import Client
-from ..config import MQTTTopicTypes
-from ..config import TranslatorType
-from ..config import APRSPacketTypes
+from aiomqtt.message import Message
+from asyncio import create_task
 from ..config import APRSOutputTargets
-from .message.json import message_json
-from collections.abc import Awaitable
-from .translator.jmespath import JMESPathTranslator
+from ..config import ExecutionMode
+from typing import NamedTuple
+from .pipeline import CompiledTopic
+from .pipeline import ShardedProcessPool
+from .topic import TopicRouter
+from .metrics import ServiceMetrics
+from .packet import OutboundFrame
+from time import time
+
+
+class TopicRoute(NamedTuple):
+    """Everything needed to turn a message on a topic into a packet on an output queue"""
+    topic: str
+    compiled: CompiledTopic
+    output_queues: tuple[Queue, ...]
+    priority: int
+
 
 class MQTTListener:
-    def __init__(self, config: ConfigObject, mqtt_client: Client, internet_queue: Queue, kiss_queue: Queue, listener_id: str = None)->None:
+    def __init__(self, config: ConfigObject, mqtt_client: Client, internet_queue: Queue, kiss_queue: Queue, listener_id: str = None,
+                 metrics: ServiceMetrics | None = None)->None:
         self._config: MQTTConfig = config.mqtt
         self._service_config: ConfigObject = config
         self._topic_names: list[str] = [topic.topic for topic in self._config.topics]
@@ -21,79 +36,239 @@ class MQTTListener:
         self.listener_id: str = str(uuid4()) if listener_id is None else listener_id
         self._internet_queue: Queue = internet_queue
         self._kiss_queue = kiss_queue
-        self.translators: dict[str, Awaitable] = {}
-        self.loaders: dict[str, Awaitable] = {}
-        self.output_types: dict[str, APRSPacketTypes] = {}
-        self.output_queues: dict[str, Queue] = {}
+        self.routes: TopicRouter = TopicRouter()
+        self._pool: ShardedProcessPool | None = None
         self._is_connected = False
+        self.metrics = metrics
+        self._work_queues: list[Queue] = []
+        self._subscribed = False
 
-    async def connect(self):
-        logging.debug("Connect called for MQTTListener %s", self.listener_id)
-        for topic in self._config.topics:
-            match topic.translator.type:
-                case TranslatorType.jmespath:
-                    self.translators[topic.topic] = JMESPathTranslator(topic.translator, self._service_config).translate
-                case _:
-                    raise NotImplementedError(f"{topic.translator.type} not a valid translator")
-
-            match topic.input_type:
-                case MQTTTopicTypes.json:
-                    self.loaders[topic.topic] = message_json
-                case _:
-                    raise NotImplementedError(f"{topic.input_type} not a valid input type")
-
-            match topic.target:
+    def _make_route(self, topic: MQTTTopicConfig, service_config: ConfigObject) -> TopicRoute:
+        output_queues = []
+        for target in topic.target:
+            match target:
                 case APRSOutputTargets.internet:
-                    self.output_queues[topic.topic] = self._internet_queue
+                    output_queue = self._internet_queue
 
                 case APRSOutputTargets.kiss:
-                    self.output_queues[topic.topic] = self._kiss_queue
+                    output_queue = self._kiss_queue
 
                 case _:
-                    raise NotImplementedError(f"{topic.target} is not a valid output target")
+                    raise NotImplementedError(f"{target} is not a valid output target")
+            if output_queue is None:
+                logging.warning("Topic %s targets %s, which isn't configured", topic.topic, target.value)
+                continue
+            output_queues.append(output_queue)
+
+        return TopicRoute(
+            topic=topic.topic,
+            compiled=CompiledTopic.from_config(topic, service_config),
+            output_queues=tuple(output_queues),
+            priority=topic.priority)
 
-            self.output_types[topic.topic] = topic.output_type
+    async def connect(self):
+        logging.debug("Connect called for MQTTListener %s", self.listener_id)
+        for topic in self._config.topics:
+            self.routes.add(topic.topic, self._make_route(topic, self._service_config))
+        if self._config.execution == ExecutionMode.process and self._pool is None:
+            self._pool = ShardedProcessPool(self._service_config, self._config.workers)
         self._is_connected = True
         logging.debug("Connect done for MQTTListener %s", self.listener_id)
 
     async def disconnect(self):
         logging.debug("Disconnect called for MQTTListener %s", self.listener_id)
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
         self._is_connected = False
         logging.debug("Disconnect done for MQTTListener %s", self.listener_id)
         pass
 
     async def listen(self) -> None:
+        """Reads messages from MQTT and passes them through the pipeline
+
+        Intake only routes each message, then hands it to one of the worker tasks to decode, translate and
+        queue for sending. Messages are sharded across workers by topic, so packets from any one station
+        still come out in the order they went in.
+        """
         logging.debug("Listen starting MQTTListener %s", self.listener_id)
         if not self._is_connected:
             await self.connect()
+        work_queues = self._work_queues = [Queue(maxsize=self._config.worker_queue_size) for _ in range(self._config.workers)]
+        if self.metrics is not None:
+            self.metrics.watch_work_queues(lambda: sum(queue.qsize() for queue in self._work_queues))
+        work = self._work if self._pool is None else self._work_in_process
+        workers = [create_task(work(index, queue)) for index, queue in enumerate(work_queues)]
         try:
             while True:
                 async with self.client as client:
                     for topic in self._topic_names:
                         await client.subscribe(topic)
+                    self._subscribed = True
                     async for message in client.messages:
                         message_topic = str(message.topic)
-                        loader = self.loaders.get(message_topic, None)
-                        if loader is None:
-                            logging.error("Message from topic %s does not have a loader. Message payload: %s", message_topic, message.payload)
+                        route = self.routes.get(message_topic)
+                        if route is None:
+                            if self.metrics is not None:
+                                self.metrics.unrouted.inc()
+                            logging.error("Message from topic %s does not have a route. Message payload: %s", message_topic, message.payload)
                             continue
-                        message_data = await loader(message)
-                        translator = self.translators.get(message_topic, None)
-                        if translator is None:
-                            logging.error("Message from topic %s does not have a translator.  Message payload: %s", message_topic, message.payload)
-                            continue
-                        packet_data = await translator(message_data, self.output_types.get(message_topic))
-                        output_queue = self.output_queues.get(message_topic, None)
-                        if output_queue is None:
+                        if len(route.output_queues) == 0:
                             logging.error("Message from topic %s does not have an output queue.  Message payload: %s", message_topic, message.payload)
                             continue
-                        await output_queue.put(packet_data)
+                        if self.metrics is not None:
+                            self.metrics.messages.inc(route.topic)
+                        await work_queues[hash(message_topic) % len(work_queues)].put((message_topic, route, message))
+                    self._subscribed = False
+                # the stream only ends cleanly when the client runs out of messages, ie a replayed capture
+                logging.debug("Listen MQTTListener %s reached the end of the messages", self.listener_id)
+                for work_queue in work_queues:
+                    await work_queue.join()
+                break
         except CancelledError:
             # Handle cancellation if needed
             logging.debug("Run MQTTListener %s cancelled", self.listener_id)
         finally:
+            self._subscribed = False
+            for worker in workers:
+                worker.cancel()
+            await self.disconnect()
             logging.debug("Run MQTTListener %s stopped", self.listener_id)
 
+    async def reload(self, config: ConfigObject) -> dict[str, list[str]]:
+        """Swaps in the topics from a new config, keeping the MQTT session, the work queues and the output queues
+
+        Only topics that were added or removed are subscribed or unsubscribed, and only added or changed topics
+        are compiled, so unchanged topics keep their beacon and aggregate state. Everything is compiled before
+        any route is touched, then the routes are swapped with no await in between, so a message is either
+        handled entirely by the old translators or entirely by the new ones. Messages already waiting for a
+        worker finish with the route they were given. In process mode the worker processes are sent the same
+        added and changed topics, queued behind the batches they already have, so unchanged topics keep their
+        state there too.
+
+        Returns the added, removed and changed topic filters.
+        """
+        old_topics = {topic.topic: topic for topic in self._config.topics}
+        new_topics = {topic.topic: topic for topic in config.mqtt.topics}
+        # the location and parser are compiled into every topic
+        recompile_all = (config.location != self._service_config.location
+                         or config.mqtt.json_parser != self._config.json_parser)
+        added = [topic for topic in new_topics if topic not in old_topics]
+        removed = [topic for topic in old_topics if topic not in new_topics]
+        changed = [topic for topic in new_topics if topic in old_topics
+                   and (recompile_all or new_topics[topic] != old_topics[topic])]
+        for setting in ("host", "port", "username", "password", "workers", "worker_queue_size", "execution"):
+            if getattr(config.mqtt, setting) != getattr(self._config, setting):
+                logging.warning("MQTTListener %s can't change mqtt.%s on reload, restart to apply it",
+                                self.listener_id, setting)
+
+        routes = {topic: self._make_route(new_topics[topic], config) for topic in added + changed}
+
+        # the swap, nothing below awaits until the routes and the workers' updates are all in place
+        for topic, route in routes.items():
+            self.routes.add(topic, route)
+        pool_update = None
+        if self._pool is not None and len(routes) > 0:
+            pool_update = self._pool.update(config, [new_topics[topic] for topic in routes])
+        self._service_config = config
+        self._config = config.mqtt.model_copy(update={
+            setting: getattr(self._config, setting) for setting in ("workers", "worker_queue_size", "execution")})
+        self._topic_names = [topic.topic for topic in self._config.topics]
+        if pool_update is not None:
+            await pool_update
+
+        if self._subscribed:
+            try:
+                for topic in added:
+                    await self.client.subscribe(topic)
+                for topic in removed:
+                    await self.client.unsubscribe(topic)
+            except Exception as exc:
+                # the subscriptions are made from _topic_names again whenever the client reconnects
+                logging.error("MQTTListener %s failed to update subscriptions on reload: %s", self.listener_id, exc)
+        # removed routes are kept until they're unsubscribed, so nothing already sent on them goes unrouted
+        for topic in removed:
+            self.routes.remove(topic)
+        if self._pool is not None and len(removed) > 0:
+            await self._pool.update(config, [], removed)
+        logging.info("MQTTListener %s reloaded, %d topics added, %d removed, %d changed", self.listener_id,
+                     len(added), len(removed), len(changed))
+        return {"added": added, "removed": removed, "changed": changed}
+
+    async def _work(self, worker_id: int, work_queue: Queue) -> None:
+        logging.debug("Worker %d starting MQTTListener %s", worker_id, self.listener_id)
+        try:
+            while True:
+                message_topic, route, message = await work_queue.get()
+                try:
+                    await self.process(message_topic, route, message)
+                except Exception as exc:
+                    if self.metrics is not None:
+                        self.metrics.errors.inc(route.topic)
+                    logging.error("Error processing message from topic %s: %s. Message payload: %s", message_topic, exc, message.payload)
+                finally:
+                    work_queue.task_done()
+        except CancelledError:
+            logging.debug("Worker %d MQTTListener %s cancelled", worker_id, self.listener_id)
+
+    async def _work_in_process(self, worker_id: int, work_queue: Queue) -> None:
+        """Sends messages to this worker's process in batches, then queues the packets in the order they came in"""
+        logging.debug("Worker %d starting MQTTListener %s in a process", worker_id, self.listener_id)
+        try:
+            while True:
+                batch = [await work_queue.get()]
+                while len(batch) < self._config.batch_size and not work_queue.empty():
+                    batch.append(work_queue.get_nowait())
+                try:
+                    messages = [(message_topic, message.payload, None) for message_topic, _, message in batch]
+                    if self.metrics is None:
+                        results = await self._pool.process(worker_id, messages)
+                    else:
+                        # the processes time each message, so the histograms are the same as inline
+                        results = []
+                        timed = await self._pool.process_timed(worker_id, messages)
+                        for (_, route, _), (packet_data, error, decode_seconds, translate_seconds) in zip(batch, timed):
+                            if error is None:
+                                self.metrics.decode.observe(decode_seconds, route.topic)
+                                self.metrics.translate.observe(translate_seconds, route.topic)
+                            results.append((packet_data, error))
+                    for (message_topic, route, message), (packet_data, error) in zip(batch, results):
+                        if error is not None:
+                            if self.metrics is not None:
+                                self.metrics.errors.inc(route.topic)
+                            logging.error("Error processing message from topic %s: %s. Message payload: %s", message_topic, error, message.payload)
+                            continue
+                        await self.send(message_topic, route, packet_data)
+                except Exception as exc:
+                    logging.error("Error processing a batch of %d messages in worker %d: %s", len(batch), worker_id, exc)
+                finally:
+                    for _ in batch:
+                        work_queue.task_done()
+        except CancelledError:
+            logging.debug("Worker %d MQTTListener %s cancelled", worker_id, self.listener_id)
+
+    async def process(self, message_topic: str, route: TopicRoute, message: Message) -> None:
+        """Decodes and translates one message, and queues the packet for sending"""
+        if self.metrics is None:
+            await self.send(message_topic, route, route.compiled.run(message_topic, message.payload))
+            return
+        packet_data, decode_seconds, translate_seconds = route.compiled.run_timed(message_topic, message.payload)
+        self.metrics.decode.observe(decode_seconds, route.topic)
+        self.metrics.translate.observe(translate_seconds, route.topic)
+        await self.send(message_topic, route, packet_data)
+
+    async def send(self, message_topic: str, route: TopicRoute, packet_data: bytes | None) -> None:
+        """Queues one frame for every target, each sender adds its own address header to the shared info field"""
+        if packet_data is None:
+            if self.metrics is not None:
+                self.metrics.suppressed.inc(route.topic)
+            return
+        if self.metrics is not None:
+            self.metrics.frames.inc(route.topic)
+        frame = OutboundFrame(topic=message_topic, info=packet_data, created=time(), priority=route.priority)
+        for output_queue in route.output_queues:
+            await output_queue.put(frame)
+
 
 async def get_mqtt_listener(config: ConfigObject, mqtt_client: Client, queue: Queue, listener_id: str | None = None) -> MQTTListener:
     """Returns a connected KISS client"""
@@ -1,3 +1,24 @@
+from functools import lru_cache
+from math import log
+from typing import NamedTuple
+
+
+class OutboundFrame(NamedTuple):
+    """An APRS information field waiting to be sent, and where it came from"""
+    topic: str
+    info: bytes
+    created: float
+    priority: int = 0
+
+
+def packet_body(info: bytes) -> bytes:
+    """Strips the timestamp from an information field, so reports with the same data compare equal"""
+    # @DDHHMMz, /DDHHMMz, @HHMMSSh and friends
+    if info[:1] in (b"@", b"/") and info[7:8] in (b"z", b"h", b"/"):
+        return info[8:]
+    return info
+
+
 def decdeg2dms(degrees_decimal: float) -> dict[str, any]:
     is_positive = degrees_decimal >= 0
     degrees_decimal = abs(degrees_decimal)
@@ -57,13 +78,67 @@ def make_position(latitude: float, longitude: float) -> str:
     return f"{convert_latitude(latitude)}/{convert_longitude(longitude)}_"
 
 
-def address(callsign: str, path: str) -> str:
+@lru_cache(maxsize=4096)
+def encode_position(latitude: float, longitude: float) -> bytes:
+    """Same as make_position, but as bytes and cached, as most stations report from a fixed position"""
+    return make_position(latitude=latitude, longitude=longitude).encode("ascii")
+
+
+# 91^3, 91^2, 91, 1 for splitting a value into four base 91 digits
+_BASE91_PLACES = (753571, 8281, 91, 1)
+# compression type: current GPS fix, other NMEA source, software origin
+COMPRESSION_TYPE = bytes([33 + 0b100010])
+KNOTS_PER_MPH = 0.868976
+_LOG_SPEED_BASE = log(1.08)
+
+
+def base91(value: int) -> bytes:
+    """Encodes value as four base 91 digits"""
+    digits = bytearray(4)
+    for index, place in enumerate(_BASE91_PLACES):
+        digit, value = divmod(value, place)
+        digits[index] = digit + 33
+    return bytes(digits)
+
+
+@lru_cache(maxsize=4096)
+def encode_compressed_position(latitude: float, longitude: float, symbol_table: bytes = b"/", symbol: bytes = b"_") -> bytes:
+    """Encodes a decimal latitude and longitude as an APRS compressed position, without the csT bytes
+
+    /YYYYXXXX_ is 10 bytes against 19 for make_position, and cached, as most stations report from a fixed position
+    """
+    latitude = min(max(latitude, -90.0), 90.0)
+    longitude = min(max(longitude, -180.0), 180.0)
+    # 91^4 - 1 fits exactly, clamping keeps the poles and the date line in range
+    y = min(int(380926 * (90 - latitude)), 68574960)
+    x = min(int(190463 * (180 + longitude)), 68574960)
+    return b"%s%s%s%s" % (symbol_table, base91(y), base91(x), symbol)
+
+
+@lru_cache(maxsize=4096)
+def encode_compressed_wind(wind_dir: int | None, wind_speed: int | None) -> bytes:
+    """Encodes wind direction in degrees and speed in mph as the csT bytes of a compressed position
+
+    Speed is sent in knots, on the log scale the compressed format uses. Without both values there is no course
+    and speed, which is marked with a space.
+    """
+    if wind_dir is None or wind_speed is None:
+        return b"  " + COMPRESSION_TYPE
+    course = (wind_dir % 360) // 4
+    speed = min(round(log(max(wind_speed, 0) * KNOTS_PER_MPH + 1) / _LOG_SPEED_BASE), 89)
+    return bytes([course + 33, speed + 33]) + COMPRESSION_TYPE
+
+
+def address(callsign: str, path: str, digipeaters: tuple[str, ...] = ("WIDE1-1", "WIDE2-1")) -> str:
     """Converts a callsign into an address string"""
     match path:
         case "is":
             dest = "TCPIP*"
         case "kiss":
-            raise NotImplementedError("KISS is not implemented yet")
+            # the binary AX.25 header the TNC gets is built by packet.ax25, this is the same path as text
+            if len(digipeaters) == 0:
+                return f"{callsign}>APRS:"
+            dest = ",".join(digipeaters)
         case _:
             raise NotImplementedError("Unknown path")
     return f"{callsign}>APRS,{dest}:"
@@ -0,0 +1,57 @@
+# AX.25 UI frames wrapped in KISS, for sending APRS packets to a TNC
+# http://www.aprs.org/doc/APRS101.PDF chapter 3 and http://www.ax25.net/kiss.aspx
+from functools import lru_cache
+
+FEND = b"\xc0"
+FESC = b"\xdb"
+TFEND = b"\xdc"
+TFESC = b"\xdd"
+
+# control field for a UI frame and protocol id for no layer 3
+UI_CONTROL_PID = b"\x03\xf0"
+APRS_DESTINATION = "APRS"
+
+
+@lru_cache(maxsize=1024)
+def encode_address(callsign: str, last: bool = False, command: bool = False) -> bytes:
+    """Encodes a callsign with an optional -SSID into a 7 byte AX.25 address field
+
+    command sets the C bit for source and destination addresses, or the H (has been repeated) bit for digipeaters.
+    """
+    call, _, ssid = callsign.upper().partition("-")
+    if len(call) == 0 or len(call) > 6 or not call.isalnum():
+        raise ValueError(f"{callsign} is not a valid AX.25 callsign")
+    ssid_value = int(ssid) if ssid != "" else 0
+    if not 0 <= ssid_value <= 15:
+        raise ValueError(f"{callsign} has an SSID outside 0-15")
+    ssid_byte = 0b01100000 | (ssid_value << 1) | int(last) | (0x80 if command else 0)
+    return bytes(ord(char) << 1 for char in call.ljust(6)) + bytes([ssid_byte])
+
+
+@lru_cache(maxsize=1024)
+def ui_header(source: str, digipeaters: tuple[str, ...] = (), destination: str = APRS_DESTINATION) -> bytes:
+    """Builds the address, control and PID fields of an AX.25 UI frame
+
+    Cached, as every frame from a station shares the same header
+    """
+    addresses = [encode_address(destination, command=True), encode_address(source, last=len(digipeaters) == 0)]
+    for index, digipeater in enumerate(digipeaters):
+        repeated = digipeater.endswith("*")
+        addresses.append(encode_address(digipeater.rstrip("*"), last=index == len(digipeaters) - 1, command=repeated))
+    return b"".join(addresses) + UI_CONTROL_PID
+
+
+def kiss_escape(data: bytes) -> bytes:
+    """Escapes FEND and FESC in data, FESC has to go first so the FEND escapes aren't escaped again"""
+    return data.replace(FESC, FESC + TFESC).replace(FEND, FESC + TFEND)
+
+
+@lru_cache(maxsize=1024)
+def kiss_prefix(source: str, digipeaters: tuple[str, ...] = (), port: int = 0) -> bytes:
+    """The start of a KISS data frame for a station: FEND, the command byte, and the escaped AX.25 header"""
+    return FEND + bytes([(port & 0x0F) << 4]) + kiss_escape(ui_header(source, digipeaters))
+
+
+def kiss_frame(prefix: bytes, info: bytes) -> bytes:
+    """Completes a KISS frame for info, prefix comes from kiss_prefix"""
+    return prefix + kiss_escape(info) + FEND
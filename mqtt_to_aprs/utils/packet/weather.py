@@ -1,4 +1,7 @@
 from datetime import datetime, timezone
+from time import gmtime
+from time import strftime
+from time import time
 import logging
 
 
@@ -41,3 +44,78 @@ def make_position_weather_packet(position: str, weather_data: str, send_id: str
         timestamp = datetime.now(timezone.utc).strftime('%d%H%M')
     packet_data = f"@{timestamp}z{position}{weather_data}w{send_id}"
     return packet_data
+
+
+# (prefix, field width) for each make_weather_data argument, in packet order
+# humidity is handled on its own as it is optional and wraps 100% to 00
+WEATHER_FIELD_FORMATS: tuple[tuple[str, bytes, int], ...] = (
+    ("wind_dir", b"", 3),
+    ("wind_speed", b"/", 3),
+    ("wind_gust", b"g", 3),
+    ("temperature", b"t", 3),
+    ("rain_last_hr", b"r", 3),
+    ("rain_last_24_hrs", b"p", 3),
+    ("rain_since_midnight", b"P", 3),
+)
+_MISSING_FIELDS = tuple(prefix + b"." * width for _, prefix, width in WEATHER_FIELD_FORMATS)
+_MISSING_PRESSURE = b"b....."
+
+
+class _MinuteTimestamp:
+    """Caches the DDHHMM zulu timestamp, which only changes once a minute"""
+    __slots__ = ("minute", "value")
+
+    def __init__(self) -> None:
+        self.minute = -1
+        self.value = b""
+
+    def get(self, now: float | None = None) -> bytes:
+        """The timestamp for now, in seconds since the epoch, or for the current time"""
+        if now is None:
+            now = time()
+        minute = int(now // 60)
+        if minute != self.minute:
+            self.value = strftime("%d%H%M", gmtime(now)).encode("ascii")
+            self.minute = minute
+        return self.value
+
+
+_timestamp = _MinuteTimestamp()
+
+
+def encode_weather_data(wind_dir: float | None = None, wind_speed: float | None = None, wind_gust: float | None = None,
+                        temperature: float | None = None, rain_last_hr: float | None = None,
+                        rain_last_24_hrs: float | None = None, rain_since_midnight: float | None = None,
+                        humidity: float | None = None, pressure: float | None = None, compressed: bool = False) -> bytes:
+    """Encodes weather data straight to bytes, byte for byte the same as make_weather_data(...).encode()
+
+    compressed leaves out wind_dir and wind_speed and starts at the gust, for a compressed position which
+    carries the wind in its course and speed bytes
+    """
+    if temperature is not None and int(temperature) <= -100:
+        logging.debug("Temperature value %d is less than or equal to -100, rounding to -99", temperature)
+        temperature = -99
+    parts = []
+    values = (wind_dir, wind_speed, wind_gust, temperature, rain_last_hr, rain_last_24_hrs, rain_since_midnight)
+    start = 2 if compressed else 0
+    for value, (_, prefix, width), missing in zip(values[start:], WEATHER_FIELD_FORMATS[start:], _MISSING_FIELDS[start:]):
+        parts.append(missing if value is None else b"%s%0*d" % (prefix, width, int(value)))
+    if humidity is not None:
+        if int(humidity) >= 100:
+            logging.debug("Humidity value %d is greater than or equal to 100, rounding to 00", humidity)
+            parts.append(b"h00")
+        else:
+            parts.append(b"h%02d" % int(humidity))
+    parts.append(_MISSING_PRESSURE if pressure is None else b"b%05d" % int(pressure))
+    return b"".join(parts)
+
+
+def encode_position_weather_packet(position: bytes, weather_data: bytes, send_id: bytes = b"",
+                                   timestamp: bytes = b"", sent_at: float | None = None) -> bytes:
+    """Creates a weather packet as bytes, reusing the timestamp for every packet sent in the same minute
+
+    Without a timestamp, the packet is stamped with sent_at in seconds since the epoch, or the current time
+    """
+    if timestamp == b"":
+        timestamp = _timestamp.get(sent_at)
+    return b"@%sz%s%sw%s" % (timestamp, position, weather_data, send_id)
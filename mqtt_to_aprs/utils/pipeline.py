@@ -0,0 +1,155 @@
+from ..config import APRSPacketTypes
+from ..config import ConfigObject
+from ..config import MQTTTopicConfig
+from ..config import MQTTTopicTypes
+from ..config import TranslatorType
+from asyncio import Future
+from asyncio import gather
+from asyncio import get_running_loop
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import NamedTuple
+from .message.json import JSONDecoder
+from .message.typed import TypedJSONDecoder
+from .topic import TopicRouter
+from .translator import Translator
+from .translator.jmespath import JMESPathTranslator
+
+
+def make_decoder(topic: MQTTTopicConfig, service_config: ConfigObject,
+                 translator: Translator) -> Callable[[bytes | str], dict[str, any]]:
+    match topic.input_type:
+        case MQTTTopicTypes.json:
+            return JSONDecoder(service_config.mqtt.json_parser, keys=translator.required_keys)
+        case MQTTTopicTypes.typed:
+            return TypedJSONDecoder(topic.translator.config.fields)
+        case _:
+            raise NotImplementedError(f"{topic.input_type} not a valid input type")
+
+
+def make_translator(topic: MQTTTopicConfig, service_config: ConfigObject) -> Translator:
+    match topic.translator.type:
+        case TranslatorType.jmespath:
+            return JMESPathTranslator(topic.translator, service_config, beacon=topic.beacon,
+                                      position_format=topic.position_format, extracted=topic.input_type == MQTTTopicTypes.typed)
+        case _:
+            raise NotImplementedError(f"{topic.translator.type} not a valid translator")
+
+
+class CompiledTopic(NamedTuple):
+    """The CPU bound half of a topic's pipeline, which can run in the event loop or in a worker process"""
+    decoder: Callable[[bytes | str], dict[str, any]]
+    translator: Translator
+    output_type: APRSPacketTypes
+
+    @classmethod
+    def from_config(cls, topic: MQTTTopicConfig, service_config: ConfigObject) -> "CompiledTopic":
+        translator = make_translator(topic, service_config)
+        return cls(decoder=make_decoder(topic, service_config, translator), translator=translator,
+                   output_type=topic.output_type)
+
+    def run(self, station: str, payload: bytes | str, timestamp: float | None = None) -> bytes | None:
+        """Decodes and translates one payload into an information field, or None if there is nothing to send"""
+        return self.translator.translate_sync(self.decoder(payload), self.output_type, station=station, timestamp=timestamp)
+
+    def run_timed(self, station: str, payload: bytes | str,
+                  timestamp: float | None = None) -> tuple[bytes | None, float, float]:
+        """Same as run, also returning the seconds spent decoding and translating"""
+        start = perf_counter()
+        data = self.decoder(payload)
+        decoded = perf_counter()
+        frame = self.translator.translate_sync(data, self.output_type, station=station, timestamp=timestamp)
+        return frame, decoded - start, perf_counter() - decoded
+
+
+# each worker process builds its own copy of every topic's pipeline when it starts
+_process_topics: TopicRouter | None = None
+
+
+def _init_process(config: ConfigObject) -> None:
+    global _process_topics
+    _process_topics = TopicRouter()
+    for topic in config.mqtt.topics:
+        _process_topics.add(topic.topic, CompiledTopic.from_config(topic, config))
+
+
+def _update_process(config: ConfigObject, topics: list[MQTTTopicConfig], removed: list[str]) -> None:
+    for topic in topics:
+        _process_topics.add(topic.topic, CompiledTopic.from_config(topic, config))
+    for topic_filter in removed:
+        _process_topics.remove(topic_filter)
+
+
+def process_batch(batch: list[tuple[str, bytes | str, float | None]]) -> list[tuple[bytes | None, str | None]]:
+    """Runs a batch of (topic, payload, timestamp) through the worker process's pipelines, returns (frame, error) for each
+
+    timestamp is None for live messages, see Translator.translate_sync
+    """
+    results = []
+    for topic, payload, timestamp in batch:
+        compiled = _process_topics.get(topic)
+        if compiled is None:
+            results.append((None, f"No topic in the config matches {topic}"))
+            continue
+        try:
+            results.append((compiled.run(topic, payload, timestamp), None))
+        except Exception as exc:
+            results.append((None, str(exc)))
+    return results
+
+
+def process_batch_timed(batch: list[tuple[str, bytes | str, float | None]]) -> list[tuple[bytes | None, str | None, float, float]]:
+    """Same as process_batch, also returning the seconds spent decoding and translating each message
+
+    The times are 0.0 for a message that failed.
+    """
+    results = []
+    for topic, payload, timestamp in batch:
+        compiled = _process_topics.get(topic)
+        if compiled is None:
+            results.append((None, f"No topic in the config matches {topic}", 0.0, 0.0))
+            continue
+        try:
+            frame, decode_seconds, translate_seconds = compiled.run_timed(topic, payload, timestamp)
+        except Exception as exc:
+            results.append((None, str(exc), 0.0, 0.0))
+            continue
+        results.append((frame, None, decode_seconds, translate_seconds))
+    return results
+
+
+class ShardedProcessPool:
+    """One single process executor per shard
+
+    Translators keep per station state, like beacons and rolling aggregates, so every message for a station
+    has to go to the same process. A shared ProcessPoolExecutor can't promise that, a process per shard can.
+    """
+
+    def __init__(self, config: ConfigObject, shards: int) -> None:
+        self.executors = [ProcessPoolExecutor(max_workers=1, initializer=_init_process, initargs=(config,))
+                          for _ in range(shards)]
+
+    async def process(self, shard: int, batch: list[tuple[str, bytes | str, float | None]]) -> list[tuple[bytes | None, str | None]]:
+        return await get_running_loop().run_in_executor(self.executors[shard], process_batch, batch)
+
+    async def process_timed(self, shard: int,
+                            batch: list[tuple[str, bytes | str, float | None]]) -> list[tuple[bytes | None, str | None, float, float]]:
+        """Same as process, with each message's decode and translate seconds, for metrics"""
+        return await get_running_loop().run_in_executor(self.executors[shard], process_batch_timed, batch)
+
+    def update(self, config: ConfigObject, topics: list[MQTTTopicConfig], removed: list[str] = ()) -> Future:
+        """Recompiles topics, and drops the removed topic filters, in every worker process
+
+        The update is queued behind the batches already sent to each process and ahead of any sent after this
+        returns, so a batch is handled entirely by the old topics or entirely by the new ones. Topics not
+        named keep their state. Await the returned future to know every process has it.
+        """
+        loop = get_running_loop()
+        return gather(*(loop.run_in_executor(executor, _update_process, config, topics, list(removed))
+                        for executor in self.executors))
+
+    def shutdown(self, cancel_futures: bool = True) -> None:
+        """Stops the worker processes, without cancel_futures batches already sent to them still finish"""
+        for executor in self.executors:
+            executor.shutdown(wait=False, cancel_futures=cancel_futures)
@@ -0,0 +1,183 @@
+# profiles the running service on demand, for finding out where the time goes without redeploying
+from asyncio import AbstractEventLoop
+from asyncio import TimerHandle
+from collections import Counter
+from pathlib import Path
+from threading import Event
+from threading import Thread
+from threading import get_ident
+from time import localtime
+from time import strftime
+from types import FrameType
+import cProfile
+import logging
+import sys
+
+# (stage, module prefixes), a sample's stage is the one of the innermost frame that matches
+STAGES: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("encode", ("mqtt_to_aprs.utils.packet",)),
+    ("decode", ("mqtt_to_aprs.utils.message", "json", "orjson", "msgspec")),
+    ("translate", ("mqtt_to_aprs.utils.translator", "mqtt_to_aprs.utils.transform", "mqtt_to_aprs.utils.aggregate",
+                   "mqtt_to_aprs.utils.beacon", "jmespath")),
+    ("send", ("mqtt_to_aprs.utils.aprs_is", "mqtt_to_aprs.utils.kiss", "mqtt_to_aprs.utils.transport",
+              "mqtt_to_aprs.utils.scheduler", "mqtt_to_aprs.utils.ratelimit", "mqtt_to_aprs.utils.queues",
+              "mqtt_to_aprs.utils.spool")),
+    ("route", ("mqtt_to_aprs.utils.topic", "mqtt_to_aprs.utils.mqtt", "aiomqtt", "paho")),
+    ("idle", ("selectors",)),
+)
+
+
+def frame_stage(module: str) -> str | None:
+    for stage, prefixes in STAGES:
+        for prefix in prefixes:
+            if module == prefix or module.startswith(prefix + "."):
+                return stage
+    return None
+
+
+class StackSampler:
+    """Samples one thread's stack every interval seconds from a background thread
+
+    Each sample is stored as a collapsed stack, outermost frame first, with the pipeline stage it was in as
+    the root, which is the format flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stopped = Event()
+        self._thread: Thread | None = None
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self._thread = Thread(target=self._run, name="mqtt2aprs-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[collapse(frame)] += 1
+
+    def dump(self, path: Path) -> None:
+        with open(path, "w") as output:
+            for stack, count in self.samples.most_common():
+                output.write(f"{stack} {count}\n")
+
+
+def collapse(frame: FrameType | None) -> str:
+    labels = []
+    stage = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        if stage is None:
+            stage = frame_stage(module)
+        labels.append(f"{module}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    labels.append(stage or "other")
+    return ";".join(reversed(labels))
+
+
+class SlowCallbackRecorder(logging.Handler):
+    """Keeps the warnings asyncio's debug mode logs when a callback or task step blocks the loop too long"""
+
+    def __init__(self) -> None:
+        super().__init__(logging.WARNING)
+        self.records: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        message = record.getMessage()
+        if message.startswith("Executing"):
+            self.records.append(f"{strftime('%Y-%m-%dT%H:%M:%S', localtime(record.created))} {message}")
+
+
+class Profiler:
+    """Profiles the event loop's thread for duration seconds at a time, or until stopped
+
+    Each capture writes a cProfile pstats file, a collapsed stack file tagged by pipeline stage from a
+    sampling thread, and the asyncio slow callback warnings seen while it ran. asyncio's debug mode, which
+    those warnings need, is only turned on for the length of a capture as it slows the loop down.
+    """
+
+    def __init__(self, loop: AbstractEventLoop, output_dir: Path, duration: float | None = None,
+                 slow_callback: float = 0.1, interval: float = 0.005) -> None:
+        self.loop = loop
+        self.output_dir = output_dir
+        self.duration = duration
+        self.slow_callback = slow_callback
+        self.interval = interval
+        self._profile: cProfile.Profile | None = None
+        self._sampler: StackSampler | None = None
+        self._slow_callbacks: SlowCallbackRecorder | None = None
+        self._timer: TimerHandle | None = None
+        self._debug: bool = False
+        self._slow_callback_duration: float = 0.1
+
+    @property
+    def running(self) -> bool:
+        return self._profile is not None
+
+    def toggle(self) -> None:
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self) -> None:
+        """Starts a capture, must be called from the event loop's thread"""
+        if self.running:
+            return
+        logging.info("Profiling started%s", "" if self.duration is None else f" for {self.duration}s")
+        self._debug = self.loop.get_debug()
+        self._slow_callback_duration = self.loop.slow_callback_duration
+        self.loop.slow_callback_duration = self.slow_callback
+        self.loop.set_debug(True)
+        self._slow_callbacks = SlowCallbackRecorder()
+        logging.getLogger("asyncio").addHandler(self._slow_callbacks)
+        self._sampler = StackSampler(get_ident(), self.interval)
+        self._sampler.start()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        if self.duration is not None:
+            self._timer = self.loop.call_later(self.duration, self.stop)
+
+    def stop(self) -> list[Path]:
+        """Stops the capture and writes it out, returns the files written"""
+        if not self.running:
+            return []
+        self._profile.disable()
+        self._sampler.stop()
+        self.loop.set_debug(self._debug)
+        self.loop.slow_callback_duration = self._slow_callback_duration
+        logging.getLogger("asyncio").removeHandler(self._slow_callbacks)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        paths = self._output_paths()
+        self._profile.dump_stats(paths[0])
+        self._sampler.dump(paths[1])
+        paths[2].write_text("".join(f"{record}\n" for record in self._slow_callbacks.records))
+        logging.info("Profiling stopped, %d slow callbacks, wrote %s", len(self._slow_callbacks.records),
+                     ", ".join(str(path) for path in paths))
+        self._profile = None
+        self._sampler = None
+        self._slow_callbacks = None
+        return paths
+
+    def _output_paths(self) -> list[Path]:
+        """Names a capture's files after when it stopped, numbered if an earlier one stopped in the same second"""
+        stamp = f"mqtt2aprs-{strftime('%Y%m%d-%H%M%S')}"
+        prefix = self.output_dir / stamp
+        count = 0
+        while prefix.with_suffix(".pstats").exists():
+            count += 1
+            prefix = self.output_dir / f"{stamp}-{count}"
+        return [prefix.with_suffix(".pstats"), prefix.with_suffix(".collapsed"), prefix.with_suffix(".slow.log")]
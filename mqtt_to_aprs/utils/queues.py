@@ -0,0 +1,278 @@
+from ..config import OverflowPolicy
+from ..config import QueueConfig
+from asyncio import Event
+from asyncio import Queue
+from asyncio import QueueFull
+from asyncio import Task
+from asyncio import TimerHandle
+from asyncio import create_task
+from asyncio import get_running_loop
+from asyncio import to_thread
+from collections import deque
+from collections.abc import Callable
+from time import time
+import logging
+from .spool import Spool
+
+
+class OutputQueue(Queue):
+    """An asyncio Queue of outbound frames with a size limit and a policy for what happens when it is full
+
+    Items are expected to have a topic attribute, which is what the latest policy uses to pick which frames
+    replace each other. Anything without one, like the None stop signal, is never replaced or dropped.
+    """
+
+    def __init__(self, maxsize: int = 0, overflow: OverflowPolicy = OverflowPolicy.block, name: str = "") -> None:
+        super().__init__(maxsize)
+        self.overflow = overflow
+        self.name = name
+        self.dropped = 0
+        self.replaced = 0
+
+    @classmethod
+    def from_config(cls, config: QueueConfig, name: str = "") -> "OutputQueue":
+        if config.spool is not None:
+            spool = Spool(config.spool.path / name, segment_size=config.spool.segment_size,
+                          sync_interval=config.spool.sync_interval)
+            return SpooledQueue(spool, replay_batch=config.spool.replay_batch, max_age=config.spool.max_age, name=name)
+        return cls(maxsize=config.max_size, overflow=config.overflow, name=name)
+
+    def _init(self, maxsize: int) -> None:
+        # for the latest policy, _queue holds keys and _pending holds the newest item for each key
+        self._queue = deque()
+        self._pending = {}
+
+    def _put(self, item) -> None:
+        if self.overflow == OverflowPolicy.latest:
+            key = _item_key(item)
+            self._queue.append(key)
+            self._pending[key] = item
+        else:
+            self._queue.append(item)
+
+    def _get(self):
+        if self.overflow == OverflowPolicy.latest:
+            return self._pending.pop(self._queue.popleft())
+        return self._queue.popleft()
+
+    async def put(self, item) -> None:
+        if self.overflow == OverflowPolicy.block:
+            return await super().put(item)
+        return self.put_nowait(item)
+
+    def put_nowait(self, item) -> None:
+        if self.overflow == OverflowPolicy.latest:
+            key = _item_key(item)
+            if key in self._pending:
+                # an older frame for this topic hasn't gone out yet, send the new one in its place
+                self._pending[key] = item
+                self.replaced += 1
+                return
+        if self.full():
+            match self.overflow:
+                case OverflowPolicy.block:
+                    raise QueueFull
+                case OverflowPolicy.drop_newest if _is_frame(item):
+                    self._drop(item)
+                    return
+                case _:
+                    # a signal like None always gets in, it takes the place of the oldest frame if it has to
+                    oldest = self._evict_oldest()
+                    if oldest is None:
+                        raise QueueFull
+                    self._drop(oldest)
+        super().put_nowait(item)
+
+    def _evict_oldest(self):
+        """Takes the oldest frame out of the queue, None if there are only signals in it"""
+        for index, entry in enumerate(self._queue):
+            item = self._pending[entry] if self.overflow == OverflowPolicy.latest else entry
+            if _is_frame(item):
+                del self._queue[index]
+                if self.overflow == OverflowPolicy.latest:
+                    del self._pending[entry]
+                self.task_done()
+                return item
+        return None
+
+    def _drop(self, item) -> None:
+        self.dropped += 1
+        logging.debug("OutputQueue %s is full, dropped %s", self.name, item)
+
+    def done(self, item) -> None:
+        """Marks item as handled, whether it was sent or the sender decided not to"""
+        self.task_done()
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> dict[str, int]:
+        """Counters for sizing the queue under load"""
+        return {
+            "size": self.qsize(),
+            "max_size": self.maxsize,
+            "dropped": self.dropped,
+            "replaced": self.replaced,
+        }
+
+
+class SpooledQueue(OutputQueue):
+    """An OutputQueue that writes every frame to a Spool before it is queued
+
+    At most replay_batch frames are held in memory, the rest wait on disk and are read back a batch at a time
+    as the sender works through them, so a long outage grows the spool rather than memory. Frames left in the
+    spool by the last run are sent first. A frame older than max_age by the time it is read back is skipped.
+
+    A frame is only deleted from the spool once the sender marks it done, with mark_done. Frames on disk count
+    towards join the same as frames in memory, so the queue keeps its own count of unfinished items rather
+    than the one Queue keeps for what was put in this run. Flushing the spool runs in a thread.
+    """
+
+    def __init__(self, spool: Spool, replay_batch: int = 100, max_age: float | None = None, name: str = "",
+                 clock: Callable[[], float] = time) -> None:
+        super().__init__(maxsize=0, overflow=OverflowPolicy.block, name=name)
+        self.spool = spool
+        self.replay_batch = replay_batch
+        self.max_age = max_age
+        self._clock = clock
+        # id of a frame in memory -> its sequence number in the spool
+        self._sequences: dict[int, int] = {}
+        # items that aren't frames, like the None stop signal, waiting behind the frames on disk
+        self._trailers = []
+        self._sync_handle: TimerHandle | None = None
+        self._sync_task: Task | None = None
+        self.expired = 0
+        self.spool.open()
+        self._backlog = self.spool.unacked_count()
+        self._read_sequence = next(self.spool.unacked(), self.spool.next_sequence)
+        # items put or replayed that haven't been marked done
+        self._unfinished = self._backlog
+        self._all_done = Event()
+        if self._backlog > 0:
+            logging.info("OutputQueue %s replaying %d spooled frames", self.name, self._backlog)
+        else:
+            self._all_done.set()
+
+    def qsize(self) -> int:
+        return len(self._queue) + self._backlog + len(self._trailers)
+
+    def empty(self) -> bool:
+        if not self._queue and (self._backlog > 0 or self._trailers):
+            self._fill()
+        return not self._queue
+
+    def _put(self, item) -> None:
+        self._unfinished += 1
+        self._all_done.clear()
+        if getattr(item, "topic", None) is None:
+            if self._backlog > 0:
+                self._trailers.append(item)
+            else:
+                self._queue.append(item)
+            return
+        sequence = self.spool.append(item)
+        if self._backlog == 0 and len(self._queue) < self.replay_batch:
+            self._queue.append(item)
+            self._sequences[id(item)] = sequence
+            self._read_sequence = sequence + 1
+        else:
+            self._backlog += 1
+        self._schedule_sync()
+
+    def _get(self):
+        if not self._queue:
+            self._fill()
+        return self._queue.popleft()
+
+    def _fill(self) -> None:
+        """Reads the next batch of frames back from the spool, skipping any that are too old to send"""
+        cutoff = None if self.max_age is None else self._clock() - self.max_age
+        exhausted = True
+        for sequence in self.spool.unacked(self._read_sequence):
+            if len(self._queue) >= self.replay_batch:
+                exhausted = False
+                break
+            self._read_sequence = sequence + 1
+            self._backlog -= 1
+            frame = self.spool.read(sequence)
+            if frame is None:
+                self.task_done()
+                continue
+            if cutoff is not None and frame.created < cutoff:
+                self.spool.ack(sequence)
+                self.expired += 1
+                self.task_done()
+                continue
+            self._queue.append(frame)
+            self._sequences[id(frame)] = sequence
+        if exhausted:
+            # anything still counted was acknowledged while it waited, it won't be read back
+            for _ in range(self._backlog):
+                self.task_done()
+            self._backlog = 0
+            self._queue.extend(self._trailers)
+            self._trailers.clear()
+
+    def done(self, item) -> None:
+        sequence = self._sequences.pop(id(item), None)
+        if sequence is not None:
+            self.spool.ack(sequence)
+            self._schedule_sync()
+        self.task_done()
+
+    def task_done(self) -> None:
+        if self._unfinished <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._all_done.set()
+
+    async def join(self) -> None:
+        await self._all_done.wait()
+
+    def _schedule_sync(self) -> None:
+        if self._sync_handle is not None:
+            return
+        try:
+            loop = get_running_loop()
+        except RuntimeError:
+            return
+        self._sync_handle = loop.call_later(self.spool.sync_interval, self._sync)
+
+    def _sync(self) -> None:
+        self._sync_handle = None
+        self._sync_task = create_task(to_thread(self.spool.prepare_sync()))
+
+    def close(self) -> None:
+        if self._sync_handle is not None:
+            self._sync_handle.cancel()
+            self._sync_handle = None
+        if self._sync_task is not None:
+            # the thread finishes on its own, closing the spool waits for it to let go of the segment it is on
+            self._sync_task.cancel()
+            self._sync_task = None
+        self.spool.close()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            **super().stats(),
+            "expired": self.expired,
+            **{f"spool_{key}": value for key, value in self.spool.stats().items()},
+        }
+
+
+def mark_done(queue: Queue, item) -> None:
+    """Marks item from queue as handled, letting a spooled queue delete it from disk"""
+    if isinstance(queue, OutputQueue):
+        queue.done(item)
+    else:
+        queue.task_done()
+
+
+def _is_frame(item) -> bool:
+    return getattr(item, "topic", None) is not None
+
+
+def _item_key(item) -> object:
+    topic = getattr(item, "topic", None)
+    return object() if topic is None else topic
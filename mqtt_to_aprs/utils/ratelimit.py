@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from collections.abc import Callable
+from collections.abc import Hashable
+from time import monotonic
+
+
+class TokenBucket:
+    """A token bucket that refills at rate tokens a second, up to burst tokens"""
+    __slots__ = ("rate", "burst", "tokens", "updated", "_clock")
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = monotonic) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._clock = clock
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def allow(self, tokens: float = 1) -> bool:
+        """Takes tokens if they are all available"""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Takes tokens even if the bucket goes into debt, returns the seconds to wait before using them"""
+        self._refill()
+        self.tokens -= tokens
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class KeyedRateLimiter:
+    """A token bucket per key, keeping at most max_keys buckets, least recently used are dropped first
+
+    A dropped bucket comes back full, which only ever errs toward letting a quiet key send.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000, clock: Callable[[], float] = monotonic) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: OrderedDict[Hashable, TokenBucket] = OrderedDict()
+        self.limited = 0
+
+    def bucket(self, key: Hashable) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, self._clock)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def allow(self, key: Hashable, tokens: float = 1) -> bool:
+        allowed = self.bucket(key).allow(tokens)
+        if not allowed:
+            self.limited += 1
+        return allowed
+
+    def reserve(self, key: Hashable, tokens: float = 1) -> float:
+        return self.bucket(key).reserve(tokens)
+
+
+class DedupCache:
+    """Remembers keys for ttl seconds, holding at most max_size of them
+
+    A key isn't refreshed when it is seen again, so a report that repeats forever is still let through once
+    every ttl seconds. With a fixed ttl, insertion order is also expiry order, so expired keys are always at
+    the front and evicting the least recently added key is the same as evicting the closest to expiring.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 10000, clock: Callable[[], float] = monotonic) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._expires: OrderedDict[Hashable, float] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def _expire(self, now: float) -> None:
+        while self._expires:
+            key, expires = next(iter(self._expires.items()))
+            if expires > now:
+                break
+            del self._expires[key]
+
+    def seen(self, key: Hashable) -> bool:
+        """True if key was added less than ttl seconds ago"""
+        self._expire(self._clock())
+        if key in self._expires:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, key: Hashable) -> None:
+        now = self._clock()
+        self._expire(now)
+        self._expires.pop(key, None)
+        self._expires[key] = now + self.ttl
+        while len(self._expires) > self.max_size:
+            self._expires.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._expires),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,106 @@
+# reloads a running service's topics from its config file, on SIGHUP or when the file changes
+from ..config import ConfigObject
+from ..config import aget_config
+from ..config import get_config
+from asyncio import AbstractEventLoop
+from asyncio import CancelledError
+from asyncio import Lock
+from asyncio import Task
+from asyncio import create_task
+from asyncio import sleep
+from pathlib import Path
+from pydantic import ValidationError
+from time import perf_counter
+from tomllib import TOMLDecodeError
+import logging
+import os
+import signal
+from .service import MQTT2APRS
+
+
+class ConfigReloader:
+    """Revalidates the config file and hands it to a running MQTT2APRS
+
+    A reload is started by SIGHUP, or by the file's mtime or size changing when a watch interval is set. A
+    config that doesn't validate, or that the service fails to apply, is logged and the service keeps running
+    with the one it has. Reloads run one at a time, a trigger while one is running starts another once it's done.
+    """
+
+    def __init__(self, service: MQTT2APRS, config_path: Path | str, include_env: bool = False,
+                 cache_dir: Path | None = None, interval: float | None = None) -> None:
+        self.service = service
+        self.config_path = config_path
+        self.include_env = include_env
+        self.cache_dir = cache_dir
+        self.interval = interval
+        self.reloads = 0
+        self._lock = Lock()
+        self._tasks: set[Task] = set()
+        self._watcher: Task | None = None
+        self._loop: AbstractEventLoop | None = None
+
+    def start(self, loop: AbstractEventLoop) -> None:
+        self._loop = loop
+        loop.add_signal_handler(signal.SIGHUP, self.trigger)
+        if self.interval is not None:
+            self._watcher = create_task(self.watch())
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.remove_signal_handler(signal.SIGHUP)
+            self._loop = None
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+    def trigger(self) -> None:
+        task = create_task(self.reload())
+        # keep a reference until it's done, the loop only keeps weak ones
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def reload(self) -> bool:
+        """Reloads the config, returns whether the service took it"""
+        async with self._lock:
+            started = perf_counter()
+            try:
+                config = await ConfigObject.afrom_toml(self.config_path, self.include_env, cache_dir=self.cache_dir)
+            except (OSError, TOMLDecodeError, UnicodeDecodeError, ValidationError) as exc:
+                logging.error("Not reloading, config %s is invalid: %s", self.config_path, exc)
+                return False
+            try:
+                changes = await self.service.reload(config)
+            except Exception:
+                logging.exception("Not reloading, the service couldn't take config %s", self.config_path)
+                return False
+            # anything that asks for the config from now on gets the new one
+            get_config.cache_clear()
+            aget_config.cache_clear()
+            self.reloads += 1
+            logging.info("Reloaded %s in %.1fms, topics added %s, removed %s, changed %s", self.config_path,
+                         (perf_counter() - started) * 1000, changes["added"], changes["removed"], changes["changed"])
+            return True
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def watch(self) -> None:
+        """Polls the config file every interval seconds, reloading when it changes"""
+        last = self._stat()
+        try:
+            while True:
+                await sleep(self.interval)
+                current = self._stat()
+                if current is not None and current != last:
+                    last = current
+                    try:
+                        await self.reload()
+                    except Exception:
+                        # a failed reload mustn't stop the next change being picked up
+                        logging.exception("Reloading %s failed", self.config_path)
+        except CancelledError:
+            pass
@@ -0,0 +1,202 @@
+# replays a capture through the real MQTTListener pipeline, and times each stage of it
+from ..config import ConfigObject
+from array import array
+from asyncio import CancelledError
+from asyncio import Queue
+from asyncio import create_task
+from asyncio import gather
+from asyncio import sleep
+from collections.abc import AsyncIterator
+from collections.abc import Iterable
+from contextvars import ContextVar
+from time import perf_counter
+from .capture import CapturedMessage
+from .mqtt import MQTTListener
+from .mqtt import TopicRoute
+from .packet import OutboundFrame
+from .queues import OutputQueue
+from .queues import mark_done
+
+# when the message being processed by the current worker task was handed to the listener
+_received: ContextVar[float | None] = ContextVar("received", default=None)
+
+
+class ReplayMessage:
+    """Stands in for an aiomqtt Message"""
+    __slots__ = ("topic", "payload", "received")
+
+    def __init__(self, topic: str, payload: bytes) -> None:
+        self.topic = topic
+        self.payload = payload
+        self.received = 0.0
+
+
+class ReplayClient:
+    """Stands in for an aiomqtt Client, yielding captured messages instead of reading them from a broker
+
+    speed scales the gaps between messages, 2 replays twice as fast as they were recorded and 0 sends them
+    as fast as the listener takes them.
+    """
+
+    def __init__(self, messages: Iterable[CapturedMessage], speed: float = 1.0) -> None:
+        self._messages = messages
+        self.speed = speed
+        self.subscriptions: list[str] = []
+        self.sent = 0
+        self.started: float | None = None
+        self.finished: float | None = None
+
+    async def __aenter__(self) -> "ReplayClient":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def subscribe(self, topic: str) -> None:
+        self.subscriptions.append(topic)
+
+    async def unsubscribe(self, topic: str) -> None:
+        self.subscriptions.remove(topic)
+
+    @property
+    def messages(self) -> AsyncIterator[ReplayMessage]:
+        return self._replay()
+
+    async def _replay(self) -> AsyncIterator[ReplayMessage]:
+        self.started = perf_counter()
+        first = None
+        for captured in self._messages:
+            if self.speed > 0:
+                if first is None:
+                    first = captured.timestamp
+                delay = self.started + (captured.timestamp - first) / self.speed - perf_counter()
+                if delay > 0:
+                    await sleep(delay)
+            message = ReplayMessage(captured.topic, bytes(captured.payload))
+            message.received = perf_counter()
+            self.sent += 1
+            yield message
+        self.finished = perf_counter()
+
+
+class LatencyRecorder:
+    """Every duration recorded for each named stage, summarized as percentiles"""
+
+    def __init__(self) -> None:
+        self.stages: dict[str, array] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        durations = self.stages.get(stage)
+        if durations is None:
+            durations = self.stages[stage] = array("d")
+        durations.append(seconds)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """count, and p50, p90, p99 and max in milliseconds, for each stage"""
+        summary = {}
+        for stage, durations in self.stages.items():
+            ordered = sorted(durations)
+            summary[stage] = {
+                "count": len(ordered),
+                **{f"p{percent}_ms": ordered[min(len(ordered) - 1, len(ordered) * percent // 100)] * 1000
+                   for percent in (50, 90, 99)},
+                "max_ms": ordered[-1] * 1000,
+            }
+        return summary
+
+
+class TimedTopic:
+    """Wraps a CompiledTopic, timing its decode and translate stages separately"""
+
+    def __init__(self, compiled, latencies: LatencyRecorder) -> None:
+        self.compiled = compiled
+        self.latencies = latencies
+
+    def run(self, station: str, payload: bytes | str) -> bytes | None:
+        return self.run_timed(station, payload)[0]
+
+    def run_timed(self, station: str, payload: bytes | str) -> tuple[bytes | None, float, float]:
+        frame, decode_seconds, translate_seconds = self.compiled.run_timed(station, payload)
+        self.latencies.record("decode", decode_seconds)
+        self.latencies.record("translate", translate_seconds)
+        return frame, decode_seconds, translate_seconds
+
+
+class Replay:
+    """Feeds a capture through an MQTTListener and drains its output queues, measuring where the time goes
+
+    Stages are timed by wrapping the listener's own methods, so the pipeline that runs is the one the service
+    runs. intake is the wait between a message arriving and a worker picking it up, and end_to_end runs
+    until the frame is taken off its output queue. Both, and decode and translate, are only measured when
+    topics run inline; in process mode the worker processes do that work out of sight.
+    """
+
+    def __init__(self, config: ConfigObject, client: ReplayClient) -> None:
+        self.client = client
+        self.latencies = LatencyRecorder()
+        self.internet_queue = OutputQueue(name="aprsis")
+        self.kiss_queue = OutputQueue(name="kiss")
+        self.listener = MQTTListener(config=config, mqtt_client=client, internet_queue=self.internet_queue,
+                                     kiss_queue=self.kiss_queue, listener_id="replay")
+        self.frames = 0
+        # id of a frame's info -> (when its message arrived, queues it is still waiting in)
+        self._pending: dict[int, tuple[float, int]] = {}
+
+    async def instrument(self) -> None:
+        await self.listener.connect()
+        for topic_filter, route in self.listener.routes.items():
+            self.listener.routes.add(topic_filter, route._replace(compiled=TimedTopic(route.compiled, self.latencies)))
+        process = self.listener.process
+        send = self.listener.send
+
+        async def timed_process(message_topic: str, route: TopicRoute, message: ReplayMessage) -> None:
+            self.latencies.record("intake", perf_counter() - message.received)
+            token = _received.set(message.received)
+            try:
+                await process(message_topic, route, message)
+            finally:
+                _received.reset(token)
+
+        async def timed_send(message_topic: str, route: TopicRoute, packet_data: bytes | None) -> None:
+            received = _received.get()
+            if packet_data is not None and received is not None:
+                self._pending[id(packet_data)] = (received, len(route.output_queues))
+            await send(message_topic, route, packet_data)
+
+        self.listener.process = timed_process
+        self.listener.send = timed_send
+
+    async def _drain(self, queue: Queue) -> None:
+        try:
+            while True:
+                frame: OutboundFrame = await queue.get()
+                now = perf_counter()
+                self.frames += 1
+                pending = self._pending.pop(id(frame.info), None)
+                if pending is not None:
+                    received, waiting = pending
+                    self.latencies.record("end_to_end", now - received)
+                    if waiting > 1:
+                        self._pending[id(frame.info)] = (received, waiting - 1)
+                mark_done(queue, frame)
+        except CancelledError:
+            pass
+
+    async def run(self) -> dict[str, any]:
+        """Replays every message, waits for every frame to come out, and reports what happened"""
+        await self.instrument()
+        drains = [create_task(self._drain(queue)) for queue in (self.internet_queue, self.kiss_queue)]
+        await self.listener.listen()
+        await gather(self.internet_queue.join(), self.kiss_queue.join())
+        finished = perf_counter()
+        for drain in drains:
+            drain.cancel()
+        elapsed = finished - self.client.started if self.client.started is not None else 0.0
+        return {
+            "messages": self.client.sent,
+            "frames": self.frames,
+            "seconds": elapsed,
+            "messages_per_second": self.client.sent / elapsed if elapsed > 0 else 0.0,
+            "frames_per_second": self.frames / elapsed if elapsed > 0 else 0.0,
+            "stages": self.latencies.summary(),
+        }
@@ -0,0 +1,136 @@
+from collections import deque
+from collections.abc import Callable
+from heapq import heappop
+from heapq import heappush
+from itertools import count
+from time import monotonic
+from typing import Any
+
+# AX.25 adds two flags and a two byte FCS around every frame
+AX25_OVERHEAD_BYTES = 4
+
+
+class AirtimeScheduler:
+    """Decides which pending frame goes out on RF next, and when
+
+    The channel, not the CPU, is the bottleneck on RF. Each frame's airtime is estimated from its length and
+    the channel baud rate, and frames are held back so that:
+    - the channel is idle for at least min_gap seconds between frames
+    - no more than duty_cycle of any window seconds is spent transmitting
+
+    Pending frames go out highest priority first, oldest first within a priority. A new routine frame, priority
+    0 or below, for a key that already has one waiting replaces it in place, so reports that can't get on the
+    air are merged into the freshest one instead of piling up. Higher priority frames are alerts and are never
+    merged.
+
+    clock is injectable so schedules can be tested deterministically.
+    """
+
+    def __init__(self, baud_rate: int = 1200, duty_cycle: float = 1.0, window: float = 60.0, min_gap: float = 0.0,
+                 tx_delay: float = 0.0, clock: Callable[[], float] = monotonic) -> None:
+        self.baud_rate = baud_rate
+        self.duty_cycle = duty_cycle
+        self.window = window
+        self.min_gap = min_gap
+        self.tx_delay = tx_delay
+        self._clock = clock
+        self._heap: list[tuple[int, int, Any]] = []
+        self._pending: dict[Any, tuple[Any, float]] = {}
+        self._sequence = count()
+        # (start, airtime) of everything sent in the last window
+        self._history: deque[tuple[float, float]] = deque()
+        # running total of the airtime in _history, so checking the duty cycle doesn't sum it for every frame
+        self._used = 0.0
+        self._channel_free_at = float("-inf")
+        self.merged = 0
+        self.sent = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def airtime(self, size: int) -> float:
+        """Estimated seconds on air for a frame of size bytes"""
+        return self.tx_delay + ((size + AX25_OVERHEAD_BYTES) * 8) / self.baud_rate
+
+    def push(self, key: Any, frame: Any, size: int, priority: int = 0) -> Any | None:
+        """Adds a frame to the schedule, returns the frame it replaced if a routine one for key was already waiting"""
+        sequence = next(self._sequence)
+        if priority > 0:
+            # an alert gets a key of its own, so nothing replaces it
+            key = (key, sequence)
+        replaced = self._pending.get(key)
+        self._pending[key] = (frame, self.airtime(size))
+        if replaced is not None:
+            self.merged += 1
+            return replaced[0]
+        heappush(self._heap, (-priority, sequence, key))
+        return None
+
+    def delay(self) -> float | None:
+        """Seconds until the next frame may be sent, 0 if it can go now, None if nothing is waiting"""
+        if len(self._heap) == 0:
+            return None
+        now = self._clock()
+        return self._ready_at(now) - now
+
+    def _ready_at(self, now: float) -> float:
+        """When the next frame may start, once the channel is free and within the duty cycle"""
+        _, _, key = self._heap[0]
+        airtime = self._pending[key][1]
+        ready_at = max(now, self._channel_free_at)
+        return max(ready_at, self._duty_cycle_ready_at(ready_at, airtime))
+
+    def pop(self) -> Any:
+        """Takes the next frame off the schedule and books its airtime, call once delay() returns 0"""
+        _, _, key = heappop(self._heap)
+        frame, airtime = self._pending.pop(key)
+        start = max(self._clock(), self._channel_free_at)
+        self._history.append((start, airtime))
+        self._used += airtime
+        self._channel_free_at = start + airtime + self.min_gap
+        self.sent += 1
+        return frame
+
+    def pop_ready(self) -> list[Any]:
+        """Takes every frame that may be sent right now
+
+        Without a min_gap, frames that can follow the ones already taken straight away, inside the duty cycle,
+        are ready too. They are handed to the TNC together and go out back to back, not one per wakeup.
+        """
+        ready = []
+        while len(self._heap) > 0:
+            now = self._clock()
+            ready_at = self._ready_at(now)
+            back_to_back = len(ready) > 0 and self.min_gap <= 0 and ready_at <= self._channel_free_at
+            if ready_at > now and not back_to_back:
+                break
+            ready.append(self.pop())
+        return ready
+
+    def _duty_cycle_ready_at(self, at: float, airtime: float) -> float:
+        """Earliest time from at when sending airtime more stays inside the duty cycle budget"""
+        budget = self.duty_cycle * self.window
+        while self._history and self._history[0][0] + self.window <= at:
+            # outside the window, and time only moves forward
+            self._used -= self._history.popleft()[1]
+        if not self._history:
+            # don't let float error build up in the running total
+            self._used = 0.0
+        used = self._used
+        if used + airtime <= budget:
+            return at
+        for start, sent_airtime in self._history:
+            # wait for this transmission to age out of the window
+            used -= sent_airtime
+            if used + airtime <= budget:
+                return start + self.window
+        # a single frame longer than the budget, send it once the window is clear
+        return self._history[-1][0] + self.window if self._history else at
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "pending": len(self._pending),
+            "sent": self.sent,
+            "merged": self.merged,
+            "airtime_in_window": self._used,
+        }
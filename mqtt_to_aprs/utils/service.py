@@ -1,8 +1,10 @@
 from ..config import ConfigObject
 from .aprs_is import get_aprsis_sender, APRSISSender
 from .kiss import get_kiss_sender, KissSender
+from .metrics import MetricsServer
+from .metrics import ServiceMetrics
 from .mqtt import MQTTListener
-from asyncio import Queue
+from .queues import OutputQueue
 from asyncio import create_task
 from asyncio import gather
 import logging
@@ -10,15 +12,19 @@ from aiomqtt import Client
 from uuid import uuid4
 
 class MQTT2APRS:
-    def __init__(self, config: ConfigObject, service_id: str | None = None) -> None:
+    def __init__(self, config: ConfigObject, service_id: str | None = None, mqtt_client: Client | None = None) -> None:
         self.config: ConfigObject = config
+        # anything shaped like an aiomqtt Client, the benchmarks hand in a fake one
+        self._mqtt_client: Client | None = mqtt_client
         self.is_setup: bool = False
         self.service_id = str(uuid4()) if service_id is None else service_id
         self._mqtt_listener: MQTTListener | None = None
         self._aprs_sender: APRSISSender | None = None
-        self._aprs_sender_queue: Queue | None = None
+        self._aprs_sender_queue: OutputQueue | None = None
         self._kiss_sender: KissSender | None = None
-        self._kiss_sender_queue: Queue | None = None
+        self._kiss_sender_queue: OutputQueue | None = None
+        self.metrics: ServiceMetrics | None = ServiceMetrics() if config.metrics.enabled else None
+        self._metrics_server: MetricsServer | None = None
 
     async def setup(self):
         """Gets the service ready to startup"""
@@ -26,19 +32,30 @@ class MQTT2APRS:
         if self.config.aprs.callsign is not None:
             logging.debug("Starting APRS Sender")
             self._aprs_sender = await get_aprsis_sender(config=self.config.aprs, sender_id=f"{self.service_id}-aprsis-1")
-            self._aprs_sender_queue = Queue()
+            self._aprs_sender_queue = OutputQueue.from_config(self.config.aprs.queue, name="aprsis")
+            if self.metrics is not None:
+                self._aprs_sender.metrics = self.metrics
+                self.metrics.watch_queue("aprsis", self._aprs_sender_queue)
+                self.metrics.watch_sender("aprsis", self._aprs_sender)
 
         if self.config.kiss.path is not None and self.config.kiss.path != "":
             logging.debug("Starting KISS Sender")
-            self._kiss_sender = await get_kiss_sender(config=self.config.kiss, sender_id=f"{self.service_id}-kiss-1")
-            self._kiss_sender_queue = Queue()
+            self._kiss_sender = await get_kiss_sender(config=self.config.kiss,
+                                                      callsign=self.config.kiss.callsign or self.config.aprs.callsign_with_ssid,
+                                                      sender_id=f"{self.service_id}-kiss-1")
+            self._kiss_sender_queue = OutputQueue.from_config(self.config.kiss.queue, name="kiss")
+            if self.metrics is not None:
+                self._kiss_sender.metrics = self.metrics
+                self.metrics.watch_queue("kiss", self._kiss_sender_queue)
+                self.metrics.watch_sender("kiss", self._kiss_sender)
 
         self._mqtt_listener = MQTTListener(
             config=self.config,
-            mqtt_client=Client(**self.config.mqtt.client_args, identifier=f"mqtt2aprs-{self.service_id}"),
+            mqtt_client=self._mqtt_client or Client(**self.config.mqtt.client_args, identifier=f"mqtt2aprs-{self.service_id}"),
             internet_queue=self._aprs_sender_queue,
             kiss_queue=self._kiss_sender_queue,
-            listener_id=f"{self.service_id}-listener")
+            listener_id=f"{self.service_id}-listener",
+            metrics=self.metrics)
 
         self.is_setup = True
 
@@ -46,6 +63,10 @@ class MQTT2APRS:
         # start the listeners and senders
         if not self.is_setup:
             await self.setup()
+        if self.metrics is not None and self._metrics_server is None:
+            self._metrics_server = MetricsServer(self.metrics.registry, host=self.config.metrics.host,
+                                                 port=self.config.metrics.port)
+            await self._metrics_server.start()
 
         mqtt_listener_tasks = [create_task(self._mqtt_listener.listen())]
         sender_tasks = []
@@ -63,10 +84,32 @@ class MQTT2APRS:
         await gather(*mqtt_listener_tasks)
 
         # wait for the remaining tasks to be processed
-        for queue in ['_aprs_sender_queue', '_kiss_sender_queue']:
-            logging.debug(f"Waiting for {queue} to be empty")
-            await getattr(self, queue).join()
+        for queue in queues:
+            logging.debug(f"Waiting for {queue.name} to be empty")
+            await queue.join()
 
         # cancel the senders, which are now idle
         for task in sender_tasks:
             task.cancel()
+        for queue in queues:
+            queue.close()
+        if self._metrics_server is not None:
+            await self._metrics_server.close()
+            self._metrics_server = None
+        logging.info("MQTT2APRS %s queue stats: %s", self.service_id, self.queue_stats())
+
+    async def reload(self, config: ConfigObject) -> dict[str, list[str]]:
+        """Applies a new config's topics to the running service, the senders and their queues keep running"""
+        for section in ("aprs", "kiss", "metrics", "logging"):
+            if getattr(config, section) != getattr(self.config, section):
+                logging.warning("MQTT2APRS %s can't change [%s] on reload, restart to apply it", self.service_id, section)
+        changes = {"added": [], "removed": [], "changed": []}
+        if self._mqtt_listener is not None:
+            changes = await self._mqtt_listener.reload(config)
+        self.config = config
+        return changes
+
+    def queue_stats(self) -> dict[str, dict[str, int]]:
+        """Size and drop counters for each of the output queues"""
+        return {queue.name: queue.stats() for queue in [self._aprs_sender_queue, self._kiss_sender_queue]
+                if queue is not None}
@@ -0,0 +1,296 @@
+# a durable, append-only log of outbound frames, so frames waiting on a down APRS-IS or TNC survive a restart
+from array import array
+from bisect import bisect_right
+from collections.abc import Callable
+from collections.abc import Iterator
+from pathlib import Path
+from threading import Lock
+from zlib import crc32
+import logging
+import mmap
+import os
+import struct
+from .packet import OutboundFrame
+
+# length of the body, crc32 of the body
+RECORD_HEADER = struct.Struct("<II")
+# created, priority, topic length, then the topic and info bytes
+RECORD_META = struct.Struct("<dhH")
+# index of an acknowledged record within its segment
+ACK_ENTRY = struct.Struct("<I")
+SEGMENT_SUFFIX = ".seg"
+ACK_SUFFIX = ".ack"
+
+
+def encode_record(frame: OutboundFrame) -> bytes:
+    topic = frame.topic.encode("utf-8")
+    body = RECORD_META.pack(frame.created, frame.priority, len(topic)) + topic + frame.info
+    return RECORD_HEADER.pack(len(body), crc32(body)) + body
+
+
+def decode_record(body: bytes) -> OutboundFrame:
+    created, priority, topic_length = RECORD_META.unpack_from(body)
+    start = RECORD_META.size
+    return OutboundFrame(topic=body[start:start + topic_length].decode("utf-8"), info=bytes(body[start + topic_length:]),
+                         created=created, priority=priority)
+
+
+class Segment:
+    """One preallocated, memory mapped file of records, and the ack log for them
+
+    Records are written back to back into the map, and the zeroed tail of the file marks the end, so opening a
+    segment is a single scan that also builds the index of record offsets. Records are numbered from the
+    sequence number in the file name. Acks are appended to a small side file as record indexes, in batches.
+
+    size is only used for a new file, an existing one keeps the size it was created with.
+    """
+    __slots__ = ("path", "start", "size", "file", "map", "offsets", "end", "acked", "ack_count", "_pending_acks")
+
+    def __init__(self, path: Path, start: int, size: int) -> None:
+        self.path = path
+        self.start = start
+        self.file = open(path, "r+b" if path.exists() else "w+b")
+        existing = os.fstat(self.file.fileno()).st_size
+        if existing == 0:
+            os.ftruncate(self.file.fileno(), size)
+        else:
+            # segment_size may have changed since it was written, mapping less would cut off its records
+            size = existing
+        self.size = size
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.offsets = array("I")
+        self.end = 0
+        self.acked = bytearray()
+        self.ack_count = 0
+        self._pending_acks = bytearray()
+
+    @property
+    def ack_path(self) -> Path:
+        return self.path.with_suffix(ACK_SUFFIX)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def load(self) -> None:
+        """Scans the records and acks already on disk"""
+        offset = 0
+        while offset + RECORD_HEADER.size <= self.size:
+            length, checksum = RECORD_HEADER.unpack_from(self.map, offset)
+            body_end = offset + RECORD_HEADER.size + length
+            if length == 0 or body_end > self.size:
+                break
+            if crc32(self.map[offset + RECORD_HEADER.size:body_end]) != checksum:
+                # a write torn by a crash, everything after it is unusable
+                logging.warning("Spool segment %s has a corrupt record at %d, ignoring the rest of it", self.path, offset)
+                break
+            self.offsets.append(offset)
+            offset = body_end
+        self.end = offset
+        self.acked = bytearray(len(self.offsets))
+        if self.ack_path.exists():
+            data = self.ack_path.read_bytes()
+            for (index,) in ACK_ENTRY.iter_unpack(data[:len(data) - len(data) % ACK_ENTRY.size]):
+                if index < len(self.acked) and not self.acked[index]:
+                    self.acked[index] = 1
+                    self.ack_count += 1
+
+    def fits(self, record: bytes) -> bool:
+        return self.end + len(record) <= self.size
+
+    def append(self, record: bytes) -> None:
+        end = self.end + len(record)
+        self.map[self.end:end] = record
+        if end + RECORD_HEADER.size <= self.size:
+            # clear any torn record left past the end, so the next scan stops here
+            self.map[end:end + RECORD_HEADER.size] = bytes(RECORD_HEADER.size)
+        self.offsets.append(self.end)
+        self.acked.append(0)
+        self.end = end
+
+    def read(self, index: int) -> OutboundFrame:
+        offset = self.offsets[index]
+        length, _ = RECORD_HEADER.unpack_from(self.map, offset)
+        start = offset + RECORD_HEADER.size
+        return decode_record(self.map[start:start + length])
+
+    def ack(self, index: int) -> bool:
+        """Marks a record as done, returns False if it already was"""
+        if self.acked[index]:
+            return False
+        self.acked[index] = 1
+        self.ack_count += 1
+        self._pending_acks += ACK_ENTRY.pack(index)
+        return True
+
+    @property
+    def all_acked(self) -> bool:
+        return self.ack_count == len(self.offsets)
+
+    @property
+    def closed(self) -> bool:
+        return self.map.closed
+
+    def take_acks(self) -> bytes:
+        """The acks not written out yet, which the caller has to pass to sync"""
+        acks = bytes(self._pending_acks)
+        self._pending_acks.clear()
+        return acks
+
+    def sync(self, acks: bytes) -> None:
+        self.map.flush()
+        if acks:
+            with open(self.ack_path, "ab") as ack_file:
+                ack_file.write(acks)
+                ack_file.flush()
+                os.fsync(ack_file.fileno())
+
+    def close(self) -> None:
+        self.map.close()
+        self.file.close()
+
+    def remove(self) -> None:
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self.ack_path.unlink(missing_ok=True)
+
+
+class Spool:
+    """An append-only log of frames split into fixed size segments, each frame numbered by a sequence number
+
+    Frames are appended to the newest segment until it fills, then a new one is started. Once every frame
+    in an older segment has been acknowledged its files are deleted, which keeps the spool as small as the
+    backlog. Writes go straight into the memory map, and are only flushed to disk, along with the acks, by
+    sync. The owner calls it at most once every sync_interval seconds, so a busy queue isn't waiting on fsync
+    for every frame, and can do the slow part in another thread with prepare_sync. A crash can lose acks
+    from the last interval, so frames are delivered at least once, not exactly once.
+    """
+
+    def __init__(self, directory: Path, segment_size: int = 4 * 1024 * 1024, sync_interval: float = 1.0) -> None:
+        self.directory = directory
+        self.segment_size = segment_size
+        self.sync_interval = sync_interval
+        self._dirty = False
+        # held while a segment is written out or closed, so a sync in another thread never sees it half closed
+        self._lock = Lock()
+        self.segments: list[Segment] = []
+        self._starts: list[int] = []
+        self.next_sequence = 0
+        self.compacted = 0
+
+    def open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}")):
+            segment = Segment(path, int(path.stem), self.segment_size)
+            segment.load()
+            self._add_segment(segment)
+        for segment in list(self.segments[:-1]):
+            if segment.all_acked:
+                self._remove(segment)
+        if self.segments:
+            last = self.segments[-1]
+            self.next_sequence = last.start + len(last)
+        logging.debug("Spool %s opened with %d unacknowledged frames", self.directory, self.unacked_count())
+
+    def _add_segment(self, segment: Segment) -> None:
+        self.segments.append(segment)
+        self._starts.append(segment.start)
+
+    def _remove(self, segment: Segment) -> None:
+        index = self.segments.index(segment)
+        del self.segments[index]
+        del self._starts[index]
+        with self._lock:
+            segment.remove()
+        self.compacted += 1
+
+    def _segment(self, sequence: int) -> Segment | None:
+        index = bisect_right(self._starts, sequence) - 1
+        if index < 0:
+            return None
+        segment = self.segments[index]
+        return segment if sequence - segment.start < len(segment) else None
+
+    def append(self, frame: OutboundFrame) -> int:
+        """Writes frame to the end of the log, returning its sequence number"""
+        record = encode_record(frame)
+        if len(record) + RECORD_HEADER.size > self.segment_size:
+            raise ValueError(f"Frame of {len(record)} bytes does not fit in a {self.segment_size} byte spool segment")
+        if not self.segments or not self.segments[-1].fits(record):
+            self._add_segment(Segment(self.directory / f"{self.next_sequence:020d}{SEGMENT_SUFFIX}",
+                                      self.next_sequence, self.segment_size))
+            self._compact()
+        self.segments[-1].append(record)
+        sequence = self.next_sequence
+        self.next_sequence += 1
+        self._touch()
+        return sequence
+
+    def read(self, sequence: int) -> OutboundFrame | None:
+        """The frame for sequence, None if it has been acknowledged or compacted away"""
+        segment = self._segment(sequence)
+        if segment is None or segment.acked[sequence - segment.start]:
+            return None
+        return segment.read(sequence - segment.start)
+
+    def ack(self, sequence: int) -> None:
+        segment = self._segment(sequence)
+        if segment is None or not segment.ack(sequence - segment.start):
+            return
+        if segment.all_acked and segment is not self.segments[-1]:
+            self._remove(segment)
+        self._touch()
+
+    def unacked(self, start: int = 0) -> Iterator[int]:
+        """Sequence numbers from start on that haven't been acknowledged, oldest first"""
+        for segment in list(self.segments):
+            first = max(start - segment.start, 0)
+            for index in range(first, len(segment)):
+                if not segment.acked[index]:
+                    yield segment.start + index
+
+    def unacked_count(self) -> int:
+        return sum(len(segment) - segment.ack_count for segment in self.segments)
+
+    def _compact(self) -> None:
+        for segment in list(self.segments[:-1]):
+            if segment.all_acked:
+                self._remove(segment)
+
+    def _touch(self) -> None:
+        self._dirty = True
+
+    def prepare_sync(self) -> Callable[[], None]:
+        """Takes everything written since the last sync, returning a function that flushes it to disk
+
+        The function does the slow msync and fsync calls and touches nothing the event loop uses, so it can
+        run in another thread while frames keep being appended.
+        """
+        pending = [(segment, segment.take_acks()) for segment in self.segments] if self._dirty else []
+        self._dirty = False
+
+        def flush() -> None:
+            for segment, acks in pending:
+                with self._lock:
+                    # compacted away, or the spool closed, since
+                    if not segment.closed:
+                        segment.sync(acks)
+
+        return flush
+
+    def sync(self) -> None:
+        self.prepare_sync()()
+
+    def close(self) -> None:
+        self.sync()
+        with self._lock:
+            for segment in self.segments:
+                segment.close()
+        self.segments = []
+        self._starts = []
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "segments": len(self.segments),
+            "unacked": self.unacked_count(),
+            "compacted": self.compacted,
+        }
@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from typing import Any
+
+SINGLE_LEVEL_WILDCARD = "+"
+MULTI_LEVEL_WILDCARD = "#"
+
+
+class _TopicNode:
+    __slots__ = ("children", "single", "multi", "value", "has_value")
+
+    def __init__(self) -> None:
+        self.children: dict[str, "_TopicNode"] = {}
+        self.single: "_TopicNode | None" = None
+        self.multi: "_TopicNode | None" = None
+        self.value: Any = None
+        self.has_value: bool = False
+
+
+class TopicRouter:
+    """Resolves MQTT topics to values registered against MQTT topic filters
+
+    Filters are stored in a trie keyed on topic levels, so resolving a topic costs time proportional
+    to the depth of the topic rather than the number of registered filters. When more than one filter
+    matches a topic, literal levels win over `+`, which wins over `#`.
+
+    Recent resolutions are kept in a small LRU cache, which is cleared whenever a filter is added or removed.
+    """
+
+    def __init__(self, cache_size: int = 1024) -> None:
+        self._root = _TopicNode()
+        self._cache: OrderedDict[str, Any] = OrderedDict()
+        self._cache_size = cache_size
+        self._filters: dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._filters)
+
+    def __contains__(self, topic_filter: str) -> bool:
+        return topic_filter in self._filters
+
+    @property
+    def filters(self) -> list[str]:
+        return list(self._filters)
+
+    def items(self) -> list[tuple[str, Any]]:
+        return list(self._filters.items())
+
+    def add(self, topic_filter: str, value: Any) -> None:
+        """Registers value against an MQTT topic filter"""
+        levels = validate_topic_filter(topic_filter)
+        node = self._root
+        for level in levels:
+            match level:
+                case "+":
+                    if node.single is None:
+                        node.single = _TopicNode()
+                    node = node.single
+                case "#":
+                    if node.multi is None:
+                        node.multi = _TopicNode()
+                    node = node.multi
+                case _:
+                    node = node.children.setdefault(level, _TopicNode())
+        node.value = value
+        node.has_value = True
+        self._filters[topic_filter] = value
+        self._cache.clear()
+
+    def remove(self, topic_filter: str) -> None:
+        """Removes an MQTT topic filter from the router"""
+        if topic_filter not in self._filters:
+            raise KeyError(topic_filter)
+        del self._filters[topic_filter]
+        self._cache.clear()
+        self._remove(self._root, topic_filter.split("/"), 0)
+
+    def _remove(self, node: _TopicNode, levels: list[str], depth: int) -> bool:
+        """Clears the value for levels, returns True if node can be pruned by its parent"""
+        if depth == len(levels):
+            node.value, node.has_value = None, False
+        else:
+            level = levels[depth]
+            match level:
+                case "+":
+                    if self._remove(node.single, levels, depth + 1):
+                        node.single = None
+                case "#":
+                    if self._remove(node.multi, levels, depth + 1):
+                        node.multi = None
+                case _:
+                    if self._remove(node.children[level], levels, depth + 1):
+                        del node.children[level]
+        return not (node.has_value or node.children or node.single is not None or node.multi is not None)
+
+    def get(self, topic: str, default: Any = None) -> Any:
+        """Returns the value of the best matching filter for topic, or default if no filter matches"""
+        try:
+            value = self._cache[topic]
+        except KeyError:
+            pass
+        else:
+            self._cache.move_to_end(topic)
+            return value
+
+        node = _match(self._root, topic.split("/"), 0, topic.startswith("$"))
+        value = node.value if node is not None else default
+        if node is not None and self._cache_size > 0:
+            self._cache[topic] = value
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return value
+
+
+def _match(node: _TopicNode, levels: list[str], depth: int, is_system: bool) -> _TopicNode | None:
+    if depth == len(levels):
+        if node.has_value:
+            return node
+        # "a/#" also matches the parent level "a"
+        if node.multi is not None and node.multi.has_value:
+            return node.multi
+        return None
+
+    level = levels[depth]
+    child = node.children.get(level)
+    if child is not None:
+        found = _match(child, levels, depth + 1, is_system)
+        if found is not None:
+            return found
+    # wildcards at the first level must not match topics starting with $, ie $SYS
+    wildcards_allowed = depth > 0 or not is_system
+    if wildcards_allowed and node.single is not None:
+        found = _match(node.single, levels, depth + 1, is_system)
+        if found is not None:
+            return found
+    if wildcards_allowed and node.multi is not None and node.multi.has_value:
+        return node.multi
+    return None
+
+
+def validate_topic_filter(topic_filter: str) -> list[str]:
+    """Checks that topic_filter is a valid MQTT topic filter and returns its levels"""
+    if topic_filter == "":
+        raise ValueError("Topic filter must not be empty")
+    levels = topic_filter.split("/")
+    for index, level in enumerate(levels):
+        if level == MULTI_LEVEL_WILDCARD:
+            if index != len(levels) - 1:
+                raise ValueError(f"'#' must be the last level of topic filter {topic_filter}")
+        elif level != SINGLE_LEVEL_WILDCARD and (SINGLE_LEVEL_WILDCARD in level or MULTI_LEVEL_WILDCARD in level):
+            raise ValueError(f"Wildcards must occupy an entire level of topic filter {topic_filter}")
+    return levels
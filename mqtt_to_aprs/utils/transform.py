@@ -0,0 +1,153 @@
+# compiles small arithmetic expressions for transforming field values, ie "value * 0.621371"
+import ast
+import logging
+import math
+import operator
+from collections.abc import Callable
+from collections.abc import Iterable
+from functools import lru_cache
+
+# the variable a transform uses for the value of the field it is attached to
+VALUE = "value"
+MAX_EXPONENT = 100
+# the largest constant, or constant part of an expression, a transform can have
+MAX_CONSTANT = 1e15
+
+
+def _power(base: float, exponent: float) -> float:
+    if abs(exponent) > MAX_EXPONENT:
+        raise ArithmeticError(f"exponent {exponent} is larger than {MAX_EXPONENT}")
+    # as a float, so a large base overflows instead of growing a bignum
+    return float(base) ** exponent
+
+
+_BINARY_OPERATORS: dict[type, Callable[[float, float], float]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _power,
+}
+_UNARY_OPERATORS: dict[type, Callable[[float], float]] = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+FUNCTIONS: dict[str, Callable[..., float]] = {
+    "abs": abs,
+    "float": float,
+    "int": int,
+    "max": max,
+    "min": min,
+    "round": round,
+}
+
+
+class Transform:
+    """A compiled transform expression
+
+    Expressions are parsed once and checked against a short list of allowed syntax: numbers, variables,
+    arithmetic and a few functions. Each node is then turned into a closure, so running a transform is a
+    handful of python calls with no parsing, and nothing in the expression can reach eval or attributes.
+    Numbers are floats and parts of the expression that only use numbers are worked out once, when it is
+    compiled.
+    """
+    __slots__ = ("expression", "field", "names", "_function")
+
+    def __init__(self, expression: str, field: str, names: frozenset[str], function: Callable[[dict], float]) -> None:
+        self.expression = expression
+        self.field = field
+        self.names = names
+        self._function = function
+
+    def __call__(self, values: dict[str, any]) -> float | None:
+        """Runs the transform against values, keyed by field name, None if a value it needs is missing"""
+        for name in self.names:
+            if values.get(name) is None:
+                return None
+        try:
+            result = self._function(values)
+        except (ArithmeticError, TypeError, ValueError) as exc:
+            logging.warning("Transform %s for %s failed: %s", self.expression, self.field, exc)
+            return None
+        if not math.isfinite(result):
+            logging.warning("Transform %s for %s failed: %s is not a number", self.expression, self.field, result)
+            return None
+        return result
+
+
+@lru_cache(maxsize=1024)
+def compile_transform(expression: str, field: str, allowed_names: Iterable[str] | None = None) -> Transform:
+    """Compiles expression into a Transform for field, raising ValueError if it isn't a valid transform
+
+    Inside the expression, value is the field's own value and any name in allowed_names is the value of that
+    field. allowed_names should be the fields that have a path, value can only be used if field is one of
+    them. allowed_names has to be hashable, ie a tuple.
+    """
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as exc:
+        raise ValueError(f"Transform {expression} for {field} is not a valid expression: {exc.msg}")
+    names: set[str] = set()
+    allowed = None
+    if allowed_names is not None:
+        allowed = set(allowed_names)
+        if field in allowed:
+            allowed.add(VALUE)
+    function = _compile(tree.body, field, names, allowed)
+    return Transform(expression, field, frozenset(names), function)
+
+
+def _constant(value: int | float, node: ast.AST, field: str) -> Callable[[dict], float]:
+    # compared before converting, a huge int can't be a float and nan compares false
+    if not abs(value) <= MAX_CONSTANT:
+        raise ValueError(f"{ast.unparse(node)} in the transform for {field} is larger than {MAX_CONSTANT:g}")
+    value = float(value)
+    return lambda values: value
+
+
+def _compile(node: ast.AST, field: str, names: set[str], allowed: set[str] | None) -> Callable[[dict], float]:
+    used: set[str] = set()
+    function = _compile_node(node, field, used, allowed)
+    names |= used
+    if len(used) > 0 or isinstance(node, ast.Constant):
+        return function
+    # only numbers, fold it into one
+    try:
+        value = float(function({}))
+    except (ArithmeticError, TypeError, ValueError) as exc:
+        raise ValueError(f"{ast.unparse(node)} in the transform for {field} failed: {exc}")
+    return _constant(value, node, field)
+
+
+def _compile_node(node: ast.AST, field: str, names: set[str], allowed: set[str] | None) -> Callable[[dict], float]:
+    match node:
+        case ast.Constant(value=value) if type(value) in (int, float):
+            return _constant(value, node, field)
+        case ast.Name(id=name):
+            if allowed is not None and name not in allowed:
+                if name == VALUE:
+                    raise ValueError(f"{field} has no path, so its transform can't use value, only "
+                                     f"{', '.join(sorted(allowed)) or 'fields that have a path'}")
+                raise ValueError(f"{name} in the transform for {field} is not a field with a path, use "
+                                 f"{', '.join(sorted(allowed)) or 'a field that has one'}")
+            key = field if name == VALUE else name
+            names.add(key)
+            return lambda values: float(values[key])
+        case ast.BinOp(left=left, op=op, right=right) if type(op) in _BINARY_OPERATORS:
+            function = _BINARY_OPERATORS[type(op)]
+            left_function = _compile(left, field, names, allowed)
+            right_function = _compile(right, field, names, allowed)
+            return lambda values: function(left_function(values), right_function(values))
+        case ast.UnaryOp(op=op, operand=operand) if type(op) in _UNARY_OPERATORS:
+            function = _UNARY_OPERATORS[type(op)]
+            operand_function = _compile(operand, field, names, allowed)
+            return lambda values: function(operand_function(values))
+        case ast.Call(func=ast.Name(id=name), args=args, keywords=[]) if name in FUNCTIONS:
+            function = FUNCTIONS[name]
+            arg_functions = tuple(_compile(arg, field, names, allowed) for arg in args)
+            return lambda values: function(*(arg_function(values) for arg_function in arg_functions))
+        case _:
+            raise ValueError(f"{ast.unparse(node)} is not allowed in the transform for {field}, only numbers, field names, "
+                             f"arithmetic and {', '.join(FUNCTIONS)} are")
@@ -1,3 +1,4 @@
+from ...config import APRSPacketTypes
 from ...config import TranslatorConfig
 from ...config import ConfigObject
 
@@ -6,4 +7,23 @@ class Translator:
     def __init__(self, translator_config: TranslatorConfig, service_config: ConfigObject) -> None:
         self._type = translator_config.type
         self._translator_config = translator_config.config
+        self._validate_packets = translator_config.validate_packets
         self._service_config = service_config
+
+    @property
+    def required_keys(self) -> frozenset[str] | None:
+        """The top level message keys the translator reads, None if it needs the whole message"""
+        return None
+
+    def translate_sync(self, message_data: dict[str, any], packet_type: APRSPacketTypes, station: str = "",
+                       timestamp: float | None = None) -> bytes | None:
+        """Translates message_data into the raw bytes of an APRS information field, or None to send nothing
+
+        timestamp is when the message was sent in seconds since the epoch, for messages that aren't live, ie a
+        backfill. Without one the translator works from the current time.
+        """
+        raise NotImplementedError
+
+    async def translate(self, message_data: dict[str, any], packet_type: APRSPacketTypes, station: str = "",
+                        timestamp: float | None = None) -> bytes | None:
+        return self.translate_sync(message_data, packet_type, station=station, timestamp=timestamp)
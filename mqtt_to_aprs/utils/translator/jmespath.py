@@ -3,99 +3,226 @@ from . import Translator
 from aprs import InformationField, PositionReport
 from ...config import APRSPacketTypes
 from ...config import JMESPathWeatherFields
+from ...config import TranslatorConfig
+from ...config import BeaconConfig
+from ...config import ConfigObject
+from ...config import PositionFormat
+from collections.abc import Callable
 from functools import lru_cache
 import jmespath
 from jmespath.parser import ParsedResult
 import logging
-from ..packet.weather import make_position_weather_packet, make_weather_data
-from ..packet import make_position
+from ..packet.weather import encode_position_weather_packet, encode_weather_data
+from ..packet import encode_compressed_position
+from ..packet import encode_compressed_wind
+from ..packet import encode_position
+from ..beacon import AdaptiveBeacon
+from ..aggregate import WeatherAggregator
+from ..transform import Transform
+from ..transform import compile_transform
 
 
 class JMESPathTranslator(Translator):
-    async def translate(self, message_data: dict[str, any], packet_type: APRSPacketTypes) -> InformationField:
+    def __init__(self, translator_config: TranslatorConfig, service_config: ConfigObject,
+                 beacon: BeaconConfig | None = None, position_format: PositionFormat = PositionFormat.uncompressed,
+                 extracted: bool = False) -> None:
+        """extracted means messages arrive as field values already pulled out by a typed decoder"""
+        super().__init__(translator_config, service_config)
+        self.compressed = position_format == PositionFormat.compressed
+        self.plan = WeatherFieldPlan.from_fields(self._translator_config.fields, self._translator_config.transforms)
+        self._extract = self.plan.convert if extracted else self.plan.apply
+        self.beacon = None if beacon is None else AdaptiveBeacon.from_config(beacon)
+        fields = self._translator_config.fields
+        self.aggregator = None
+        if fields.rain_counter is not None or self._translator_config.derive_wind_gust:
+            self.aggregator = WeatherAggregator(derive_wind_gust=self._translator_config.derive_wind_gust)
+
+    @property
+    def required_keys(self) -> frozenset[str] | None:
+        return self.plan.required_keys
+
+    def translate_sync(self, message_data: dict[str, any], packet_type: APRSPacketTypes, station: str = "",
+                       timestamp: float | None = None) -> bytes | None:
+        """Translates message_data into the raw bytes of an APRS information field
+
+        Returns None when the topic's beacon decides station's report isn't worth sending. timestamp drives the
+        beacon, the rolling aggregates and the packet's own timestamp, they use the current time without it.
+        """
         match packet_type:
             case APRSPacketTypes.weather:
-                message_data = jmespath_weather_fields(message_data, self._translator_config.fields)
+                message_data = self._extract(message_data)
+                if self.aggregator is not None:
+                    message_data = self.aggregator.apply(station, message_data, now=timestamp)
+                else:
+                    message_data.pop("rain_counter", None)
+                if self.beacon is not None and not self.beacon.should_send(station, message_data, now=timestamp):
+                    return None
                 latitude = message_data.pop("latitude", None)
                 longitude = message_data.pop("longitude", None)
                 if latitude is None:
                     latitude = self._service_config.location.latitude
                 if longitude is None:
                     longitude = self._service_config.location.longitude
-                position = make_position(latitude=latitude, longitude=longitude)
-                packet_data = make_position_weather_packet(position=position,
-                                                           weather_data=make_weather_data(**message_data))
-                field = PositionReport.from_bytes(packet_data.encode('utf-8'))
+                if self.compressed:
+                    wind_dir = message_data["wind_dir"]
+                    wind_speed = message_data["wind_speed"]
+                    position = encode_compressed_position(latitude=latitude, longitude=longitude) + encode_compressed_wind(
+                        None if wind_dir is None else int(wind_dir), None if wind_speed is None else int(wind_speed))
+                else:
+                    position = encode_position(latitude=latitude, longitude=longitude)
+                frame = encode_position_weather_packet(position=position,
+                                                       weather_data=encode_weather_data(**message_data, compressed=self.compressed),
+                                                       sent_at=timestamp)
 
             case _:
                 raise NotImplementedError("Invalid packet_type")
-        return field
+        if self._validate_packets:
+            validate_information_field(frame)
+        return frame
+
+
+def validate_information_field(frame: bytes) -> InformationField:
+    """Round trips frame through the aprs library, raising ValueError if it can't be parsed"""
+    try:
+        return PositionReport.from_bytes(frame)
+    except Exception as exc:
+        raise ValueError(f"Translated packet {frame!r} failed validation: {exc}")
+
+
+def hg_to_mbar(hg_val: float) -> float:
+    """
+    Convert inches of mercury (inHg to tenths of millibars/tenths of hPascals (mbar/hPa)
+    :param hg_val: The value in inHg
+    :return:
+    """
+    mbar = (float(hg_val) / 0.029530) * 10
+
+    return mbar
+
+
+def c_to_f(temperature_c: float) -> float:
+    """Converts temperature celcius to fahrenheit"""
+    return (1.8 * temperature_c) + 32
+
+
+# weather field -> (output slot, converter, only fill the slot if no other field has)
+# fields not listed here are passed directly through, no translations applied
+WEATHER_FIELD_CONVERSIONS: dict[str, tuple[str, Callable[[any], any] | None, bool]] = {
+    "temperature_f": ("temperature", float, False),
+    "temperature_c": ("temperature", c_to_f, True),
+    "pressure_mbar": ("pressure", float, False),
+    "pressure_hg": ("pressure", hg_to_mbar, True),
+}
+
+WEATHER_DATA_SLOTS = ("wind_dir", "wind_speed", "wind_gust", "temperature", "rain_last_hr", "rain_last_24_hrs",
+                      "rain_since_midnight", "humidity", "pressure", "latitude", "longitude")
+
+
+class WeatherFieldPlan:
+    """An immutable, precompiled plan for pulling weather data out of a message
+
+    All of the configured JMESPath expressions are merged into a single multiselect hash, so each message is
+    walked once no matter how many fields are configured. The plan is built once per topic, when the
+    MQTTListener connects, instead of on every message.
+
+    Transforms run on the extracted values before the unit conversions. They all see the values as extracted,
+    not each other's results, and a field can have a transform without a path of its own.
+    """
+    __slots__ = ("expression", "steps", "transforms")
+
+    def __init__(self, expression: ParsedResult | None, steps: tuple[tuple[str, str, str, Callable | None, bool], ...],
+                 transforms: tuple[Transform, ...] = ()) -> None:
+        self.expression = expression
+        self.steps = steps
+        self.transforms = transforms
+
+    @classmethod
+    def from_fields(cls, fields: JMESPathWeatherFields, transforms: dict[str, str] | None = None) -> "WeatherFieldPlan":
+        paths = {key: value for key, value in fields.model_dump().items() if value is not None}
+        compiled = tuple(compile_transform(expression, key, tuple(paths)) for key, expression in (transforms or {}).items())
+        targets = {**paths, **{transform.field: paths.get(transform.field, transform.expression) for transform in compiled}}
+        steps = []
+        # primary fields have to be applied before the fallbacks that share their slot
+        for key, path in sorted(targets.items(), key=lambda item: WEATHER_FIELD_CONVERSIONS.get(item[0], ("", None, False))[2]):
+            slot, converter, fallback = WEATHER_FIELD_CONVERSIONS.get(key, (key, None, False))
+            steps.append((key, path, slot, converter, fallback))
+        if len(paths) == 0:
+            return cls(None, tuple(steps), compiled)
+        expression = get_compiled_jmespath("{" + ", ".join(f"{key}: {path}" for key, path in paths.items()) + "}")
+        return cls(expression, tuple(steps), compiled)
+
+    @property
+    def required_keys(self) -> frozenset[str] | None:
+        """The top level message keys the plan reads, None if it could read any of them"""
+        if self.expression is None:
+            return frozenset()
+        return root_keys(self.expression.parsed)
+
+    def apply(self, message_data: dict[str, any]) -> dict[str, any]:
+        """Runs the plan against message_data, returning the arguments for make_weather_data plus a position"""
+        if self.expression is None:
+            return self.convert({})
+        return self.convert(self.expression.search(message_data) or {})
+
+    def convert(self, results: dict[str, any]) -> dict[str, any]:
+        """Converts already extracted field values, keyed by field name, into weather data"""
+        if self.transforms:
+            results = {**results, **{transform.field: transform(results) for transform in self.transforms}}
+        weather_data = dict.fromkeys(WEATHER_DATA_SLOTS)
+        for key, path, slot, converter, fallback in self.steps:
+            result = results.get(key)
+            if result is None:
+                logging.warning("No matching %s at path %s", key, path)
+                continue
+            if fallback and weather_data[slot] is not None:
+                continue
+            weather_data[slot] = result if converter is None else converter(result)
+        return weather_data
+
+
+# nodes evaluated against the same value as their parent, the message itself at the top
+_PASS_THROUGH_NODES = {"multi_select_dict", "key_val_pair", "or_expression", "and_expression", "not_expression",
+                       "comparator"}
+# nodes whose first child is evaluated against their parent's value, and the rest against what that returns
+_LEFT_NODES = {"subexpression", "index_expression", "projection", "value_projection", "filter_projection", "pipe",
+               "flatten"}
+
+
+def root_keys(node: dict[str, any]) -> frozenset[str] | None:
+    """Works out which top level keys a parsed JMESPath expression can read, None if it could read any"""
+    match node["type"]:
+        case "field":
+            return frozenset([node["value"]])
+        case "literal":
+            return frozenset()
+        case node_type if node_type in _LEFT_NODES:
+            return root_keys(node["children"][0])
+        case node_type if node_type in _PASS_THROUGH_NODES:
+            keys = frozenset()
+            for child in node["children"]:
+                child_keys = root_keys(child)
+                if child_keys is None:
+                    return None
+                keys |= child_keys
+            return keys
+        case _:
+            # @, functions, multiselect lists and friends can see the whole message
+            return None
 
 
 def jmespath_weather_fields(message_data: dict[str, any], fields: JMESPathWeatherFields) -> dict[str, any]:
     """Uses jmespath to translate fields in the mqtt message into values for eather data
 
+    Builds a WeatherFieldPlan on every call, long lived callers should build the plan once and reuse it
+
     Args:
-        message_data (dict[str, any]): _description_
-        fields (JMESPathWeatherFields): _description_
+        message_data (dict[str, any]): the decoded mqtt message
+        fields (JMESPathWeatherFields): JMESPath expressions for each weather field
 
     Returns:
-        dict[str, any]: _description_
+        dict[str, any]: arguments for make_weather_data plus latitude and longitude
     """
-    def hg_to_mbar(hg_val):
-        """
-        Convert inches of mercury (inHg to tenths of millibars/tenths of hPascals (mbar/hPa)
-        :param hg_val: The value in inHg
-        :return:
-        """
-        mbar = (hg_val / 0.029530) * 10
-
-        return mbar
-
-    def c_to_f(temperature_c: float) -> float:
-        """Converts temperature celcius to fahrenheit"""
-        return (1.8 * temperature_c) + 32
-
-
-    weather_data = {
-        "wind_dir": None,
-        "wind_speed": None,
-        "wind_gust": None,
-        "temperature": None,
-        "rain_last_hr": None,
-        "rain_last_24_hrs": None,
-        "rain_since_midnight": None,
-        "humidity": None,
-        "pressure": None,
-        "latitude": None,
-        "longitude": None
-    }
-    for key, value in fields.dict().items():
-        if value is None:
-            continue
-        jmespath = get_compiled_jmespath(value)
-        result = jmespath.search(message_data)
-        if result is None:
-            logging.warning("No matching %s at path %s", key, value)
-            continue
-        match key:
-            case "temperature_f":
-                weather_data["temperature"] = float(result)
-            case "temperature_c":
-                if weather_data["temperature"] is None:
-                    weather_data["temperature"] = c_to_f(result)
-            case "pressure_mbar":
-                weather_data["pressure"] = float(result)
-            case "pressure_hg":
-                if weather_data["pressure"] is None:
-                    weather_data["pressure"] = hg_to_mbar(float(result))
-
-        # these variables are just direclty passed through, no translations applied
-        direct_passthrough_variables = ['wind_dir', 'wind_speed', 'wind_gust', 'rain_last_hr', 'rain_last_24_hrs', 'rain_since_midnight', 'humidity', "latitude", "longitude"]
-        if key in direct_passthrough_variables:
-            weather_data[key] = result
-
-    return weather_data
+    return WeatherFieldPlan.from_fields(fields).apply(message_data)
 
 
 @lru_cache
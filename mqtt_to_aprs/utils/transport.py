@@ -0,0 +1,104 @@
+from asyncio import BaseTransport
+from asyncio import Event
+from asyncio import Protocol
+from asyncio import WriteTransport
+from asyncio import get_running_loop
+from asyncio import sleep
+from collections.abc import Callable
+from collections.abc import Iterator
+import logging
+import random
+
+
+class WriterProtocol(Protocol):
+    """An asyncio Protocol for senders that mostly write, with flow control
+
+    writable() waits while the transport's write buffer is above its high watermark, so senders never
+    pile up more than the buffer limit in memory. Any lines received are handed to on_line.
+    """
+
+    def __init__(self, name: str, on_line: Callable[[bytes], None] | None = None) -> None:
+        self.name = name
+        self.transport: WriteTransport | None = None
+        self._on_line = on_line
+        self._received = b""
+        self._can_write = Event()
+        self._closed = Event()
+        self._closing = False
+
+    @property
+    def is_closed(self) -> bool:
+        return self._closed.is_set()
+
+    def connection_made(self, transport: BaseTransport) -> None:
+        logging.debug("%s connection made", self.name)
+        self.transport = transport
+        self._can_write.set()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        if self._closing:
+            logging.debug("%s connection closed", self.name)
+        else:
+            logging.warning("%s connection lost: %s", self.name, exc)
+        self._closed.set()
+        # wake anything waiting to write so it can notice the connection is gone
+        self._can_write.set()
+
+    def pause_writing(self) -> None:
+        logging.debug("%s write buffer full, pausing writes", self.name)
+        self._can_write.clear()
+
+    def resume_writing(self) -> None:
+        logging.debug("%s write buffer drained, resuming writes", self.name)
+        self._can_write.set()
+
+    def data_received(self, data: bytes) -> None:
+        if self._on_line is None:
+            return
+        self._received += data
+        *lines, self._received = self._received.split(b"\n")
+        for line in lines:
+            self._on_line(line.rstrip(b"\r"))
+
+    def close(self) -> None:
+        self._closing = True
+        if self.transport is not None:
+            self.transport.close()
+
+    async def writable(self) -> bool:
+        """Waits until the transport can take more data, returns False if the connection closed"""
+        await self._can_write.wait()
+        return not self.is_closed
+
+    async def flushed(self, interval: float = 0.005) -> bool:
+        """Waits until everything written has left the transport's buffer, returns False if the connection closed first
+
+        There's no callback for the buffer emptying, only for it crossing the low watermark, so this polls. Writes
+        usually go straight to the socket and leave nothing buffered, so it rarely has to wait at all.
+        """
+        while not self.is_closed and self.transport.get_write_buffer_size() > 0:
+            await sleep(interval)
+        return not self.is_closed
+
+    async def wait_closed(self) -> None:
+        await self._closed.wait()
+
+
+async def open_writer_connection(name: str, host: str, port: int, high_water: int, low_water: int,
+                                 on_line: Callable[[bytes], None] | None = None) -> WriterProtocol:
+    """Opens a TCP connection with a WriterProtocol"""
+    _, protocol = await get_running_loop().create_connection(lambda: WriterProtocol(name, on_line), host, port)
+    protocol.transport.set_write_buffer_limits(high=high_water, low=low_water)
+    return protocol
+
+
+def backoff_delays(min_delay: float, max_delay: float, factor: float = 2.0) -> Iterator[float]:
+    """Yields jittered, exponentially growing delays between reconnect attempts
+
+    Each delay is picked uniformly between half and all of the current step, so a fleet of clients that lost
+    the same server don't all come back at once.
+    """
+    step = min_delay
+    while True:
+        yield random.uniform(step / 2, step)  # nosec B311 - jitter, not crypto
+        step = min(max_delay, step * factor)
@@ -0,0 +1,58 @@
+from mqtt_to_aprs.utils.aggregate import RollingMax
+from mqtt_to_aprs.utils.aggregate import RollingSum
+from mqtt_to_aprs.utils.aggregate import WeatherAggregator
+
+
+def report(wind_speed=None, wind_gust=None, rain_counter=None, rain_last_hr=None) -> dict[str, any]:
+    return {"wind_speed": wind_speed, "wind_gust": wind_gust, "rain_counter": rain_counter,
+            "rain_last_hr": rain_last_hr, "rain_last_24_hrs": None}
+
+
+def test_message_wind_gust_wins_over_the_derived_one():
+    aggregator = WeatherAggregator(derive_wind_gust=True)
+    assert aggregator.apply("wx", report(wind_speed=20), now=0.0)["wind_gust"] == 20.0
+    assert aggregator.apply("wx", report(wind_speed=5, wind_gust=12), now=10.0)["wind_gust"] == 12
+    # the reported gust still counts towards the peak
+    assert aggregator.apply("wx", report(wind_speed=5, wind_gust=30), now=20.0)["wind_gust"] == 30
+    assert aggregator.apply("wx", report(wind_speed=5), now=30.0)["wind_gust"] == 30.0
+
+
+def test_rain_totals_wait_for_a_second_counter_reading():
+    aggregator = WeatherAggregator()
+    first = aggregator.apply("wx", report(rain_counter=120), now=0.0)
+    assert first["rain_last_hr"] is None
+    assert first["rain_last_24_hrs"] is None
+    assert "rain_counter" not in first
+    second = aggregator.apply("wx", report(rain_counter=125), now=60.0)
+    assert second["rain_last_hr"] == 5.0
+    assert second["rain_last_24_hrs"] == 5.0
+    # a reset counter counts everything since it as new
+    third = aggregator.apply("wx", report(rain_counter=2, rain_last_hr=1), now=120.0)
+    assert third["rain_last_hr"] == 1
+    assert third["rain_last_24_hrs"] == 7.0
+
+
+def test_rolling_windows_treat_older_times_as_the_newest():
+    gust = RollingMax(window=300)
+    assert gust.add(1000.0, 10.0) == 10.0
+    assert gust.add(900.0, 20.0) == 20.0
+    assert gust.add(1100.0, 5.0) == 20.0
+    # the late value counted from 1000, so it ages out 300s after that, not after 900
+    assert gust.add(1250.0, 5.0) == 20.0
+    assert gust.add(1301.0, 5.0) == 5.0
+
+    rain = RollingSum(window=3600, buckets=60)
+    rain.add(7200.0, 5.0)
+    rain.add(3600.0, 3.0)
+    assert rain.total == 8.0
+    # an hour after the newest time, both have aged out
+    assert rain.add(7200.0 + 3660, 0.0) == 0.0
+
+
+def test_an_out_of_order_rain_counter_is_ignored():
+    aggregator = WeatherAggregator()
+    aggregator.apply("wx", report(rain_counter=100), now=1000.0)
+    assert aggregator.apply("wx", report(rain_counter=110), now=1060.0)["rain_last_hr"] == 10.0
+    # a late reading would look like the counter being reset
+    assert aggregator.apply("wx", report(rain_counter=105), now=1030.0)["rain_last_hr"] == 10.0
+    assert aggregator.apply("wx", report(rain_counter=112), now=1120.0)["rain_last_hr"] == 12.0
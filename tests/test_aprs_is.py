@@ -0,0 +1,150 @@
+from asyncio import StreamReader
+from asyncio import StreamWriter
+from asyncio import create_task
+from asyncio import run
+from asyncio import sleep
+from asyncio import start_server
+from asyncio import timeout
+from mqtt_to_aprs.config import APRSConfig
+from mqtt_to_aprs.utils.aprs_is import APRSISSender
+from mqtt_to_aprs.utils.packet import OutboundFrame
+from mqtt_to_aprs.utils.queues import OutputQueue
+from time import perf_counter
+from time import time
+
+
+class StandInAPRSIS:
+    """A local APRS-IS server that drops the first connection after drop_after frames"""
+
+    def __init__(self, drop_after: int | None = None) -> None:
+        self.drop_after = drop_after
+        self.connections = 0
+        self.logins: list[bytes] = []
+        self.frames: list[bytes] = []
+        self.server = None
+
+    async def start(self) -> int:
+        self.server = await start_server(self._client, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _client(self, reader: StreamReader, writer: StreamWriter) -> None:
+        self.connections += 1
+        self.logins.append(await reader.readline())
+        writer.write(b"# logresp N0CALL verified, server TEST\r\n")
+        received = 0
+        async for line in reader:
+            self.frames.append(line.rstrip(b"\r\n").split(b":", 1)[1])
+            received += 1
+            if self.connections == 1 and received == self.drop_after:
+                break
+        writer.close()
+
+
+async def wait_for(condition, seconds: float = 5.0) -> None:
+    async with timeout(seconds):
+        while not condition():
+            await sleep(0.005)
+
+
+def frame(seq: int) -> OutboundFrame:
+    return OutboundFrame(topic=f"test/{seq % 3}", info=b">frame %05d" % seq, created=time())
+
+
+def sender_for(port: int) -> APRSISSender:
+    config = APRSConfig(callsign="N0CALL", ssid=1, password=-1, host="127.0.0.1", port=port,
+                        reconnect_min_delay=0.01, reconnect_max_delay=0.05)
+    return APRSISSender(config, sender_id="test")
+
+
+def test_login_and_frames_are_sent_in_order():
+    async def scenario():
+        server = StandInAPRSIS()
+        sender = sender_for(await server.start())
+        queue = OutputQueue(name="aprsis")
+        task = create_task(sender.run(queue))
+        for seq in range(500):
+            await queue.put(frame(seq))
+        started = perf_counter()
+        async with timeout(5):
+            await queue.join()
+        await wait_for(lambda: len(server.frames) == 500)
+        frames_per_second = 500 / (perf_counter() - started)
+        task.cancel()
+        server.server.close()
+        return server, sender, frames_per_second
+
+    server, sender, frames_per_second = run(scenario())
+    assert server.logins[0].startswith(b"user N0CALL-1 pass -1 vers mqtt2aprs ")
+    assert server.frames == [frame(seq).info for seq in range(500)]
+    assert sender.frames_sent == 500
+    assert sender.reconnects == 1
+    assert frames_per_second > 0
+
+
+def test_reconnects_without_losing_frames_when_the_connection_drops():
+    async def scenario():
+        server = StandInAPRSIS(drop_after=5)
+        sender = sender_for(await server.start())
+        queue = OutputQueue(name="aprsis")
+        task = create_task(sender.run(queue))
+        for seq in range(5):
+            await queue.put(frame(seq))
+        await wait_for(lambda: len(server.frames) == 5)
+        # mid stream, the server hangs up on the sender
+        await wait_for(lambda: not sender.is_connected)
+        for seq in range(5, 50):
+            await queue.put(frame(seq))
+        async with timeout(5):
+            await queue.join()
+        await wait_for(lambda: len(server.frames) >= 50)
+        task.cancel()
+        server.server.close()
+        return server, sender
+
+    server, sender = run(scenario())
+    assert server.connections == 2
+    assert set(server.frames) == {frame(seq).info for seq in range(50)}
+    # the first connection is made by run, the second after the drop
+    assert sender.reconnects == 2
+    assert sender.last_reconnect_seconds is not None
+    assert sender.last_reconnect_seconds < 1.0
+
+
+def throttled_sender(**throttle) -> APRSISSender:
+    config = APRSConfig(callsign="N0CALL", ssid=1, password=-1, host="127.0.0.1", port=14580, throttle=throttle)
+    return APRSISSender(config, sender_id="test")
+
+
+def test_the_callsign_limit_waits(monkeypatch):
+    delays = []
+
+    async def fake_sleep(delay: float) -> None:
+        delays.append(delay)
+
+    monkeypatch.setattr("mqtt_to_aprs.utils.aprs_is.sleep", fake_sleep)
+    sender = throttled_sender(rate=1, burst=2)
+
+    async def scenario():
+        await sender.throttle(2)
+        await sender.throttle(3)
+
+    run(scenario())
+    assert len(delays) == 1
+    assert 2.9 < delays[0] <= 3.0
+    assert sender.throttled_seconds == delays[0]
+    assert sender.frames_suppressed == 0
+
+
+def test_the_topic_limit_and_dedup_drop():
+    sender = throttled_sender(topic_rate=0.001, topic_burst=1, dedup_ttl=60)
+    assert sender.allow(frame(0))
+    # a duplicate report
+    assert not sender.allow(frame(0))
+    # a new report on the same topic, over its limit
+    assert not sender.allow(frame(3))
+    # another topic has its own limit
+    assert sender.allow(frame(1))
+    assert sender.frames_suppressed == 2
+    stats = sender.stats()
+    assert stats["topic_rate_limited"] == 1
+    assert stats["dedup_hits"] == 1
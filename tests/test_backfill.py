@@ -0,0 +1,90 @@
+from asyncio import run
+from datetime import datetime
+from datetime import timezone
+from mqtt_to_aprs.config import ConfigObject
+from mqtt_to_aprs.utils.backfill import Backfill
+from mqtt_to_aprs.utils.backfill import parse_timestamp
+from mqtt_to_aprs.utils.backfill import read_archive
+from mqtt_to_aprs.utils.capture import CaptureWriter
+from mqtt_to_aprs.utils.capture import capture_started
+import json
+import pytest
+
+STARTED = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+
+
+def service_config() -> ConfigObject:
+    return ConfigObject(logging={}, aprs={"callsign": "N0CALL", "password": -1}, kiss={},
+                        location={"latitude": 28.979480, "longitude": -98.51329},
+                        mqtt={"host": "localhost", "port": 1883, "topics": [{
+                            "topic": "wx/+",
+                            "target": "is",
+                            "beacon": {"max_interval": 600},
+                            "translator": {"type": "jmespath", "config": {
+                                "derive_wind_gust": True,
+                                "fields": {"temperature_f": "temperature", "wind_dir": "wind_dir",
+                                           "wind_speed": "wind_speed"}}},
+                        }]})
+
+
+def backfill(items) -> list[bytes | None]:
+    async def collect() -> list[bytes | None]:
+        results = []
+        async for _, (frame, error) in Backfill(service_config(), workers=0).translate(items):
+            assert error is None
+            results.append(frame)
+        return results
+
+    return run(collect())
+
+
+def test_message_timestamps_drive_beacons_gusts_and_packet_times(tmp_path):
+    archive = tmp_path / "archive.jsonl"
+    lines = [
+        {"topic": "wx/1", "timestamp": STARTED, "payload": {"temperature": 70, "wind_dir": 90, "wind_speed": 20}},
+        # a minute later, the beacon holds it back, but the gust still sees it
+        {"topic": "wx/1", "timestamp": STARTED + 60, "payload": {"temperature": 70, "wind_dir": 90, "wind_speed": 25}},
+        # past max_interval, and outside the five minute gust window of both earlier reports
+        {"topic": "wx/1", "timestamp": "2024-05-01T12:11:40Z", "payload": {"temperature": 70, "wind_dir": 90, "wind_speed": 5}},
+    ]
+    archive.write_text("".join(json.dumps(line) + "\n" for line in lines))
+    first, second, third = backfill(read_archive(archive))
+    assert first.startswith(b"@011200z")
+    assert b"090/020g020" in first
+    assert second is None
+    assert third.startswith(b"@011211z")
+    assert b"090/005g005" in third
+
+
+def test_capture_timestamps_count_from_when_it_started(tmp_path):
+    timed = tmp_path / "timed.cap"
+    with CaptureWriter(timed) as writer:
+        writer.start(int(STARTED * 1e9))
+        writer.write("wx/1", 0, b'{"temperature": 70}')
+        writer.write("wx/1", 90 * 10 ** 9, b'{"temperature": 71}')
+    assert capture_started(timed) == STARTED
+    assert [timestamp for _, _, timestamp in read_archive(timed)] == [STARTED, STARTED + 90]
+
+    untimed = tmp_path / "untimed.cap"
+    with CaptureWriter(untimed) as writer:
+        writer.write("wx/1", 0, b'{"temperature": 70}')
+    assert capture_started(untimed) is None
+    assert [timestamp for _, _, timestamp in read_archive(untimed)] == [None]
+
+
+@pytest.mark.parametrize("value,expected", [
+    (None, None),
+    (STARTED, STARTED),
+    (int(STARTED), STARTED),
+    ("2024-05-01T12:00:00Z", STARTED),
+    ("2024-05-01T12:00:00", STARTED),
+    ("2024-05-01T07:00:00-05:00", STARTED),
+])
+def test_parse_timestamp(value, expected):
+    assert parse_timestamp(value) == expected
+
+
+@pytest.mark.parametrize("value", ["yesterday", True, [1]])
+def test_parse_timestamp_rejects_anything_else(value):
+    with pytest.raises(ValueError):
+        parse_timestamp(value)
@@ -0,0 +1,80 @@
+from mqtt_to_aprs.config import BeaconConfig
+from mqtt_to_aprs.utils.beacon import AdaptiveBeacon
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def beacon(clock: FakeClock, **kwargs) -> AdaptiveBeacon:
+    return AdaptiveBeacon(**{"max_interval": 600, "min_interval": 60, "deltas": {"temperature": 3}, **kwargs},
+                          clock=clock)
+
+
+def test_first_report_goes_out():
+    schedule = beacon(FakeClock())
+    assert schedule.should_send("wx", {"temperature": 70})
+    assert schedule.should_send("other", {"temperature": 70})
+
+
+def test_unchanged_values_wait_for_max_interval():
+    clock = FakeClock()
+    schedule = beacon(clock)
+    assert schedule.should_send("wx", {"temperature": 70})
+    clock.now += 599
+    assert not schedule.should_send("wx", {"temperature": 71})
+    clock.now += 1
+    assert schedule.should_send("wx", {"temperature": 71})
+    assert schedule.stats() == {"stations": 1, "sent": 2, "suppressed": 1}
+
+
+def test_a_delta_sends_early_but_not_before_min_interval():
+    clock = FakeClock()
+    schedule = beacon(clock)
+    assert schedule.should_send("wx", {"temperature": 70})
+    clock.now += 30
+    assert not schedule.should_send("wx", {"temperature": 75})
+    clock.now += 30
+    assert schedule.should_send("wx", {"temperature": 75})
+    # deltas are measured from the last report that went out, not the last one seen
+    clock.now += 60
+    assert not schedule.should_send("wx", {"temperature": 77})
+    clock.now += 60
+    assert schedule.should_send("wx", {"temperature": 72})
+
+
+def test_a_sensor_coming_or_going_is_a_change():
+    clock = FakeClock()
+    schedule = beacon(clock)
+    assert schedule.should_send("wx", {"temperature": 70})
+    clock.now += 60
+    assert schedule.should_send("wx", {"temperature": None})
+    clock.now += 60
+    assert not schedule.should_send("wx", {})
+    clock.now += 60
+    assert schedule.should_send("wx", {"temperature": 70})
+
+
+def test_message_times_override_the_clock():
+    schedule = beacon(FakeClock(0.0))
+    assert schedule.should_send("wx", {"temperature": 70}, now=5000.0)
+    assert not schedule.should_send("wx", {"temperature": 70}, now=5500.0)
+    assert schedule.should_send("wx", {"temperature": 70}, now=5600.0)
+
+
+def test_forgotten_stations_send_again():
+    clock = FakeClock()
+    schedule = beacon(clock, max_stations=2)
+    for station in ("a", "b", "c"):
+        assert schedule.should_send(station, {"temperature": 70})
+    assert schedule.should_send("a", {"temperature": 70})
+    assert not schedule.should_send("c", {"temperature": 70})
+
+
+def test_from_config():
+    schedule = AdaptiveBeacon.from_config(BeaconConfig(max_interval=300, min_interval=30, deltas={"humidity": 5}))
+    assert (schedule.max_interval, schedule.min_interval, schedule.deltas) == (300, 30, (("humidity", 5),))
@@ -0,0 +1,58 @@
+from aprs import PositionReport
+from mqtt_to_aprs.utils.packet import KNOTS_PER_MPH
+from mqtt_to_aprs.utils.packet import encode_compressed_position
+from mqtt_to_aprs.utils.packet import encode_compressed_wind
+from mqtt_to_aprs.utils.packet import encode_position
+from mqtt_to_aprs.utils.packet.weather import encode_position_weather_packet
+from mqtt_to_aprs.utils.packet.weather import encode_weather_data
+import pytest
+
+# one step of the base 91 latitude and longitude scales, in degrees
+LATITUDE_STEP = 1 / 380926
+LONGITUDE_STEP = 1 / 190463
+WEATHER = {"wind_gust": 20, "temperature": 70, "humidity": 40, "pressure": 10132}
+
+
+def decode(latitude: float, longitude: float, wind_dir: int | None = None, wind_speed: int | None = None) -> PositionReport:
+    position = encode_compressed_position(latitude, longitude) + encode_compressed_wind(wind_dir, wind_speed)
+    frame = encode_position_weather_packet(position, encode_weather_data(**WEATHER, compressed=True), timestamp=b"171234")
+    return PositionReport.from_bytes(frame)
+
+
+@pytest.mark.parametrize("latitude", [-89.9, -45.123456, -0.000001, 0.0, 12.5, 28.979480, 89.99])
+@pytest.mark.parametrize("longitude", [-179.99, -98.51329, -0.0015, 0.0, 2.3522, 151.2093, 179.99])
+def test_position_round_trip(latitude, longitude):
+    report = decode(latitude, longitude)
+    assert abs(float(report.lat) - latitude) <= LATITUDE_STEP
+    assert abs(float(report.long) - longitude) <= LONGITUDE_STEP
+
+
+def test_position_is_clamped_at_the_poles_and_date_line():
+    report = decode(95.0, 200.0)
+    assert float(report.lat) == pytest.approx(90.0, abs=LATITUDE_STEP)
+    assert float(report.long) == pytest.approx(180.0, abs=LONGITUDE_STEP * 2)
+
+
+@pytest.mark.parametrize("wind_dir", [0, 1, 89, 90, 181, 270, 359, 360])
+@pytest.mark.parametrize("wind_speed", [1, 5, 15, 40, 120])
+def test_wind_round_trip(wind_dir, wind_speed):
+    course_speed = decode(28.979480, -98.51329, wind_dir, wind_speed).data_ext
+    # courses are sent in 4 degree steps
+    assert 0 <= (wind_dir - course_speed.course) % 360 < 4
+    # speeds are sent in knots on a log scale of 1.08 steps, so within 4%
+    assert course_speed.speed == pytest.approx(wind_speed * KNOTS_PER_MPH, rel=0.04, abs=0.5)
+
+
+def test_weather_is_intact_after_the_compressed_position():
+    assert decode(28.979480, -98.51329, 270, 15).comment == b"g020t070r...p...P...h40b10132w"
+
+
+def test_compressed_frame_is_shorter():
+    uncompressed = encode_position_weather_packet(encode_position(28.979480, -98.51329),
+                                                  encode_weather_data(wind_dir=270, wind_speed=15, **WEATHER),
+                                                  timestamp=b"171234")
+    compressed = encode_position_weather_packet(
+        encode_compressed_position(28.979480, -98.51329) + encode_compressed_wind(270, 15),
+        encode_weather_data(**WEATHER, compressed=True), timestamp=b"171234")
+    # 19 byte position and 7 bytes of wind against 10 bytes of position and 3 of course, speed and type
+    assert len(uncompressed) - len(compressed) == 13
@@ -0,0 +1,68 @@
+from mqtt_to_aprs.config import ConfigCache
+from mqtt_to_aprs.config import ConfigObject
+import os
+
+CONFIG = b"""
+[logging]
+
+[aprs]
+callsign = "N0CALL"
+password = -1
+
+[kiss]
+
+[location]
+latitude = 28.979480
+longitude = -98.51329
+
+[mqtt]
+host = "localhost"
+port = 1883
+
+[[mqtt.topics]]
+topic = "wx/+"
+target = "is"
+
+[mqtt.topics.translator]
+type = "jmespath"
+
+[mqtt.topics.translator.config.fields]
+temperature_c = "temperature_C"
+"""
+
+
+def cached(tmp_path) -> tuple[ConfigCache, str]:
+    cache = ConfigCache(tmp_path / "cache", tmp_path / "config.toml")
+    key = ConfigCache.key(CONFIG, False)
+    cache.save(key, ConfigObject.from_toml_bytes(CONFIG))
+    return cache, key
+
+
+def test_cache_round_trips(tmp_path):
+    cache, key = cached(tmp_path)
+    assert os.stat(cache.path).st_mode & 0o777 == 0o600
+    assert cache.load(key).aprs.callsign == "N0CALL"
+    assert cache.load(ConfigCache.key(CONFIG + b"\n", False)) is None
+
+
+def test_cache_writable_by_others_is_ignored(tmp_path):
+    cache, key = cached(tmp_path)
+    os.chmod(cache.path, 0o666)
+    assert cache.load(key) is None
+    os.chmod(cache.path, 0o600)
+    os.chmod(cache.path.parent, 0o777)
+    assert cache.load(key) is None
+    os.chmod(cache.path.parent, 0o700)
+    assert cache.load(key) is not None
+
+
+def test_cache_misses_when_a_log_path_is_gone(tmp_path):
+    log_path = tmp_path / "logs"
+    log_path.mkdir()
+    config = CONFIG.replace(b"[logging]\n", f"[logging]\nlog_path = \"{log_path}\"\n".encode())
+    cache = ConfigCache(tmp_path / "cache", tmp_path / "config.toml")
+    key = ConfigCache.key(config, False)
+    cache.save(key, ConfigObject.from_toml_bytes(config))
+    assert cache.load(key) is not None
+    log_path.rmdir()
+    assert cache.load(key) is None
@@ -0,0 +1,133 @@
+from asyncio import StreamReader
+from asyncio import StreamWriter
+from asyncio import create_task
+from asyncio import run
+from asyncio import sleep
+from asyncio import start_server
+from asyncio import timeout
+from mqtt_to_aprs.config import KissConfig
+from mqtt_to_aprs.utils.kiss import KissSender
+from mqtt_to_aprs.utils.packet import OutboundFrame
+from mqtt_to_aprs.utils.packet.ax25 import FEND
+from mqtt_to_aprs.utils.packet.ax25 import ui_header
+from mqtt_to_aprs.utils.queues import OutputQueue
+from time import time
+
+
+class StandInTNC:
+    """A local KISS over TCP TNC that hangs up on the first connection after drop_after frames"""
+
+    def __init__(self, drop_after: int | None = None) -> None:
+        self.drop_after = drop_after
+        self.connections = 0
+        self.frames: list[bytes] = []
+        self.server = None
+
+    async def start(self) -> int:
+        self.server = await start_server(self._client, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _client(self, reader: StreamReader, writer: StreamWriter) -> None:
+        self.connections += 1
+        received = 0
+        while True:
+            try:
+                data = await reader.readuntil(FEND)
+            except Exception:
+                break
+            if data == FEND:
+                # the opening FEND of a frame
+                continue
+            self.frames.append(data.rstrip(FEND))
+            received += 1
+            if self.connections == 1 and received == self.drop_after:
+                break
+        writer.close()
+
+
+async def wait_for(condition, seconds: float = 5.0) -> None:
+    async with timeout(seconds):
+        while not condition():
+            await sleep(0.005)
+
+
+def frame(seq: int) -> OutboundFrame:
+    # a topic each, frames for the same topic waiting together are merged
+    return OutboundFrame(topic=f"test/{seq}", info=b">frame %05d" % seq, created=time())
+
+
+def sender_for(port: int) -> KissSender:
+    config = KissConfig(path=f"tcp://127.0.0.1:{port}", baud_rate=1200000, tx_delay=0, reconnect_min_delay=0.01,
+                        reconnect_max_delay=0.05)
+    return KissSender(config, "N0CALL", sender_id="test")
+
+
+def test_reconnects_without_losing_frames_when_the_tnc_drops():
+    async def scenario():
+        server = StandInTNC(drop_after=5)
+        sender = sender_for(await server.start())
+        queue = OutputQueue(name="kiss")
+        task = create_task(sender.run(queue))
+        for seq in range(5):
+            await queue.put(frame(seq))
+        await wait_for(lambda: len(server.frames) == 5)
+        await wait_for(lambda: not sender.is_connected)
+        for seq in range(5, 50):
+            await queue.put(frame(seq))
+        async with timeout(5):
+            await queue.join()
+        await wait_for(lambda: len(server.frames) >= 50)
+        task.cancel()
+        server.server.close()
+        return server, sender
+
+    server, sender = run(scenario())
+    assert server.connections == 2
+    infos = {data.split(b"\x03\xf0", 1)[1] for data in server.frames}
+    assert infos == {frame(seq).info for seq in range(50)}
+    assert sender.reconnects == 2
+
+
+class FakeProtocol:
+    """Takes writes into a list, and loses the connection before they are flushed if flushes is False"""
+
+    def __init__(self, flushes: bool) -> None:
+        self.flushes = flushes
+        self.is_closed = False
+        self.written: list[bytes] = []
+        self.transport = self
+
+    def writelines(self, frames: list[bytes]) -> None:
+        self.written.extend(frames)
+
+    async def writable(self) -> bool:
+        return not self.is_closed
+
+    async def flushed(self) -> bool:
+        self.is_closed = not self.flushes
+        return self.flushes
+
+
+def test_frames_are_written_again_if_the_tnc_drops_before_they_flush():
+    sender = sender_for(8001)
+    dropped = sender.protocol = FakeProtocol(flushes=False)
+    reconnected = FakeProtocol(flushes=True)
+
+    async def reconnect() -> None:
+        sender.protocol = reconnected
+
+    sender.reconnect = reconnect
+    run(sender.write([b"one", b"two"]))
+    assert dropped.written == [b"one", b"two"]
+    assert reconnected.written == [b"one", b"two"]
+
+
+def test_airtime_counts_only_what_goes_on_air():
+    # the KISS FEND and command byte in front of the header stay between mqtt2aprs and the TNC
+    config = KissConfig(path="tcp://127.0.0.1:8001", baud_rate=1200, tx_delay=0)
+    sender = KissSender(config, "N0CALL")
+    header = ui_header("N0CALL", tuple(config.digipeaters))
+    queue = OutputQueue(maxsize=1)
+    item = frame(0)
+    sender.schedule(item, queue)
+    assert sender.scheduler._pending[item.topic][1] == sender.scheduler.airtime(len(header) + len(item.info))
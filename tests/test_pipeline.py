@@ -0,0 +1,56 @@
+from asyncio import run
+from mqtt_to_aprs.config import ConfigObject
+from mqtt_to_aprs.utils.pipeline import ShardedProcessPool
+import json
+
+PAYLOAD = json.dumps({"temperature": 70, "wind_dir": 90, "wind_speed": 5}).encode()
+
+
+def topic(topic_filter: str) -> dict[str, any]:
+    return {"topic": topic_filter, "target": "is", "beacon": {"max_interval": 600},
+            "translator": {"type": "jmespath", "config": {"fields": {
+                "temperature_f": "temperature", "wind_dir": "wind_dir", "wind_speed": "wind_speed"}}}}
+
+
+def service_config(*topic_filters: str) -> ConfigObject:
+    return ConfigObject(logging={}, aprs={"callsign": "N0CALL", "password": -1}, kiss={},
+                        location={"latitude": 28.979480, "longitude": -98.51329},
+                        mqtt={"host": "localhost", "port": 1883, "topics": [topic(name) for name in topic_filters]})
+
+
+def test_updating_the_workers_keeps_unchanged_topics_state():
+    async def scenario():
+        pool = ShardedProcessPool(service_config("wx/a"), 1)
+        try:
+            first = await pool.process(0, [("wx/a", PAYLOAD, None)])
+            config = service_config("wx/a", "wx/b")
+            await pool.update(config, [config.mqtt.topics[1]])
+            second = await pool.process(0, [("wx/a", PAYLOAD, None), ("wx/b", PAYLOAD, None)])
+            await pool.update(config, [], ["wx/a"])
+            third = await pool.process(0, [("wx/a", PAYLOAD, None)])
+        finally:
+            pool.shutdown()
+        return first, second, third
+
+    first, second, third = run(scenario())
+    assert first[0][0] is not None
+    # wx/a's beacon still remembers the first report, so the same report again is held back
+    assert second[0] == (None, None)
+    assert second[1][0] is not None
+    assert third == [(None, "No topic in the config matches wx/a")]
+
+
+def test_process_timed_reports_each_messages_stages():
+    async def scenario():
+        pool = ShardedProcessPool(service_config("wx/a"), 1)
+        try:
+            return await pool.process_timed(0, [("wx/a", PAYLOAD, None), ("wx/a", b"{", None), ("wx/z", PAYLOAD, None)])
+        finally:
+            pool.shutdown()
+
+    sent, malformed, unknown = run(scenario())
+    assert sent[0] is not None and sent[1] is None
+    assert sent[2] > 0 and sent[3] > 0
+    assert malformed[0] is None and malformed[1] is not None
+    assert malformed[2:] == (0.0, 0.0)
+    assert unknown == (None, "No topic in the config matches wx/z", 0.0, 0.0)
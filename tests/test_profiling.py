@@ -0,0 +1,19 @@
+from asyncio import get_running_loop
+from asyncio import run
+from asyncio import sleep
+from mqtt_to_aprs.utils.profiling import Profiler
+
+
+def test_captures_in_the_same_second_dont_overwrite_each_other(tmp_path):
+    async def capture() -> list:
+        profiler = Profiler(get_running_loop(), tmp_path)
+        written = []
+        for _ in range(3):
+            profiler.start()
+            await sleep(0.01)
+            written += profiler.stop()
+        return written
+
+    written = run(capture())
+    assert len(set(written)) == 9
+    assert all(path.exists() for path in written)
@@ -0,0 +1,79 @@
+from asyncio import QueueFull
+from asyncio import run
+from asyncio import wait_for
+from mqtt_to_aprs.config import OverflowPolicy
+from mqtt_to_aprs.utils.packet import OutboundFrame
+from mqtt_to_aprs.utils.queues import OutputQueue
+import pytest
+
+
+def frame(seq: int, topic: str | None = None) -> OutboundFrame:
+    return OutboundFrame(topic=topic or f"wx/{seq}", info=b"%d" % seq, created=1000.0)
+
+
+def drain(queue: OutputQueue) -> list:
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+        queue.done(items[-1])
+    return items
+
+
+def test_block_raises_when_full():
+    queue = OutputQueue(maxsize=2)
+    queue.put_nowait(frame(0))
+    queue.put_nowait(frame(1))
+    with pytest.raises(QueueFull):
+        queue.put_nowait(frame(2))
+    assert queue.stats() == {"size": 2, "max_size": 2, "dropped": 0, "replaced": 0}
+
+
+def test_drop_oldest():
+    queue = OutputQueue(maxsize=2, overflow=OverflowPolicy.drop_oldest)
+    for seq in range(4):
+        queue.put_nowait(frame(seq))
+    assert queue.stats()["dropped"] == 2
+    assert drain(queue) == [frame(2), frame(3)]
+    # dropped frames count as done
+    run(wait_for(queue.join(), 1))
+
+
+def test_drop_newest():
+    queue = OutputQueue(maxsize=2, overflow=OverflowPolicy.drop_newest)
+    for seq in range(4):
+        queue.put_nowait(frame(seq))
+    assert queue.stats()["dropped"] == 2
+    assert drain(queue) == [frame(0), frame(1)]
+
+
+def test_latest_replaces_waiting_frames_for_a_topic():
+    queue = OutputQueue(maxsize=2, overflow=OverflowPolicy.latest)
+    queue.put_nowait(frame(0, "wx/a"))
+    queue.put_nowait(frame(1, "wx/b"))
+    queue.put_nowait(frame(2, "wx/a"))
+    assert queue.stats() == {"size": 2, "max_size": 2, "dropped": 0, "replaced": 1}
+    # a new topic when full pushes out the oldest
+    queue.put_nowait(frame(3, "wx/c"))
+    assert queue.stats()["dropped"] == 1
+    assert drain(queue) == [frame(1, "wx/b"), frame(3, "wx/c")]
+
+
+@pytest.mark.parametrize("overflow", [OverflowPolicy.drop_oldest, OverflowPolicy.drop_newest, OverflowPolicy.latest])
+def test_the_stop_signal_is_never_dropped(overflow):
+    queue = OutputQueue(maxsize=2, overflow=overflow)
+    queue.put_nowait(None)
+    queue.put_nowait(frame(0))
+    # the signal is the oldest item, the frame behind it goes instead
+    queue.put_nowait(frame(1))
+    queue.put_nowait(None)
+    items = drain(queue)
+    assert items.count(None) == 2
+    assert items[0] is None
+    assert queue.stats()["dropped"] == 2
+
+
+def test_a_queue_of_only_signals_is_full():
+    queue = OutputQueue(maxsize=1, overflow=OverflowPolicy.drop_oldest)
+    queue.put_nowait(None)
+    with pytest.raises(QueueFull):
+        queue.put_nowait(None)
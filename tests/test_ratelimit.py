@@ -0,0 +1,74 @@
+from mqtt_to_aprs.utils.ratelimit import DedupCache
+from mqtt_to_aprs.utils.ratelimit import KeyedRateLimiter
+from mqtt_to_aprs.utils.ratelimit import TokenBucket
+import pytest
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+    assert [bucket.allow() for _ in range(4)] == [True, True, True, False]
+    clock.now += 0.5
+    assert bucket.allow()
+    assert not bucket.allow()
+    # it never refills past the burst
+    clock.now += 60
+    assert bucket.allow(3)
+    assert not bucket.allow()
+
+
+def test_token_bucket_reserve_goes_into_debt():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+    assert bucket.reserve(2) == 0.0
+    assert bucket.reserve(3) == pytest.approx(1.5)
+    # the debt has to be paid off before anything else is allowed
+    clock.now += 1.0
+    assert not bucket.allow()
+    clock.now += 1.0
+    assert bucket.allow()
+
+
+def test_keyed_rate_limiter_keeps_a_bucket_per_key():
+    clock = FakeClock()
+    limiter = KeyedRateLimiter(rate=1, burst=1, max_keys=2, clock=clock)
+    assert limiter.allow("a")
+    assert not limiter.allow("a")
+    assert limiter.allow("b")
+    assert limiter.limited == 1
+    # a third key pushes out the least recently used, which comes back full
+    assert limiter.allow("c")
+    assert limiter.allow("a")
+    clock.now += 1
+    assert limiter.reserve("b") == 0.0
+
+
+def test_dedup_cache_expires_keys_after_ttl():
+    clock = FakeClock()
+    cache = DedupCache(ttl=10, clock=clock)
+    assert not cache.seen("report")
+    cache.add("report")
+    clock.now += 9
+    assert cache.seen("report")
+    # seeing it again doesn't push the expiry back
+    clock.now += 1
+    assert not cache.seen("report")
+    assert len(cache) == 0
+    assert cache.stats() == {"size": 0, "hits": 1, "misses": 2, "evictions": 0}
+
+
+def test_dedup_cache_evicts_the_oldest_past_max_size():
+    cache = DedupCache(ttl=10, max_size=2, clock=FakeClock())
+    for key in "abc":
+        cache.add(key)
+    assert not cache.seen("a")
+    assert cache.seen("b") and cache.seen("c")
+    assert cache.stats()["evictions"] == 1
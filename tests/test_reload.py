@@ -0,0 +1,73 @@
+from asyncio import run
+from mqtt_to_aprs.config import ConfigObject
+from mqtt_to_aprs.utils.reload import ConfigReloader
+from pydantic import ValidationError
+import pytest
+
+CONFIG = """
+[logging]
+
+[aprs]
+callsign = "N0CALL"
+password = -1
+
+[kiss]
+
+[location]
+latitude = 28.979480
+longitude = -98.51329
+
+[mqtt]
+host = "localhost"
+port = 1883
+
+[[mqtt.topics]]
+topic = "wx/+"
+target = "is"
+
+[mqtt.topics.translator]
+type = "jmespath"
+
+[mqtt.topics.translator.config.fields]
+temperature_c = "{temperature}"
+"""
+
+
+class FailingService:
+    def __init__(self) -> None:
+        self.reloads = 0
+
+    async def reload(self, config: ConfigObject) -> dict[str, list[str]]:
+        self.reloads += 1
+        raise RuntimeError("couldn't compile a topic")
+
+
+def test_bad_jmespath_fails_validation():
+    with pytest.raises(ValidationError, match="temperature_c path temperature\\[ is not a valid JMESPath expression"):
+        ConfigObject.from_toml_bytes(CONFIG.format(temperature="temperature[").encode())
+
+
+def test_reload_survives_the_service_failing(tmp_path):
+    config_path = tmp_path / "config.toml"
+    config_path.write_text(CONFIG.format(temperature="temperature_C"))
+    service = FailingService()
+    reloader = ConfigReloader(service, config_path)
+    assert run(reloader.reload()) is False
+    assert service.reloads == 1
+    assert reloader.reloads == 0
+
+
+def test_reload_rejects_bad_jmespath(tmp_path):
+    config_path = tmp_path / "config.toml"
+    config_path.write_text(CONFIG.format(temperature="temperature["))
+    service = FailingService()
+    assert run(ConfigReloader(service, config_path).reload()) is False
+    assert service.reloads == 0
+
+
+def test_reload_rejects_a_file_that_isnt_utf8(tmp_path):
+    config_path = tmp_path / "config.toml"
+    config_path.write_bytes(CONFIG.format(temperature="temperature_C").encode() + b"# \xff\xfe\n")
+    service = FailingService()
+    assert run(ConfigReloader(service, config_path).reload()) is False
+    assert service.reloads == 0
@@ -0,0 +1,140 @@
+from mqtt_to_aprs.utils.scheduler import AX25_OVERHEAD_BYTES
+from mqtt_to_aprs.utils.scheduler import AirtimeScheduler
+import pytest
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def scheduler(clock: FakeClock, **kwargs) -> AirtimeScheduler:
+    # 8000 baud makes a frame of 996 bytes exactly 1s on air
+    return AirtimeScheduler(baud_rate=8000, clock=clock, **kwargs)
+
+
+FRAME_SIZE = 1000 - AX25_OVERHEAD_BYTES
+
+
+def test_airtime():
+    schedule = AirtimeScheduler(baud_rate=1200, tx_delay=0.25)
+    assert schedule.airtime(146) == pytest.approx(0.25 + 150 * 8 / 1200)
+
+
+def test_empty_schedule_has_no_delay():
+    schedule = scheduler(FakeClock())
+    assert schedule.delay() is None
+    assert schedule.pop_ready() == []
+
+
+def test_min_gap_holds_the_channel_idle_between_frames():
+    clock = FakeClock()
+    schedule = scheduler(clock, min_gap=2.0)
+    schedule.push("a", "frame-a", FRAME_SIZE)
+    schedule.push("b", "frame-b", FRAME_SIZE)
+    assert schedule.pop_ready() == ["frame-a"]
+    # 1s on air plus a 2s gap
+    assert schedule.delay() == pytest.approx(3.0)
+    clock.now += 2.9
+    assert schedule.pop_ready() == []
+    clock.now += 0.1
+    assert schedule.pop_ready() == ["frame-b"]
+
+
+def test_duty_cycle_budget_over_the_window():
+    clock = FakeClock()
+    # 10% of 60s is 6s of airtime a window
+    schedule = scheduler(clock, duty_cycle=0.1, window=60.0)
+    for index in range(8):
+        schedule.push(index, index, FRAME_SIZE)
+    # as many as the budget allows go back to back
+    assert schedule.pop_ready() == [0, 1, 2, 3, 4, 5]
+    # the budget is spent until the first frame ages out of the window
+    assert schedule.delay() == pytest.approx(60.0)
+    clock.now += 59.9
+    assert schedule.pop_ready() == []
+    clock.now += 0.1
+    # the second frame ages out just as the first one sent now finishes
+    assert schedule.pop_ready() == [6, 7]
+
+
+def test_frame_longer_than_budget_waits_for_a_clear_window():
+    clock = FakeClock()
+    schedule = scheduler(clock, duty_cycle=0.01, window=60.0)
+    schedule.push("a", "frame-a", FRAME_SIZE)
+    schedule.push("b", "frame-b", FRAME_SIZE)
+    assert schedule.pop_ready() == ["frame-a"]
+    assert schedule.delay() == pytest.approx(60.0)
+
+
+def test_higher_priority_first_then_oldest_first():
+    clock = FakeClock()
+    schedule = scheduler(clock)
+    schedule.push("low-1", "low-1", 10, priority=0)
+    schedule.push("high-1", "high-1", 10, priority=5)
+    schedule.push("low-2", "low-2", 10, priority=0)
+    schedule.push("high-2", "high-2", 10, priority=5)
+    schedule.push("mid", "mid", 10, priority=1)
+    order = []
+    while len(schedule) > 0:
+        clock.now += schedule.delay()
+        order.append(schedule.pop())
+    assert order == ["high-1", "high-2", "mid", "low-1", "low-2"]
+
+
+def test_frames_for_the_same_key_merge_in_place():
+    clock = FakeClock()
+    schedule = scheduler(clock)
+    schedule.push("station/1", "first", FRAME_SIZE)
+    schedule.push("station/2", "other", FRAME_SIZE)
+    assert schedule.push("station/1", "second", FRAME_SIZE) == "first"
+    assert schedule.push("station/1", "third", FRAME_SIZE) == "second"
+    assert len(schedule) == 2
+    assert schedule.merged == 2
+    # the merged frame keeps its place in the queue, ahead of station/2
+    assert schedule.pop_ready() == ["third", "other"]
+    assert schedule.stats()["sent"] == 2
+
+
+def test_alerts_are_never_merged():
+    clock = FakeClock()
+    schedule = scheduler(clock)
+    assert schedule.push("station/1", "first", FRAME_SIZE, priority=1) is None
+    assert schedule.push("station/1", "second", FRAME_SIZE, priority=1) is None
+    assert schedule.push("station/1", "routine", FRAME_SIZE) is None
+    assert schedule.push("station/1", "newer", FRAME_SIZE) == "routine"
+    assert schedule.merged == 1
+    assert schedule.pop_ready() == ["first", "second", "newer"]
+
+
+def test_frames_that_can_follow_each_other_are_ready_together():
+    clock = FakeClock()
+    schedule = scheduler(clock)
+    for index in range(3):
+        schedule.push(index, index, FRAME_SIZE)
+    assert schedule.pop_ready() == [0, 1, 2]
+    # booked back to back, the channel is busy for all three
+    schedule.push("next", "next", FRAME_SIZE)
+    assert schedule.delay() == pytest.approx(3.0)
+    assert schedule.pop_ready() == []
+
+
+def test_airtime_in_window_drops_as_frames_age_out():
+    clock = FakeClock()
+    schedule = scheduler(clock, duty_cycle=0.5, window=10.0)
+    for index in range(3):
+        schedule.push(index, index, FRAME_SIZE)
+        clock.now += schedule.delay()
+        assert schedule.pop_ready() == [index]
+    assert schedule.stats()["airtime_in_window"] == pytest.approx(3.0)
+    # frames went out at 1000, 1001 and 1002, so only the first has left the window
+    clock.now += 8.5
+    schedule.push("next", "next", FRAME_SIZE)
+    assert schedule.delay() == 0
+    assert schedule.stats()["airtime_in_window"] == pytest.approx(2.0)
+    clock.now += 10.0
+    assert schedule.pop_ready() == ["next"]
+    assert schedule.stats()["airtime_in_window"] == pytest.approx(1.0)
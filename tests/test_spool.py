@@ -0,0 +1,163 @@
+from asyncio import run
+from asyncio import sleep
+from asyncio import wait_for
+from mqtt_to_aprs.utils.packet import OutboundFrame
+from mqtt_to_aprs.utils.queues import SpooledQueue
+from mqtt_to_aprs.utils.spool import RECORD_HEADER
+from mqtt_to_aprs.utils.spool import SEGMENT_SUFFIX
+from mqtt_to_aprs.utils.spool import Spool
+from mqtt_to_aprs.utils.spool import encode_record
+import pytest
+
+SEGMENT_SIZE = 64 * 1024
+
+
+def frame(seq: int, created: float = 1000.0, size: int = 10) -> OutboundFrame:
+    return OutboundFrame(topic=f"wx/{seq % 3}", info=f"{seq:0{size}d}".encode(), created=created)
+
+
+def spooled_queue(tmp_path, **kwargs) -> SpooledQueue:
+    return SpooledQueue(Spool(tmp_path, segment_size=kwargs.pop("segment_size", SEGMENT_SIZE)), **kwargs)
+
+
+def drain(queue: SpooledQueue, done: int | None = None) -> list[OutboundFrame]:
+    """Takes everything waiting, marking the first done of them done"""
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    for item in items[:done]:
+        queue.done(item)
+    return items
+
+
+def test_frames_replay_after_a_restart(tmp_path):
+    queue = spooled_queue(tmp_path)
+    for seq in range(5):
+        queue.put_nowait(frame(seq))
+    assert drain(queue, done=2) == [frame(seq) for seq in range(5)]
+    queue.close()
+
+    queue = spooled_queue(tmp_path)
+    assert queue.qsize() == 3
+    assert drain(queue) == [frame(seq) for seq in range(2, 5)]
+    queue.close()
+
+
+def test_replay_reads_back_a_batch_at_a_time(tmp_path):
+    queue = spooled_queue(tmp_path, replay_batch=4)
+    for seq in range(10):
+        queue.put_nowait(frame(seq))
+    queue.put_nowait(None)
+    assert len(queue._queue) == 4
+    assert queue.qsize() == 11
+    assert drain(queue) == [frame(seq) for seq in range(10)] + [None]
+    queue.close()
+
+
+def test_acked_segments_are_compacted(tmp_path):
+    spool = Spool(tmp_path, segment_size=SEGMENT_SIZE)
+    spool.open()
+    per_segment = SEGMENT_SIZE // len(encode_record(frame(0, size=1000)))
+    sequences = [spool.append(frame(seq, size=1000)) for seq in range(per_segment * 3)]
+    assert len(spool.segments) == 3
+    for sequence in sequences[:per_segment * 2]:
+        spool.ack(sequence)
+    assert spool.stats() == {"segments": 1, "unacked": per_segment, "compacted": 2}
+    assert len(list(tmp_path.glob(f"*{SEGMENT_SUFFIX}"))) == 1
+    spool.close()
+
+    spool = Spool(tmp_path, segment_size=SEGMENT_SIZE)
+    spool.open()
+    assert list(spool.unacked()) == sequences[per_segment * 2:]
+    spool.close()
+
+
+def test_a_torn_trailing_record_is_ignored(tmp_path):
+    spool = Spool(tmp_path, segment_size=SEGMENT_SIZE)
+    spool.open()
+    for seq in range(3):
+        spool.append(frame(seq))
+    segment = spool.segments[0]
+    last = segment.offsets[-1]
+    spool.close()
+
+    path = next(tmp_path.glob(f"*{SEGMENT_SUFFIX}"))
+    data = bytearray(path.read_bytes())
+    data[last + RECORD_HEADER.size + 2] ^= 0xff
+    path.write_bytes(bytes(data))
+
+    spool = Spool(tmp_path, segment_size=SEGMENT_SIZE)
+    spool.open()
+    assert [spool.read(sequence) for sequence in spool.unacked()] == [frame(0), frame(1)]
+    # the torn record is overwritten by the next append
+    assert spool.append(frame(3)) == 2
+    assert spool.read(2) == frame(3)
+    spool.close()
+
+
+def test_segments_keep_their_size_when_segment_size_shrinks(tmp_path):
+    spool = Spool(tmp_path, segment_size=SEGMENT_SIZE * 2)
+    spool.open()
+    sequences = [spool.append(frame(seq, size=1000)) for seq in range(SEGMENT_SIZE // 1000 + 10)]
+    spool.close()
+
+    spool = Spool(tmp_path, segment_size=SEGMENT_SIZE)
+    spool.open()
+    assert list(spool.unacked()) == sequences
+    assert spool.read(sequences[-1]) == frame(sequences[-1], size=1000)
+    spool.close()
+
+
+def test_frames_past_max_age_expire(tmp_path):
+    queue = spooled_queue(tmp_path)
+    queue.put_nowait(frame(0, created=1000.0))
+    queue.put_nowait(frame(1, created=1500.0))
+    queue.close()
+
+    queue = spooled_queue(tmp_path, max_age=600.0, clock=lambda: 2000.0)
+    assert drain(queue, done=1) == [frame(1, created=1500.0)]
+    assert queue.expired == 1
+    assert queue.spool.unacked_count() == 0
+    queue.close()
+
+
+def test_join_finishes_for_replayed_and_expired_frames(tmp_path):
+    queue = spooled_queue(tmp_path)
+    for seq in range(4):
+        queue.put_nowait(frame(seq, created=1000.0 + seq * 1000))
+    queue.close()
+
+    async def replay() -> SpooledQueue:
+        queue = spooled_queue(tmp_path, replay_batch=2, max_age=1500.0, clock=lambda: 4000.0)
+        queue.put_nowait(frame(4, created=4000.0))
+        queue.put_nowait(None)
+        items = []
+        while (item := await queue.get()) is not None:
+            items.append(item)
+            queue.done(item)
+        queue.done(None)
+        await wait_for(queue.join(), 1)
+        assert [item.info for item in items] == [frame(seq).info for seq in (2, 3, 4)]
+        return queue
+
+    queue = run(replay())
+    assert queue.expired == 2
+    with pytest.raises(ValueError):
+        queue.task_done()
+    queue.close()
+
+
+def test_syncs_run_in_a_thread(tmp_path):
+    async def send() -> None:
+        queue = SpooledQueue(Spool(tmp_path, segment_size=SEGMENT_SIZE, sync_interval=0))
+        queue.put_nowait(frame(0))
+        queue.done(await queue.get())
+        for _ in range(10):
+            await sleep(0.01)
+            if queue._sync_task is not None and queue._sync_task.done():
+                break
+        assert queue._sync_task.done()
+        assert next(tmp_path.glob("*.ack")).stat().st_size == 4
+        queue.close()
+
+    run(send())
@@ -0,0 +1,94 @@
+from mqtt_to_aprs.utils.topic import TopicRouter
+from mqtt_to_aprs.utils.topic import validate_topic_filter
+import pytest
+
+
+@pytest.fixture(params=[1024, 0], ids=["cached", "uncached"])
+def router(request) -> TopicRouter:
+    return TopicRouter(cache_size=request.param)
+
+
+def test_literal_filters(router):
+    router.add("wx/backyard", "backyard")
+    assert router.get("wx/backyard") == "backyard"
+    assert router.get("wx/frontyard") is None
+    assert router.get("wx/backyard/extra", "missing") == "missing"
+
+
+def test_single_level_wildcard(router):
+    router.add("wx/+/weather", "weather")
+    assert router.get("wx/backyard/weather") == "weather"
+    assert router.get("wx//weather") == "weather"
+    assert router.get("wx/backyard") is None
+    assert router.get("wx/a/b/weather") is None
+
+
+def test_multi_level_wildcard_matches_its_parent(router):
+    router.add("wx/#", "all")
+    assert router.get("wx/backyard") == "all"
+    assert router.get("wx/backyard/weather/now") == "all"
+    assert router.get("wx") == "all"
+    assert router.get("sensors/wx") is None
+
+
+def test_literal_beats_single_beats_multi(router):
+    router.add("wx/#", "multi")
+    router.add("wx/+/weather", "single")
+    router.add("wx/backyard/weather", "literal")
+    assert router.get("wx/backyard/weather") == "literal"
+    assert router.get("wx/frontyard/weather") == "single"
+    assert router.get("wx/frontyard/wind") == "multi"
+
+
+def test_wildcards_dont_match_system_topics(router):
+    router.add("#", "all")
+    router.add("+/broker", "single")
+    assert router.get("$SYS/broker") is None
+    assert router.get("$SYS/broker/load") is None
+    assert router.get("wx/broker") == "single"
+    router.add("$SYS/#", "system")
+    assert router.get("$SYS/broker/load") == "system"
+    # only the first level is special
+    router.add("wx/+", "wx")
+    assert router.get("wx/$internal") == "wx"
+
+
+def test_remove(router):
+    router.add("wx/+/weather", "single")
+    router.add("wx/#", "multi")
+    router.remove("wx/+/weather")
+    assert "wx/+/weather" not in router
+    assert router.get("wx/backyard/weather") == "multi"
+    router.remove("wx/#")
+    assert len(router) == 0
+    assert router.get("wx/backyard/weather") is None
+    with pytest.raises(KeyError):
+        router.remove("wx/#")
+
+
+def test_cache_is_cleared_on_add_and_remove():
+    router = TopicRouter()
+    router.add("wx/+", "single")
+    assert router.get("wx/backyard") == "single"
+    router.add("wx/backyard", "literal")
+    assert router.get("wx/backyard") == "literal"
+    router.remove("wx/backyard")
+    assert router.get("wx/backyard") == "single"
+    router.remove("wx/+")
+    assert router.get("wx/backyard") is None
+
+
+def test_cache_stays_within_its_size():
+    router = TopicRouter(cache_size=2)
+    router.add("wx/+", "single")
+    for station in range(5):
+        assert router.get(f"wx/{station}") == "single"
+    assert len(router._cache) == 2
+
+
+@pytest.mark.parametrize("topic_filter", ["", "wx/#/weather", "wx/back+", "wx/#yard"])
+def test_invalid_filters(topic_filter):
+    with pytest.raises(ValueError):
+        validate_topic_filter(topic_filter)
+    with pytest.raises(ValueError):
+        TopicRouter().add(topic_filter, None)
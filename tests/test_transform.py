@@ -0,0 +1,81 @@
+from mqtt_to_aprs.utils.transform import MAX_EXPONENT
+from mqtt_to_aprs.utils.transform import compile_transform
+import pytest
+
+FIELDS = ("wind_speed", "wind_gust", "temperature_c")
+
+
+def run(expression: str, values: dict[str, any], field: str = "wind_speed") -> float | None:
+    return compile_transform(expression, field, FIELDS)(values)
+
+
+@pytest.mark.parametrize("expression,expected", [
+    ("value * 2", 20.0),
+    ("value + wind_gust - 1", 24.0),
+    ("-value / 4", -2.5),
+    ("value // 3 + value % 3", 4.0),
+    ("value ** 2", 100.0),
+    ("max(value, wind_gust)", 15.0),
+    ("round(abs(-value) / 3)", 3),
+    ("int(float(value) / 4)", 2),
+])
+def test_allowed_expressions(expression, expected):
+    assert run(expression, {"wind_speed": 10, "wind_gust": 15}) == expected
+
+
+@pytest.mark.parametrize("expression", [
+    "value.__class__",
+    "value[0]",
+    "[value]",
+    "'value'",
+    "True",
+    "value if value else 0",
+    "value < 2",
+    "lambda: value",
+    "__import__('os')",
+    "open('config.toml')",
+    "round(value, ndigits=1)",
+    "value +",
+])
+def test_rejected_expressions(expression):
+    with pytest.raises(ValueError):
+        compile_transform(expression, "wind_speed", FIELDS)
+
+
+def test_unknown_names_are_rejected():
+    with pytest.raises(ValueError, match="humidity in the transform for wind_speed is not a field with a path"):
+        compile_transform("value + humidity", "wind_speed", FIELDS)
+
+
+def test_value_needs_the_field_to_have_a_path():
+    assert run("wind_speed * 2", {"wind_speed": 10}, field="humidity") == 20.0
+    with pytest.raises(ValueError, match="humidity has no path"):
+        compile_transform("value * 2", "humidity", FIELDS)
+
+
+def test_missing_values_give_none():
+    assert run("value + wind_gust", {"wind_speed": 10, "wind_gust": None}) is None
+
+
+def test_exponent_limit():
+    with pytest.raises(ValueError, match="larger than"):
+        compile_transform(f"2 ** {MAX_EXPONENT + 1}", "wind_speed", FIELDS)
+    assert run(f"value ** {MAX_EXPONENT + 1}", {"wind_speed": 1.0}) is None
+    assert run(f"2 ** value", {"wind_speed": MAX_EXPONENT + 1}) is None
+
+
+@pytest.mark.parametrize("expression", ["((9 ** 99) ** 99) ** 99", "10 ** 99", "1e300 * 1e300", "1" + "0" * 400])
+def test_big_constants_are_rejected(expression):
+    with pytest.raises(ValueError):
+        compile_transform(f"value * {expression}", "wind_speed", FIELDS)
+
+
+def test_constants_are_floats_and_folded():
+    transform = compile_transform("value * (1000 / 1609.344)", "wind_speed", FIELDS)
+    assert transform.names == frozenset(["wind_speed"])
+    assert transform({"wind_speed": 1609.344}) == pytest.approx(1000.0)
+
+
+def test_results_that_overflow_give_none():
+    assert run("value * value", {"wind_speed": 1e200}) is None
+    assert run("value ** 99", {"wind_speed": 1e15}) is None
@@ -0,0 +1,81 @@
+from mqtt_to_aprs.config import ConfigObject
+from mqtt_to_aprs.config import TranslatorConfig
+from mqtt_to_aprs.utils.packet import encode_position
+from mqtt_to_aprs.utils.packet import make_position
+from mqtt_to_aprs.utils.packet.weather import encode_position_weather_packet
+from mqtt_to_aprs.utils.packet.weather import encode_weather_data
+from mqtt_to_aprs.utils.packet.weather import make_position_weather_packet
+from mqtt_to_aprs.utils.packet.weather import make_weather_data
+from mqtt_to_aprs.utils.translator.jmespath import JMESPathTranslator
+from mqtt_to_aprs.utils.translator.jmespath import validate_information_field
+import pytest
+import random
+
+WEATHER_ARGS = ("wind_dir", "wind_speed", "wind_gust", "temperature", "rain_last_hr", "rain_last_24_hrs",
+                "rain_since_midnight", "humidity", "pressure")
+
+
+def random_weather(rng: random.Random) -> dict[str, float | None]:
+    ranges = {"wind_dir": (0, 360), "wind_speed": (0, 200), "wind_gust": (0, 250), "temperature": (-120, 130),
+              "rain_last_hr": (0, 999), "rain_last_24_hrs": (0, 999), "rain_since_midnight": (0, 999),
+              "humidity": (0, 100), "pressure": (9000, 11000)}
+    return {key: None if rng.random() < 0.2 else rng.uniform(*ranges[key]) for key in WEATHER_ARGS}
+
+
+def service_config() -> ConfigObject:
+    return ConfigObject(logging={}, aprs={"callsign": "N0CALL", "password": -1}, kiss={},
+                        location={"latitude": 28.979480, "longitude": -98.51329},
+                        mqtt={"host": "localhost", "port": 1883, "topics": []})
+
+
+def test_encode_weather_data_matches_make_weather_data():
+    rng = random.Random(3)
+    for _ in range(5000):
+        weather = random_weather(rng)
+        assert encode_weather_data(**weather) == make_weather_data(**weather).encode("ascii"), weather
+
+
+@pytest.mark.parametrize("weather", [
+    {},
+    {"temperature": -100},
+    {"temperature": -150.5},
+    {"temperature": -9.9},
+    {"humidity": 100},
+    {"humidity": 5},
+    {"pressure": 10132.7, "wind_dir": 0, "wind_speed": 0},
+])
+def test_encode_weather_data_edge_cases(weather):
+    assert encode_weather_data(**weather) == make_weather_data(**weather).encode("ascii")
+
+
+@pytest.mark.parametrize("latitude,longitude", [(28.979480, -98.51329), (-33.8688, 151.2093), (51.4779, -0.0015)])
+def test_encode_position_weather_packet_matches_make_position_weather_packet(latitude, longitude):
+    weather = {"wind_dir": 270, "wind_speed": 12, "temperature": 71, "humidity": 45, "pressure": 10150}
+    for send_id in ("", "MQTT"):
+        expected = make_position_weather_packet(make_position(latitude, longitude), make_weather_data(**weather),
+                                                send_id=send_id, timestamp="171234")
+        encoded = encode_position_weather_packet(encode_position(latitude, longitude), encode_weather_data(**weather),
+                                                 send_id=send_id.encode("ascii"), timestamp=b"171234")
+        assert encoded == expected.encode("ascii")
+
+
+def test_encode_position_weather_packet_timestamp_is_zulu_ddhhmm():
+    frame = encode_position_weather_packet(encode_position(28.979480, -98.51329), encode_weather_data())
+    assert frame[:1] == b"@"
+    assert frame[1:7].isdigit()
+    assert frame[7:8] == b"z"
+
+
+@pytest.mark.parametrize("validate_packets", [False, True])
+def test_translate_with_validate_packets(validate_packets):
+    translator_config = TranslatorConfig(type="jmespath", validate_packets=validate_packets, config={
+        "fields": {"temperature_c": "temperature_C", "humidity": "humidity", "wind_dir": "wind.dir",
+                   "wind_speed": "wind.speed"}})
+    translator = JMESPathTranslator(translator_config, service_config())
+    frame = translator.translate_sync({"temperature_C": 21.5, "humidity": 40, "wind": {"dir": 90, "speed": 8}}, "weather")
+    assert frame.endswith(b"090/008g...t070r...p...P...h40b.....w")
+
+
+def test_validate_information_field_rejects_garbage():
+    with pytest.raises(ValueError):
+        validate_information_field(b"@not a position report")